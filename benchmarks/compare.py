@@ -0,0 +1,105 @@
+"""Compare the benchmark results against a stored baseline
+
+Exit with status 1 if any benchmark regresses beyond the tolerance::
+
+    python -m benchmarks.compare baseline.json results.json --tolerance 0.1
+"""
+
+import argparse
+import json
+import sys
+
+# metric name -> whether a higher value is better
+METRICS = [
+    ("seconds", False),
+    ("throughput", True),
+    ("peak_memory", False),
+    ("requests", False),
+]
+
+# the request counts are deterministic, so any increase is a regression
+EXACT_METRICS = frozenset(["requests"])
+
+
+def relative_change(old, new):
+    """Get the relative change from the old value to the new value, which
+    is infinite for any change from a zero baseline"""
+
+    if old:
+        return (float(new) - old) / old
+    if new == old:
+        return 0.0
+    return float("inf") if new > old else float("-inf")
+
+
+def load_results(file_path):
+    with open(file_path, "r") as fh:
+        return json.load(fh)
+
+
+def compare(baseline, results, tolerance=0.1):
+    """Compare the results against the baseline
+
+    :param baseline: the baseline results loaded from the JSON file
+    :param results: the new results loaded from the JSON file
+    :param tolerance: (default is 0.1) the relative change which is still
+        accepted for the timing and memory metrics. Any increase from a zero
+        baseline exceeds it
+    :return: a :class:`list` of the (benchmark, metric, baseline value,
+        new value, relative change, regressed) tuples
+    :rtype: list
+    """
+
+    rows = list()
+    base_benchmarks = baseline.get("benchmarks", {})
+    for name, result in results.get("benchmarks", {}).items():
+        base = base_benchmarks.get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            change = relative_change(old, new)
+            if metric in EXACT_METRICS:
+                # compare the absolute values, so that any change counts
+                regressed = new < old if higher_is_better else new > old
+            else:
+                worse = -change if higher_is_better else change
+                regressed = worse > tolerance
+            rows.append((name, metric, old, new, change, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline", help="the baseline JSON file")
+    parser.add_argument("results", help="the new results JSON file")
+    parser.add_argument("--tolerance",
+                        type=float,
+                        default=0.1,
+                        help="the accepted relative change of the timing "
+                        "and memory metrics (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    baseline = load_results(args.baseline)
+    results = load_results(args.results)
+    if baseline.get("scale") != results.get("scale"):
+        print("WARNING: comparing different scales (%s vs %s)" %
+              (baseline.get("scale"), results.get("scale")))
+
+    rows = compare(baseline, results, tolerance=args.tolerance)
+    for name, metric, old, new, change, regressed in rows:
+        print("%-16s %-12s %14.4f -> %14.4f %+8.1f%% %s" %
+              (name, metric, old, new, change * 100,
+               "REGRESSION" if regressed else "ok"))
+
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        print("%d regression(s) found" % len(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import json
+import os
+import re
+
+import xmltodict
+from lxml import etree
+
+from rtcclient import urlencode
+
+FIXTURES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "tests",
+    "fixtures")
+
+BASE_URL = "http://test.url:9443/jazz"
+PROJECTAREA_ID = "_CuZu0HUwEeKicpXBddtqNA"
+
+_XMLNS = re.compile(r'\s+xmlns:\w+="[^"]*"')
+_TOTAL_COUNT = re.compile(r'\s+oslc_cm:totalCount="[^"]*"')
+_NEXT_PAGE = re.compile(r'\s+oslc_cm:next="[^"]*"')
+_IDENTIFIER = re.compile(r"<dc:identifier>(\d+)</dc:identifier>")
+_ITEM_NAME = re.compile(r"WorkItem/(\d+)")
+
+
+def read_fixture(file_name):
+    """Read a fixture file from tests/fixtures
+
+    :param file_name: the fixture file name
+    :return: the file content
+    :rtype: str
+    """
+
+    with open(os.path.join(FIXTURES_PATH, file_name), mode="r") as fh:
+        return fh.read()
+
+
+class FixtureCollection(object):
+    """An OSLC collection fixture split into its root element and entries,
+    which can be scaled to any number of entries and served page by page
+
+    The workitem entries are renumbered from `start_id`, so that the
+    generated entries are distinct workitems.
+
+    :param file_name: the fixture file name (e.g. workitems.xml)
+    :param entry_tag: the tag of the entries (e.g. oslc_cm:ChangeRequest)
+    :param start_id: (default is 100000) the first generated workitem id
+    """
+
+    def __init__(self, file_name, entry_tag, start_id=100000):
+        content = read_fixture(file_name)
+        tag = re.escape(entry_tag)
+        self.entries = re.findall(r"<%s[\s>/].*?</%s>" % (tag, tag),
+                                  content,
+                                  flags=re.S)
+        if not self.entries:
+            raise ValueError("No %s entries in %s" % (entry_tag, file_name))
+        self.entry_tag = entry_tag
+        self.start_id = start_id
+
+        head = content[:content.index(self.entries[0])]
+        self.tail = content[content.rindex(self.entries[-1]) +
+                            len(self.entries[-1]):]
+        head = _NEXT_PAGE.sub("", _TOTAL_COUNT.sub("", head))
+        # the position to insert the paging attributes in the root element
+        root_end = head.index(">", head.index("oslc_cm:Collection"))
+        self.head_open = head[:root_end]
+        self.head_close = head[root_end:]
+        self._ids = [self._get_id(entry) for entry in self.entries]
+        self._selected = dict()
+
+    @staticmethod
+    def _get_id(entry):
+        matched = _IDENTIFIER.search(entry) or _ITEM_NAME.search(entry)
+        return matched.group(1) if matched else None
+
+    def entry(self, index, properties=None):
+        """Generate the entry with the index
+
+        :param index: the index of the entry, starting from 0
+        :param properties: (optional) the comma-separated properties to keep
+            (e.g. the value of `oslc_cm.properties`). All the properties are
+            kept if `None`
+        :return: the XML text of the entry
+        :rtype: str
+        """
+
+        template = self.entries[index % len(self.entries)]
+        if properties:
+            template = self._select(index % len(self.entries), properties)
+        orig_id = self._ids[index % len(self.entries)]
+        if orig_id is None:
+            return template
+        return re.sub(r"\b%s\b" % orig_id, str(self.start_id + index), template)
+
+    def _select(self, position, properties):
+        key = (position, properties)
+        selected = self._selected.get(key)
+        if selected is None:
+            xmlns = "".join(_XMLNS.findall(self.head_open))
+            root = etree.fromstring("<root%s>%s</root>" %
+                                    (xmlns, self.entries[position]))
+            entry = root[0]
+            wanted = set(prop.strip() for prop in properties.split(","))
+            for child in list(entry):
+                if _qname(child) not in wanted:
+                    entry.remove(child)
+            selected = _XMLNS.sub("", etree.tostring(entry, encoding="unicode"))
+            self._selected[key] = selected
+        return selected
+
+    def resource(self, index, properties=None):
+        """Generate the entry with the index as a standalone resource, which
+        declares the namespaces of the collection
+
+        :param index: the index of the entry, starting from 0
+        :param properties: (optional) the comma-separated properties to keep
+        :return: the XML text of the resource
+        :rtype: str
+        """
+
+        entry = self.entry(index, properties=properties)
+        xmlns = "".join(_XMLNS.findall(self.head_open))
+        root_end = re.search(r"[\s>/]", entry).start()
+        return "".join([entry[:root_end], xmlns, entry[root_end:]])
+
+    def page(self,
+             total,
+             start_index=0,
+             page_size=100,
+             next_url=None,
+             properties=None):
+        """Generate a page of the scaled collection
+
+        :param total: the total number of the entries in the collection
+        :param start_index: the index of the first entry in this page
+        :param page_size: the maximum number of the entries in this page
+        :param next_url: the url of the next page, which is only added when
+            there are more entries after this page
+        :param properties: (optional) the comma-separated properties to keep
+        :return: the XML text of the page
+        :rtype: str
+        """
+
+        stop_index = min(total, start_index + page_size)
+        attrs = ' oslc_cm:totalCount="%d"' % total
+        if next_url is not None and stop_index < total:
+            attrs += ' oslc_cm:next="%s"' % next_url.replace("&", "&amp;")
+        return "".join([self.head_open, attrs, self.head_close] + [
+            self.entry(index, properties=properties)
+            for index in range(start_index, stop_index)
+        ] + [self.tail])
+
+
+def _qname(element):
+    namespace, _, local_name = element.tag.rpartition("}")
+    for prefix, uri in element.nsmap.items():
+        if "{%s" % uri == namespace:
+            return ":".join([prefix, local_name])
+    return local_name
+
+
+def next_page_url(url, start_index, page_size):
+    """Build the url of the next page by replacing `_startIndex`
+
+    :param url: the url of the current page
+    :param start_index: the index of the first entry in the current page
+    :param page_size: the page size
+    :return: the url of the next page
+    :rtype: str
+    """
+
+    base, _, query = url.partition("?")
+    params = [
+        param for param in query.split("&")
+        if param and not param.startswith("_startIndex=")
+    ]
+    params.append(urlencode({"_startIndex": start_index + page_size}))
+    return "?".join([base, "&".join(params)])
+
+
+def to_oslc_json(content):
+    """Convert an XML resource or collection into the OSLC JSON
+    representation (application/x-oslc-cm-change-request+json)
+
+    The attributes become plain properties, the entries of a collection are
+    listed under "oslc_cm:results" and the workitem ids are numbers.
+
+    :param content: the XML text
+    :return: the JSON text
+    :rtype: str
+    """
+
+    tag, root = list(xmltodict.parse(content).items())[0]
+    if tag != "oslc_cm:Collection":
+        return json.dumps(_to_json_value(root, ""))
+
+    data = dict()
+    results = list()
+    for key, value in (root or {}).items():
+        if key.startswith("@"):
+            if not key.startswith("@xmlns"):
+                data[key[1:]] = value
+        else:
+            results.extend(value if isinstance(value, list) else [value])
+    if "oslc_cm:totalCount" in data:
+        data["oslc_cm:totalCount"] = int(data["oslc_cm:totalCount"])
+    data["oslc_cm:results"] = [_to_json_value(entry, "") for entry in results]
+    return json.dumps(data)
+
+
+def _to_json_value(value, key):
+    if isinstance(value, list):
+        return [_to_json_value(item, key) for item in value]
+    if isinstance(value, dict):
+        if "#text" in value:
+            return value["#text"]
+        return dict((name.lstrip("@"), _to_json_value(item, name))
+                    for name, item in value.items()
+                    if not name.startswith("@xmlns"))
+    if key == "dc:identifier" and value is not None and value.isdigit():
+        return int(value)
+    if value is None:
+        return ""
+    return value
@@ -0,0 +1,752 @@
+"""A lightweight fake RTC/Jazz server for the load and integration tests
+
+The server speaks plain HTTP on the loopback interface and serves the test
+fixtures, scaled to the configured data volume. The latency and the errors
+are configurable, so that the throughput, pooling, retry and concurrency
+features of rtcclient can be measured reproducibly without network access::
+
+    with FakeRTCServer(workitems=5000, latency=0.01) as server:
+        myclient = RTCClient(server.url, "tester1@email.com", "password")
+        myclient.getWorkitems(projectarea_id=PROJECTAREA_ID)
+    print(server.requests)
+"""
+
+import collections
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.data import BASE_URL, FixtureCollection
+from benchmarks.data import next_page_url, read_fixture, to_oslc_json
+from benchmarks.transport import CHILDREN_TAG, STATIC_FIXTURES
+from rtcclient import urlparse, urlunquote
+from rtcclient.metrics import normalize_endpoint
+
+JSON_CONTENT_TYPE = "application/x-oslc-cm-change-request+json"
+AUTH_MSG_HEADER = "X-com-ibm-team-repository-web-auth-msg"
+SUBSCRIBERS_TAG = "rtc_cm:subscribers"
+PARENT_TAG = "rtc_cm:com.ibm.team.workitem.linktype.parentworkitem.parent"
+ATTACHMENT_TAG = "rtc_cm:com.ibm.team.workitem.linktype.attachment.attachment"
+# the links which are listed inline in the scoped representations
+LINK_TAGS = (SUBSCRIBERS_TAG, PARENT_TAG, CHILDREN_TAG, ATTACHMENT_TAG)
+_LINK_ELEMENTS = dict(
+    (tag, re.compile(r"<%s\b[^>]*/>" % re.escape(tag))) for tag in LINK_TAGS)
+STATE_TAG = "rtc_cm:state"
+_STATE = re.compile(r"<%s\b[^>]*/>" % STATE_TAG)
+ATTACHMENT_SERVICE = ("service/com.ibm.team.workitem.service.internal.rest."
+                      "IAttachmentRestService/")
+CHANGESET_TAG = ("rtc_cm:com.ibm.team.filesystem.workitems.change_set."
+                 "com.ibm.team.scm.ChangeSet")
+FILESYSTEM_SERVICE = ("service/com.ibm.team.filesystem.service.internal.rest."
+                      "IFilesystemContentService/")
+# the changes of each changeset: (the item id, the before state, the after
+# state, the item type)
+CHANGES = [
+    ("_file1", "_state1", "_state2", "scm:FileItemHandle"),
+    ("_file2", "true", "_state3", "scm:FileItemHandle"),
+    ("_file3", "_state4", "true", "scm:FileItemHandle"),
+    ("_folder1", "_state5", "_state6", "scm:FolderHandle"),
+]
+
+# the fixtures which are served as they are, besides the static collections
+# shared with the in-process transport
+EXTRA_FIXTURES = [
+    (r"oslc/workflows/[^/]+/actions/[^/]+", "actions.xml"),
+    (r"oslc/workflows/[^/]+/states/[^/]+", "states.xml"),
+    (r"oslc/projectareas/[^/]+/rtc_cm:members", "members.xml"),
+    (r"oslc/projectareas/[^/]+/rtc_cm:administrators", "administrators.xml"),
+    (r"oslc/workitems/\d+/rtc_cm:subscribers", "members.xml"),
+    (r"oslc/workitems/\d+/" + re.escape(ATTACHMENT_TAG), "attachment.xml"),
+    (r"oslc/workitems/\d+/" + re.escape(CHANGESET_TAG), "changesets.xml"),
+    (r"oslc/queries", "savedqueries.xml"),
+]
+
+_SESSION = re.compile(r"JSESSIONID=(\w+)")
+_TAG_QUERY = re.compile(r'^dc:subject="([^"]*)"$')
+_SUBJECT = re.compile(r"<dc:subject>([^<]*)</dc:subject>")
+
+# "&" followed by a space is not well-formed XML, which makes rtcclient
+# relogin just like the login page of an expired session does
+LOGIN_PAGE = ("<html><head><title>Login</title></head>"
+              "<body>Please log in & try again</body></html>")
+
+RDF_NAMESPACES = " ".join([
+    'xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"',
+    'xmlns:dcterms="http://purl.org/dc/terms/"',
+    'xmlns:rtc_cm="http://jazz.net/xmlns/prod/jazz/rtc/cm/1.0/"',
+])
+
+
+class FakeResponse(object):
+    """The status, headers and body of a response of the fake server"""
+
+    def __init__(self, body="", status=200, headers=None):
+        self.status = status
+        self.headers = dict(headers or {})
+        self.body = body if isinstance(body, bytes) else body.encode("UTF-8")
+        # the bytes of the body sent before the connection drops, the whole
+        # body is sent if `None`
+        self.truncate = None
+
+
+class FakeRTCServer(object):
+    """A fake RTC/Jazz server running in a background thread
+
+    :param host: (default is 127.0.0.1) the address to listen on
+    :param port: (default is 0) the port to listen on. A free port is
+        picked when it is 0
+    :param context_root: (default is "jazz") the context root of the server
+    :param workitems: (default is 1000) the number of workitems in a
+        project area
+    :param children: (default is 100) the number of children of a workitem
+    :param attachment_size: (default is 1024) the size in bytes of the
+        attachment contents
+    :param latency: (default is 0) the seconds to wait before responding
+        each request, either a number or a (min, max) tuple to wait a
+        random time
+    :param error_rate: (default is 0) the probability to fail a request
+        with `error_status`
+    :param error_status: (default is 503) the status of the injected errors
+    :param users: (optional) a :class:`dict` of username to password which
+        are allowed to log in. All the users are allowed if `None`
+    :param seed: (optional) the seed of the random latencies and errors
+    """
+
+    log = logging.getLogger("fake_server.FakeRTCServer")
+
+    def __init__(self,
+                 host="127.0.0.1",
+                 port=0,
+                 context_root="jazz",
+                 workitems=1000,
+                 children=100,
+                 attachment_size=1024,
+                 latency=0,
+                 error_rate=0,
+                 error_status=503,
+                 users=None,
+                 seed=None):
+        self.host = host
+        self.port = port
+        self.context_root = context_root.strip("/")
+        self.workitems = workitems
+        self.children = children
+        self.attachment_size = attachment_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.users = users
+        self.requests = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._sessions = set()
+        self._failures = list()
+        self._truncations = list()
+        self._created = dict()
+        self._created_bodies = dict()
+        self._etags = dict()
+        # the (workitem id, query parameters, body) of the accepted PUTs
+        self.updates = list()
+        # the links of the workitems keyed by the workitem id and the tag
+        self._links = dict()
+        self._states = dict()
+        self._comments = dict()
+        self._attachments = 0
+        self._workitems = FixtureCollection("workitems.xml",
+                                            "oslc_cm:ChangeRequest")
+        self._children = FixtureCollection("children.xml",
+                                           "oslc_cm:ChangeRequest",
+                                           start_id=200000)
+        self._comment_entries = FixtureCollection("comments.xml",
+                                                  "rtc_cm:Comment")
+        self._static = [(re.compile("^%s$" % path), read_fixture(file_name))
+                        for path, file_name in STATIC_FIXTURES + EXTRA_FIXTURES]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *excinfo):
+        self.stop()
+        return False
+
+    @property
+    def url(self):
+        """The url of the server, which is passed to
+        :class:`rtcclient.client.RTCClient`
+        """
+
+        if self._server is None:
+            return None
+        return "http://%s:%s/%s" % (self.host, self._server.server_port,
+                                    self.context_root)
+
+    def start(self):
+        """Start serving in a background thread"""
+
+        self._server = ThreadingHTTPServer((self.host, self.port),
+                                           _FakeRTCHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="FakeRTCServer",
+                                        daemon=True)
+        self._thread.start()
+        self.log.info("Fake RTC server is listening at %s", self.url)
+
+    def stop(self):
+        """Stop the server"""
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    @property
+    def total_requests(self):
+        return sum(self.requests.values())
+
+    def reset(self):
+        """Reset the request counters and the injected errors"""
+
+        with self._lock:
+            self.requests.clear()
+            self._failures = list()
+            self._truncations = list()
+
+    def inject_error(self, status=None, count=1, path=None, after=False):
+        """Fail the next requests deterministically
+
+        :param status: (optional) the response status. `error_status` is
+            used if `None`
+        :param count: (default is 1) the number of the requests to fail
+        :param path: (optional) a regular expression, only the requests
+            whose path (without the context root) matches it are failed
+        :param after: (default is `False`) whether the requests are handled
+            before failing, e.g. a workitem is created but the response is
+            lost
+        """
+
+        with self._lock:
+            self._failures.append([
+                status or self.error_status, count,
+                re.compile(path) if path else None, after
+            ])
+
+    def inject_truncation(self, size, count=1, path=None):
+        """Drop the connections of the next responses after sending `size`
+        bytes of their bodies, e.g. to interrupt the downloads
+
+        :param size: the bytes of the body to send
+        :param count: (default is 1) the number of the responses to truncate
+        :param path: (optional) a regular expression, only the responses
+            whose path (without the context root) matches it are truncated
+        """
+
+        with self._lock:
+            self._truncations.append(
+                [size, count, re.compile(path) if path else None])
+
+    def expire_sessions(self):
+        """Expire all the sessions, so that the clients have to relogin"""
+
+        with self._lock:
+            self._sessions.clear()
+
+    def _wait(self):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            with self._lock:
+                latency = self._random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+    def _pop_failure(self, path):
+        with self._lock:
+            for failure in self._failures:
+                status, count, pattern, after = failure
+                if pattern is None or pattern.search(path):
+                    failure[1] -= 1
+                    if failure[1] <= 0:
+                        self._failures.remove(failure)
+                    return status, after
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self.error_status, False
+        return None, False
+
+    def _pop_truncation(self, path):
+        with self._lock:
+            for truncation in self._truncations:
+                size, count, pattern = truncation
+                if pattern is None or pattern.search(path):
+                    truncation[1] -= 1
+                    if truncation[1] <= 0:
+                        self._truncations.remove(truncation)
+                    return size
+        return None
+
+    def handle(self, method, raw_path, headers, body):
+        """Serve a request
+
+        :param method: the HTTP method
+        :param raw_path: the request path with the query string
+        :param headers: the request headers
+        :param body: the request body in bytes
+        :return: the :class:`FakeResponse` object
+        """
+
+        url = "http://%s:%s%s" % (self.host, self._server.server_port, raw_path)
+        with self._lock:
+            self.requests[" ".join([method,
+                                    normalize_endpoint(url, self.url)])] += 1
+        self._wait()
+
+        parsed = urlparse.urlparse(raw_path)
+        path = parsed.path.lstrip("/")
+        if path.startswith(self.context_root + "/"):
+            path = path[len(self.context_root) + 1:]
+        params = dict(urlparse.parse_qsl(parsed.query))
+
+        status, after = self._pop_failure(path)
+        if status is not None:
+            if after:
+                self._handle(method, path, url, params, headers, body)
+            return FakeResponse("Injected error", status=status)
+        resp = self._handle(method, path, url, params, headers, body)
+        resp.truncate = self._pop_truncation(path)
+        return resp
+
+    def _handle(self, method, path, url, params, headers, body):
+
+        if path.startswith("authenticated/"):
+            return self._authenticate(method, path, headers, body)
+
+        if not self._check_session(headers):
+            return FakeResponse(LOGIN_PAGE,
+                                headers={
+                                    "Content-Type": "text/html",
+                                    AUTH_MSG_HEADER: "authrequired"
+                                })
+
+        if method == "GET":
+            return self._get(url, path, params, headers)
+        if method == "POST":
+            return self._post(url, path, params, headers, body)
+        if method == "PUT":
+            return self._put(path, params, headers, body)
+        return FakeResponse("Method not allowed", status=405)
+
+    def _authenticate(self, method, path, headers, body):
+        session = self._get_session(headers)
+        if path == "authenticated/j_security_check" and method == "POST":
+            form = dict(urlparse.parse_qsl(body.decode("UTF-8")))
+            username = form.get("j_username")
+            if (self.users is not None and
+                    self.users.get(username) != form.get("j_password")):
+                return FakeResponse(headers={AUTH_MSG_HEADER: "authfailed"})
+            session = uuid.uuid4().hex
+            with self._lock:
+                self._sessions.add(session)
+            return FakeResponse(headers=self._session_cookie(session))
+
+        if session is not None and session in self._sessions:
+            return FakeResponse(headers=self._session_cookie(session))
+        # a new session which is authenticated by j_security_check
+        return FakeResponse(headers=dict(self._session_cookie(uuid.uuid4().hex),
+                                         **{AUTH_MSG_HEADER: "authrequired"}))
+
+    def _session_cookie(self, session):
+        return {
+            "Set-Cookie":
+                "JSESSIONID=%s; Path=/%s" % (session, self.context_root)
+        }
+
+    @staticmethod
+    def _get_session(headers):
+        matched = _SESSION.search(headers.get("Cookie") or "")
+        return matched.group(1) if matched else None
+
+    def _check_session(self, headers):
+        with self._lock:
+            return self._get_session(headers) in self._sessions
+
+    def _get(self, url, path, params, headers):
+        matched = _TAG_QUERY.match(params.get("oslc_cm.query", ""))
+        if re.match(r"^oslc/contexts/[^/]+/workitems$", path) and matched:
+            return self._negotiate(headers, self._query(matched.group(1),
+                                                        params))
+
+        if re.match(r"^oslc/contexts/[^/]+/workitems$", path):
+            return self._negotiate(
+                headers, self._page(url, params, self._workitems,
+                                    self.workitems))
+
+        matched = re.match(r"^oslc/workitems/(\d+)$", path)
+        if matched:
+            return self._negotiate(
+                headers,
+                self._workitem(int(matched.group(1)),
+                               properties=params.get("oslc_cm.properties")))
+
+        matched = re.match(r"^oslc/workitems/(\d+)/rtc_cm:comments$", path)
+        if matched:
+            return self._comments_page(int(matched.group(1)))
+
+        if path.endswith("/" + CHILDREN_TAG):
+            return self._negotiate(
+                headers, self._page(url, params, self._children, self.children))
+
+        if re.match(r"^(\w+/)?resource/content/", path):
+            return self._content(headers)
+
+        matched = re.match(
+            r"^resource/itemOid/com.ibm.team.scm.ChangeSet/"
+            r"([^/]+)$", path)
+        if matched:
+            return self._changeset(matched.group(1))
+
+        if path.startswith(FILESYSTEM_SERVICE):
+            return self._file(params, headers)
+
+        for pattern, content in self._static:
+            if pattern.match(path):
+                return self._xml(content)
+
+        # any linked resource, e.g. the owner, state or project area
+        title = urlunquote(path.rstrip("/").split("/")[-1])
+        return self._xml("".join([
+            '<rtc_cm:Resource xmlns:rtc_cm="http://jazz.net/xmlns/prod/'
+            'jazz/rtc/cm/1.0/" xmlns:dc="http://purl.org/dc/terms/">',
+            "<dc:title>%s</dc:title></rtc_cm:Resource>" % title
+        ]))
+
+    def _post(self, url, path, params, headers, body):
+        matched = re.match(r"^oslc/contexts/[^/]+/workitems/[^/]+$", path)
+        if matched:
+            with self._lock:
+                workitem_id = (self._workitems.start_id + self.workitems +
+                               len(self._created))
+                index = workitem_id - self._workitems.start_id
+                self._created[workitem_id] = self._workitems.resource(index)
+                self._created_bodies[workitem_id] = body.decode("UTF-8")
+            resp = self._workitem(workitem_id)
+            resp.status = 201
+            return resp
+
+        matched = re.match(
+            r"^oslc/workitems/(\d+)/rtc_cm:comments/oslc:comment$", path)
+        if matched:
+            return self._add_comment(url, int(matched.group(1)), body)
+
+        if path == ATTACHMENT_SERVICE:
+            return self._upload_attachment(body)
+
+        matched = re.match(r"^oslc/workitems/(\d+)/%s$" % ATTACHMENT_TAG, path)
+        if matched:
+            return self._link_attachment(body)
+
+        return FakeResponse("Not found", status=404)
+
+    def _put(self, path, params, headers, body):
+        matched = re.match(r"^oslc/workitems/(\d+)$", path)
+        if not matched:
+            return FakeResponse("Not found", status=404)
+
+        workitem_id = int(matched.group(1))
+        with self._lock:
+            etag = self._etags.get(workitem_id, 1)
+            if_match = headers.get("If-Match")
+            if if_match is not None and if_match.strip('"') != str(etag):
+                return FakeResponse("Precondition failed", status=412)
+            self._etags[workitem_id] = etag + 1
+            self.updates.append((workitem_id, params, body))
+            for tag in LINK_TAGS:
+                links = _get_json_links(body, tag)
+                if links is not None:
+                    self._links[(workitem_id, tag)] = links
+            states = _get_json_links(body, STATE_TAG)
+            if states:
+                self._states[workitem_id] = states[0]
+        return self._workitem(workitem_id)
+
+    def _query(self, tag, params):
+        # the tags of the created workitems are matched, e.g. the
+        # idempotency keys
+        with self._lock:
+            bodies = sorted(self._created_bodies.items())
+        found = list()
+        for workitem_id, body in bodies:
+            # the tags are lowercased like the RTC server does
+            tags = re.split(r"[,\s]+", " ".join(_SUBJECT.findall(body)).lower())
+            if tag in tags:
+                found.append(workitem_id)
+        page_size = int(params.get("oslc_cm.pageSize", 100))
+        collection = self._workitems
+        return self._xml("".join([
+            collection.head_open,
+            ' oslc_cm:totalCount="%d"' % len(found), collection.head_close
+        ] + [
+            collection.entry(workitem_id - collection.start_id,
+                             properties=params.get("oslc_cm.properties"))
+            for workitem_id in found[:page_size]
+        ] + [collection.tail]))
+
+    def _workitem(self, workitem_id, properties=None):
+        with self._lock:
+            content = self._created.get(workitem_id)
+            etag = self._etags.get(workitem_id, 1)
+        if content is None:
+            index = workitem_id - self._workitems.start_id
+            if index < 0 or index >= self.workitems:
+                # keep the ids of the original fixtures working
+                index = 0
+            content = self._workitems.resource(index, properties=properties)
+        with self._lock:
+            state = self._states.get(workitem_id)
+        if state is not None:
+            content = _STATE.sub('<%s rdf:resource="%s"/>' % (STATE_TAG, state),
+                                 content)
+        for tag in set(LINK_TAGS).intersection((properties or "").split(",")):
+            # the scoped representation lists the links inline
+            content = _LINK_ELEMENTS[tag].sub(
+                "".join('<%s rdf:resource="%s"/>' % (tag, url)
+                        for url in self._get_links(workitem_id, tag)), content)
+        resp = self._xml(content)
+        resp.headers["ETag"] = '"%s"' % etag
+        return resp
+
+    def _get_links(self, workitem_id, tag):
+        with self._lock:
+            links = self._links.get((workitem_id, tag))
+        if links is not None:
+            return links
+        if tag == CHILDREN_TAG:
+            return [
+                "%s/resource/itemName/com.ibm.team.workitem.WorkItem/%s" %
+                (self.url, self._children.start_id + index)
+                for index in range(self.children)
+            ]
+        return []
+
+    def _comments_page(self, workitem_id):
+        with self._lock:
+            added = list(self._comments.get(workitem_id, []))
+            etag = self._etags.get(workitem_id, 1)
+        entries = self._comment_entries.entries + added
+        resp = self._xml("".join([
+            self._comment_entries.head_open,
+            ' oslc_cm:totalCount="%d"' %
+            len(entries), self._comment_entries.head_close
+        ] + entries + [self._comment_entries.tail]))
+        resp.headers["ETag"] = '"%s"' % etag
+        return resp
+
+    def _add_comment(self, url, workitem_id, body):
+        description = re.search(r"<dcterms:description[^>]*>(.*?)<",
+                                body.decode("UTF-8"), re.S)
+        description = description.group(1) if description else ""
+        comments_url = url.rsplit("/", 1)[0]
+        with self._lock:
+            comments = self._comments.setdefault(workitem_id, [])
+            comment_url = "/".join([
+                comments_url,
+                str(len(self._comment_entries.entries) + len(comments))
+            ])
+            comments.append("".join([
+                '<rtc_cm:Comment rdf:resource="%s">' % comment_url,
+                "<dc:description>%s</dc:description>" % description,
+                "</rtc_cm:Comment>"
+            ]))
+        return FakeResponse("".join([
+            "<rdf:RDF %s>" % RDF_NAMESPACES,
+            '<rdf:Description rdf:about="%s">' % comment_url,
+            "<dcterms:description>%s</dcterms:description>" % description,
+            "</rdf:Description></rdf:RDF>"
+        ]),
+                            status=201,
+                            headers={"Content-Type": "application/rdf+xml"})
+
+    def _upload_attachment(self, body):
+        filename = re.search(rb'filename="([^"]*)"', body)
+        filename = filename.group(1).decode("UTF-8") if filename else "file"
+        with self._lock:
+            self._attachments += 1
+            attachment_id = self._attachments
+        files = [{
+            "id":
+                attachment_id,
+            "name":
+                filename,
+            "url":
+                "/".join([
+                    self.url,
+                    "resource/itemOid/com.ibm.team.workitem.Attachment",
+                    "_%s" % uuid.uuid4().hex
+                ])
+        }]
+        return FakeResponse("".join([
+            "<html><body><textarea>",
+            json.dumps({"files": files}), "</textarea></body></html>"
+        ]),
+                            headers={"Content-Type": "text/html"})
+
+    def _link_attachment(self, body):
+        form = dict(urlparse.parse_qsl(body.decode("UTF-8")))
+        title = form.get("dcterms:title", "")
+        identifier = title.split(":")[0]
+        return self._xml("".join([
+            '<rtc_cm:Attachment %s rdf:resource="%s">' %
+            (RDF_NAMESPACES, form.get("rdf:resource", "")),
+            "<dcterms:identifier>%s</dcterms:identifier>" % identifier,
+            "<dcterms:title>%s</dcterms:title>" % title, "</rtc_cm:Attachment>"
+        ]),
+                         status=201)
+
+    def _content(self, headers):
+        # a non-uniform content, so that the misplaced ranges are detected
+        content = (bytes(bytearray(range(256))) *
+                   (self.attachment_size // 256 + 1))[:self.attachment_size]
+        return self._ranged(content, headers,
+                            'attachment; filename="content.bin"')
+
+    @staticmethod
+    def _changeset(changeset_id):
+        changes = [
+            "".join([
+                "<changes><internalId>_change%s</internalId>" % index,
+                "<kind>2</kind>",
+                "<before>%s</before><after>%s</after>" % (before, after),
+                '<item xsi:type="%s">%s</item></changes>' % (item_type, item)
+            ]) for index, (item, before, after, item_type) in enumerate(CHANGES)
+        ]
+        return FakeResponse("".join([
+            '<scm:ChangeSet xmlns:scm="http://jazz.net/xmlns/prod/jazz/scm/'
+            '1.0/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">',
+            "<component>_component</component>",
+            "<comment>%s</comment>" % changeset_id
+        ] + changes + ["</scm:ChangeSet>"]),
+                            headers={"Content-Type": "text/xml"})
+
+    def _file(self, params, headers):
+        item, state = params.get("itemId", ""), params.get("stateId", "")
+        content = ("%s@%s\n" % (item, state)).encode("UTF-8") * 1000
+        return self._ranged(
+            content, headers,
+            "attachment; filename*=UTF-8''%s.txt" % item.lstrip("_"))
+
+    @staticmethod
+    def _ranged(content, headers, disposition):
+        matched = re.match(r"bytes=(\d+)-(\d*)", headers.get("Range") or "")
+        if matched and int(matched.group(1)) >= len(content):
+            return FakeResponse(
+                status=416,
+                headers={"Content-Range": "bytes */%d" % len(content)})
+        if not matched:
+            return FakeResponse(content,
+                                headers={
+                                    "Content-Type": "application/octet-stream",
+                                    "Content-Disposition": disposition
+                                })
+
+        start = int(matched.group(1))
+        end = int(matched.group(2) or len(content) - 1)
+        return FakeResponse(
+            content[start:end + 1],
+            status=206,
+            headers={
+                "Content-Type": "application/octet-stream",
+                "Content-Range": "bytes %d-%d/%d" % (start, end, len(content))
+            })
+
+    def _page(self, url, params, collection, total):
+        start_index = int(params.get("_startIndex", 0))
+        page_size = int(params.get("oslc_cm.pageSize", 100))
+        return self._xml(
+            collection.page(total,
+                            start_index=start_index,
+                            page_size=page_size,
+                            next_url=next_page_url(url, start_index, page_size),
+                            properties=params.get("oslc_cm.properties")))
+
+    @staticmethod
+    def _negotiate(headers, resp):
+        # the workitems are served in JSON as well
+        if "json" not in (headers.get("Accept") or ""):
+            return resp
+        resp.body = to_oslc_json(resp.body).encode("UTF-8")
+        resp.headers["Content-Type"] = JSON_CONTENT_TYPE
+        return resp
+
+    def _xml(self, content, status=200):
+        # point the links of the fixtures to this server
+        origin = self.url.rsplit("/", 1)[0]
+        content = content.replace(BASE_URL + "/", self.url + "/").replace(
+            BASE_URL.rsplit("/", 1)[0] + "/", origin + "/")
+        return FakeResponse(content,
+                            status=status,
+                            headers={"Content-Type": "application/xml"})
+
+
+def _get_json_links(body, tag):
+    """Get the urls of the links in a JSON request body, or `None` if the
+    property is not updated"""
+
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        # e.g. the RDF/XML bodies
+        return None
+    if not isinstance(data, dict) or tag not in data:
+        return None
+    links = data[tag] or []
+    if isinstance(links, dict):
+        links = [links]
+    return [link["rdf:resource"] for link in links]
+
+
+class _FakeRTCHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = list()
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _handle(self):
+        body = self._read_body()
+        resp = self.server.fake.handle(self.command, self.path, self.headers,
+                                       body)
+        self.send_response(resp.status)
+        for key, value in resp.headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(resp.body)))
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        if resp.truncate is None:
+            self.wfile.write(resp.body)
+        else:
+            self.wfile.write(resp.body[:resp.truncate])
+            self.close_connection = True
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _handle
+
+    def log_message(self, format, *args):
+        FakeRTCServer.log.debug("%s - %s", self.address_string(), format % args)
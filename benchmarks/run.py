@@ -0,0 +1,268 @@
+"""Run the offline benchmarks of rtcclient
+
+The benchmarks drive the parsing and object-building paths of rtcclient
+against :class:`benchmarks.transport.FixtureTransport`, which serves the
+test fixtures scaled to the requested number of entries::
+
+    python -m benchmarks.run --scale 10000 --output results.json
+    python -m benchmarks.compare baseline.json results.json
+"""
+
+import argparse
+import collections
+import datetime
+import gc
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.data import BASE_URL, FIXTURES_PATH, PROJECTAREA_ID
+from benchmarks.transport import FixtureTransport
+from rtcclient.client import RTCClient
+
+FORMAT_VERSION = 1
+
+CREATE_KWARGS = {
+    "severity": "Normal",
+    "priority": "High",
+    "filedAgainst": "Category 1",
+    "plannedFor": "Sprint 1 (1.0)",
+    "teamArea": "Team1",
+    "ownedBy": "tester1@email.com",
+}
+
+
+def bench_get_workitems(client, transport, scale):
+    transport.workitems = scale
+
+    def run():
+        return len(client.getWorkitems(projectarea_id=PROJECTAREA_ID) or [])
+
+    return run
+
+
+def bench_get_workitems_compact(client, transport, scale):
+    transport.workitems = scale
+
+    def run():
+        return len(
+            client.getWorkitems(projectarea_id=PROJECTAREA_ID, compact=True) or
+            [])
+
+    return run
+
+
+def bench_query_workitems(client, transport, scale):
+    transport.workitems = scale
+
+    def run():
+        workitems = client.queryWorkitems('dc:type="defect"',
+                                          projectarea_id=PROJECTAREA_ID)
+        return len(workitems or [])
+
+    return run
+
+
+def bench_get_children(client, transport, scale):
+    transport.children = scale
+    workitem = client.getWorkitem(161)
+
+    def run():
+        return len(workitem.getChildren() or [])
+
+    return run
+
+
+def bench_create_workitem(client, transport, scale):
+    # creating a workitem costs far more requests than fetching one
+    count = max(1, scale // 10)
+
+    def run():
+        for index in range(count):
+            client.createWorkitem("Defect",
+                                  "benchmark workitem %d" % index,
+                                  description="created by the benchmark",
+                                  projectarea_id=PROJECTAREA_ID,
+                                  template="issue_example.template",
+                                  **CREATE_KWARGS)
+        return count
+
+    return run
+
+
+def bench_create_workitems(client, transport, scale):
+    count = max(1, scale // 10)
+    specs = [
+        dict(CREATE_KWARGS,
+             title="benchmark workitem %d" % index,
+             description="created by the benchmark") for index in range(count)
+    ]
+
+    def run():
+        results = client.createWorkitems(specs,
+                                         template="issue_example.template",
+                                         item_type="Defect",
+                                         projectarea_id=PROJECTAREA_ID)
+        return sum(1 for result in results if result.ok)
+
+    return run
+
+
+def bench_render_template(client, transport, scale):
+    kwargs = dict((key, "%s/%s" % (BASE_URL, value))
+                  for key, value in CREATE_KWARGS.items())
+
+    def run():
+        for index in range(scale):
+            client.templater.render("issue_example.template",
+                                    title="benchmark workitem %d" % index,
+                                    description="rendered by the benchmark",
+                                    **kwargs)
+        return scale
+
+    return run
+
+
+BENCHMARKS = collections.OrderedDict([
+    ("getWorkitems", bench_get_workitems),
+    ("getWorkitemsCompact", bench_get_workitems_compact),
+    ("queryWorkitems", bench_query_workitems),
+    ("getChildren", bench_get_children),
+    ("createWorkitem", bench_create_workitem),
+    ("createWorkitems", bench_create_workitems),
+    ("renderTemplate", bench_render_template),
+])
+
+
+def run_benchmark(name, scale, repeat=3, measure_memory=True):
+    """Run a single benchmark
+
+    The best elapsed time of `repeat` runs is reported. The memory peak is
+    measured in an extra run, because tracing the allocations slows down
+    the code a lot.
+
+    :param name: the benchmark name (a key of `BENCHMARKS`)
+    :param scale: the number of the entries to handle
+    :param repeat: (default is 3) the number of the timed runs
+    :param measure_memory: (default is `True`) whether to measure the
+        memory peak
+    :return: a :class:`dict` contains the items, elapsed seconds, throughput
+        (items per second), memory peak (bytes) and request counts
+    :rtype: dict
+    """
+
+    with FixtureTransport() as transport:
+        client = RTCClient(BASE_URL,
+                           "tester1@email.com",
+                           "password",
+                           searchpath=FIXTURES_PATH)
+        func = BENCHMARKS[name](client, transport, scale)
+
+        timings = list()
+        for _ in range(max(1, repeat)):
+            client.metrics.reset()
+            gc.collect()
+            start = time.perf_counter()
+            items = func()
+            timings.append(time.perf_counter() - start)
+        requests = dict(
+            (kind, stats["count"])
+            for kind, stats in client.metrics.as_dict()["requests"].items())
+
+        peak_memory = None
+        if measure_memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                func()
+                peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+    seconds = min(timings)
+    return {
+        "items": items,
+        "seconds": seconds,
+        "throughput": items / seconds if seconds else None,
+        "peak_memory": peak_memory,
+        "requests": sum(requests.values()),
+        "requests_by_endpoint": requests,
+    }
+
+
+def run_benchmarks(names, scale, repeat=3, measure_memory=True):
+    """Run the benchmarks and collect the results in the output format
+
+    :return: a :class:`dict` which can be dumped as JSON
+    :rtype: dict
+    """
+
+    results = collections.OrderedDict()
+    for name in names:
+        results[name] = run_benchmark(name,
+                                      scale,
+                                      repeat=repeat,
+                                      measure_memory=measure_memory)
+        print(format_result(name, results[name]))
+
+    return {
+        "version": FORMAT_VERSION,
+        "created": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "repeat": repeat,
+        "benchmarks": results,
+    }
+
+
+def format_result(name, result):
+    peak_memory = result["peak_memory"]
+    return ("%-16s %8d items %10.3fs %12.1f items/s %10s peak %8d requests" %
+            (name, result["items"], result["seconds"], result["throughput"] or
+             0, "-" if peak_memory is None else "%.1fMB" %
+             (peak_memory / 1024.0 / 1024.0), result["requests"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale",
+                        type=int,
+                        default=1000,
+                        help="the number of entries to handle, e.g. 10000 "
+                        "(default: %(default)s)")
+    parser.add_argument("--repeat",
+                        type=int,
+                        default=3,
+                        help="the number of timed runs (default: %(default)s)")
+    parser.add_argument("--only",
+                        action="append",
+                        choices=list(BENCHMARKS),
+                        help="only run this benchmark, can be repeated")
+    parser.add_argument("--no-memory",
+                        action="store_true",
+                        help="skip measuring the memory peak")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--log-level",
+                        default="ERROR",
+                        help="the logging level of rtcclient "
+                        "(default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper())
+    results = run_benchmarks(args.only or list(BENCHMARKS),
+                             args.scale,
+                             repeat=args.repeat,
+                             measure_memory=not args.no_memory)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
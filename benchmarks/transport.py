@@ -0,0 +1,176 @@
+import re
+import threading
+from unittest import mock
+
+import requests
+
+from benchmarks.data import BASE_URL, FixtureCollection, next_page_url
+from benchmarks.data import read_fixture
+from rtcclient import urlparse
+
+CHILDREN_TAG = "rtc_cm:com.ibm.team.workitem.linktype.parentworkitem.children"
+
+# the static collections which are served as they are
+STATIC_FIXTURES = [
+    (r"oslc/projectareas", "projectareas.xml"),
+    (r"oslc/types/[^/]+", "itemtypes.xml"),
+    (r"oslc/enumerations/[^/]+/severity", "severities.xml"),
+    (r"oslc/enumerations/[^/]+/priority", "priorities.xml"),
+    (r"oslc/teamareas", "teamareas.xml"),
+    (r"oslc/categories", "filedagainsts.xml"),
+    (r"oslc/iterations", "plannedfors.xml"),
+    (r"oslc/deliverables", "foundins.xml"),
+]
+
+
+class FixtureTransport(object):
+    """An in-process transport which patches `requests` to serve the test
+    fixtures, scaled to the configured number of workitems and children
+
+    No socket is opened, so the measured time is spent in rtcclient itself
+    (building the requests, parsing the responses and constructing the
+    objects)::
+
+        with FixtureTransport(workitems=10000) as transport:
+            myclient = RTCClient(BASE_URL, "tester1@email.com", "password")
+            myclient.getWorkitems(projectarea_id=PROJECTAREA_ID)
+        print(transport.requests)
+
+    :param workitems: (default is 1000) the number of workitems in a
+        project area
+    :param children: (default is 100) the number of children of a workitem
+    :param base_url: the url of the fake RTC server
+    """
+
+    def __init__(self, workitems=1000, children=100, base_url=BASE_URL):
+        self.workitems = workitems
+        self.children = children
+        self.base_url = base_url.rstrip("/")
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._patchers = list()
+        self._workitems = FixtureCollection("workitems.xml",
+                                            "oslc_cm:ChangeRequest")
+        self._children = FixtureCollection("children.xml",
+                                           "oslc_cm:ChangeRequest",
+                                           start_id=200000)
+        self._static = [(re.compile("^%s$" % path), read_fixture(file_name))
+                        for path, file_name in STATIC_FIXTURES]
+        self._created = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *excinfo):
+        self.stop()
+        return False
+
+    def start(self):
+        """Patch `requests.get/post/put/delete`"""
+
+        for method in ["get", "post", "put", "delete"]:
+            # a plain function instead of a mock, which would keep all the
+            # calls in memory
+            patcher = mock.patch("requests.%s" % method,
+                                 new=self._make_handler(method))
+            patcher.start()
+            self._patchers.append(patcher)
+
+    def stop(self):
+        """Restore `requests.get/post/put/delete`"""
+
+        while self._patchers:
+            self._patchers.pop().stop()
+
+    def _make_handler(self, method):
+
+        def handler(url, **kwargs):
+            return self.handle(method.upper(), url, **kwargs)
+
+        return handler
+
+    def handle(self, method, url, **kwargs):
+        """Serve a request
+
+        :param method: the HTTP method
+        :param url: the request url
+        :return: the :class:`requests.Response` object
+        :rtype: requests.Response
+        """
+
+        with self._lock:
+            self.requests += 1
+
+        parsed = urlparse.urlparse(url)
+        path = parsed.path
+        base_path = urlparse.urlparse(self.base_url).path
+        if path.startswith(base_path + "/"):
+            path = path[len(base_path) + 1:]
+        params = dict(urlparse.parse_qsl(parsed.query))
+
+        if path.startswith("authenticated/"):
+            return self._response(url, "", headers={"set-cookie": "JSESSIONID"})
+
+        if method == "POST" and re.match(r"^oslc/contexts/[^/]+/workitems/",
+                                         path):
+            with self._lock:
+                self._created += 1
+                index = self._created
+            return self._response(url,
+                                  self._workitems.resource(index),
+                                  status_code=201)
+
+        if method != "GET":
+            return self._response(url, self._workitems.resource(0))
+
+        if re.match(r"^oslc/contexts/[^/]+/workitems$", path):
+            return self._page(url, params, self._workitems, self.workitems)
+
+        matched = re.match(r"^oslc/workitems/(\d+)$", path)
+        if matched:
+            index = int(matched.group(1)) - self._workitems.start_id
+            return self._response(
+                url,
+                self._workitems.resource(
+                    max(0, index), properties=params.get("oslc_cm.properties")))
+
+        if path.endswith("/" + CHILDREN_TAG):
+            return self._page(url, params, self._children, self.children)
+
+        for pattern, content in self._static:
+            if pattern.match(path):
+                return self._response(url, content)
+
+        # any linked resource, e.g. the owner, state or project area
+        title = urlparse.unquote(path.rstrip("/").split("/")[-1])
+        return self._response(
+            url, "".join([
+                '<rtc_cm:Resource xmlns:rtc_cm="http://jazz.net/xmlns/prod/'
+                'jazz/rtc/cm/1.0/" xmlns:dc="http://purl.org/dc/terms/">',
+                "<dc:title>%s</dc:title></rtc_cm:Resource>" % title
+            ]))
+
+    def _page(self, url, params, collection, total):
+        start_index = int(params.get("_startIndex", 0))
+        page_size = int(params.get("oslc_cm.pageSize", 100))
+        next_url = next_page_url(url, start_index, page_size)
+        return self._response(
+            url,
+            collection.page(total,
+                            start_index=start_index,
+                            page_size=page_size,
+                            next_url=next_url,
+                            properties=params.get("oslc_cm.properties")))
+
+    @staticmethod
+    def _response(url, content, status_code=200, headers=None):
+        resp = requests.Response()
+        resp.status_code = status_code
+        resp.url = url
+        resp.encoding = "UTF-8"
+        resp._content = content.encode("UTF-8")
+        resp.headers["Content-Type"] = "application/xml"
+        resp.headers["Content-Length"] = str(len(resp._content))
+        resp.headers.update(headers or {})
+        return resp
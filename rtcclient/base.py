@@ -1,11 +1,22 @@
 from multiprocessing.pool import ThreadPool as Pool
 import abc
+import contextlib
+import json as jsonlib
 import logging
+import os
+import re
+import time
 from rtcclient import requests
 import xmltodict
 from rtcclient import urlunquote, OrderedDict
 from rtcclient import exception
+from rtcclient import oslc_json
+from rtcclient.metrics import normalize_endpoint
+from rtcclient.tracing import NOOP_SPAN
+from rtcclient.streams import CHUNK_SIZE, PROGRESS_INTERVAL
+from rtcclient.utils import get_body_size, get_data_size, is_retryable_error
 from rtcclient.utils import token_expire_handler
+from rtcclient.xmlstream import CollectionParser
 
 
 class RTCBase(object):
@@ -87,12 +98,13 @@ class RTCBase(object):
         """
 
         self.log.debug("Get response from %s", url)
-        response = requests.get(url,
-                                verify=verify,
-                                headers=headers,
-                                proxies=proxies,
-                                timeout=timeout,
-                                **kwargs)
+        response = self._send("GET",
+                              url,
+                              verify=verify,
+                              headers=headers,
+                              proxies=proxies,
+                              timeout=timeout,
+                              **kwargs)
         if response.status_code != 200:
             self.log.error("Failed GET request at <%s> with response: %s", url,
                            response.content)
@@ -133,14 +145,15 @@ class RTCBase(object):
 
         self.log.debug("Post a request to %s with data: %s and json: %s", url,
                        data, json)
-        response = requests.post(url,
-                                 data=data,
-                                 json=json,
-                                 verify=verify,
-                                 headers=headers,
-                                 proxies=proxies,
-                                 timeout=timeout,
-                                 **kwargs)
+        response = self._send("POST",
+                              url,
+                              data=data,
+                              json=json,
+                              verify=verify,
+                              headers=headers,
+                              proxies=proxies,
+                              timeout=timeout,
+                              **kwargs)
 
         if response.status_code not in [200, 201]:
             self.log.error("Failed POST request at <%s> with response: %s", url,
@@ -179,13 +192,14 @@ class RTCBase(object):
         """
 
         self.log.debug("Put a request to %s with data: %s", url, data)
-        response = requests.put(url,
-                                data=data,
-                                verify=verify,
-                                headers=headers,
-                                proxies=proxies,
-                                timeout=timeout,
-                                **kwargs)
+        response = self._send("PUT",
+                              url,
+                              data=data,
+                              verify=verify,
+                              headers=headers,
+                              proxies=proxies,
+                              timeout=timeout,
+                              **kwargs)
         if response.status_code not in [200, 201]:
             self.log.error("Failed PUT request at <%s> with response: %s", url,
                            response.content)
@@ -219,18 +233,344 @@ class RTCBase(object):
         """
 
         self.log.debug("Delete a request to %s", url)
-        response = requests.delete(url,
-                                   headers=headers,
-                                   verify=verify,
-                                   proxies=proxies,
-                                   timeout=timeout,
-                                   **kwargs)
+        response = self._send("DELETE",
+                              url,
+                              headers=headers,
+                              verify=verify,
+                              proxies=proxies,
+                              timeout=timeout,
+                              **kwargs)
         if response.status_code not in [200, 201]:
             self.log.error("Failed DELETE request at <%s> with response: %s",
                            url, response.content)
             response.raise_for_status()
         return response
 
+    def _open_download(self, url, received=0):
+        """Send a streamed GET request of the content, starting from the
+        byte `received` with a `Range` request
+
+        :param url: the content url
+        :param received: (default is 0) the bytes already received
+        :return: the streamed response, which has to be closed
+        :rtype: requests.Response
+        """
+
+        rtc_obj = self.get_rtc_obj()
+        relogged = False
+        while True:
+            headers = dict(rtc_obj.headers)
+            headers.pop("Content-Type", None)
+            headers["Accept"] = "*/*"
+            if received:
+                headers["Range"] = "bytes=%d-" % received
+            response = self._send("GET",
+                                  url,
+                                  verify=rtc_obj.verify,
+                                  proxies=rtc_obj.proxies,
+                                  headers=headers,
+                                  stream=True,
+                                  timeout=60)
+            auth_msg = response.headers.get(
+                "X-com-ibm-team-repository-web-auth-msg")
+            if auth_msg != "authrequired" or relogged:
+                return response
+            # the session expires
+            response.close()
+            relogged = True
+            rtc_obj.relogin()
+
+    def _download(self,
+                  url,
+                  file_path,
+                  size=None,
+                  retries=3,
+                  progress=None,
+                  response=None):
+        """Download the content to a file chunk by chunk
+
+        The content is written to "<file_path>.part" and renamed once its
+        size is verified. An interrupted download (including a part file
+        left by an earlier call) is resumed with a `Range` request.
+
+        :param url: the content url
+        :param file_path: the file path
+        :param size: (optional) the expected size in bytes. The size given
+            by the RTC server is verified if not specified
+        :param retries: (default is 3) the number of the resumes when the
+            connection fails
+        :param progress: (optional) the function called with the bytes
+            received and the total bytes (`None` if unknown)
+        :param response: (optional) the streamed response of the whole
+            content (refer to :meth:`_open_download`), e.g. whose headers
+            are used to name the file
+        :return: the file path
+        :rtype: str
+        """
+
+        part_path = file_path + ".part"
+        if response is not None:
+            received = 0
+        elif os.path.exists(part_path):
+            received = os.path.getsize(part_path)
+        else:
+            received = 0
+        attempt = 0
+        while True:
+            try:
+                if response is None:
+                    response = self._open_download(url, received)
+                try:
+                    if response.status_code == 416 and received:
+                        if received == _get_content_total(response, size):
+                            # the part file is complete
+                            break
+                        self.log.warning(
+                            "The part file of %s is longer than the "
+                            "content, download it again", url)
+                        os.remove(part_path)
+                        received = 0
+                        continue
+                    if response.status_code not in (200, 206):
+                        self.log.error(
+                            "Failed GET request at <%s> with "
+                            "status %s", url, response.status_code)
+                        response.raise_for_status()
+                    total = _get_content_total(response, received)
+                    if response.status_code == 200 and received:
+                        self.log.warning(
+                            "%s does not support Range requests, "
+                            "download it again", url)
+                        received = 0
+                    if size is None:
+                        size = total
+                    received = self._write_content(response, part_path,
+                                                   received, size, progress)
+                    break
+                finally:
+                    response.close()
+                    response = None
+            except Exception as excp:
+                if attempt >= retries or not is_retryable_error(excp):
+                    raise
+                attempt += 1
+                if os.path.exists(part_path):
+                    received = os.path.getsize(part_path)
+                self.log.warning(
+                    "Resume the download of %s from byte %s (%s/%s): %s", url,
+                    received, attempt, retries, excp)
+
+        if size is not None and received != size:
+            if received > size:
+                os.remove(part_path)
+            raise exception.RTCException(
+                "The size of %s is %s bytes instead of %s" %
+                (file_path, received, size))
+        os.replace(part_path, file_path)
+        self.log.info("Successfully download %s bytes to %s", received,
+                      file_path)
+        return file_path
+
+    def _write_content(self, response, part_path, received, size, progress):
+        """Append the streamed content to the part file, and return the
+        size of the part file"""
+
+        reported = received
+        with open(part_path, "ab" if received else "wb") as fp:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                fp.write(chunk)
+                received += len(chunk)
+                interval = received - reported
+                if progress is not None and (interval >= PROGRESS_INTERVAL or
+                                             received == size):
+                    reported = received
+                    progress(received, size)
+        return received
+
+    def _send(self, method, url, **kwargs):
+        """Send the request with the :mod:`requests` module (or serve it
+        from the cassette of the RTC server) and record the request metrics
+
+        :param method: the HTTP method (e.g. GET/POST)
+        :param url: URL for the new :class:`Request` object.
+        :param kwargs: Optional arguments that ``request`` takes.
+        :return: :class:`Response <Response>` object
+        :rtype: requests.Response
+        """
+
+        send_request = getattr(requests, method.lower())
+        with self._span(
+                "rtcclient.request", **{
+                    "http.method": method,
+                    "http.url": url,
+                    "rtcclient.endpoint": self._get_endpoint(url)
+                }) as span:
+            cassette = getattr(self.get_rtc_obj(), "cassette", None)
+            start = time.perf_counter()
+            try:
+                if cassette is not None:
+                    response = cassette.play(method, url, send_request,
+                                             **kwargs)
+                else:
+                    response = send_request(url, **kwargs)
+            except Exception:
+                self._record_request(method, url, None,
+                                     time.perf_counter() - start, kwargs, span)
+                raise
+            self._record_request(method, url, response,
+                                 time.perf_counter() - start, kwargs, span)
+        return response
+
+    def _span(self, name, **attributes):
+        """Start a span with the tracer of the RTC server
+
+        Refer to :class:`rtcclient.tracing.Tracer` for all the spans
+        """
+
+        tracer = getattr(self.get_rtc_obj(), "tracer", None)
+        if tracer is None:
+            return contextlib.nullcontext(NOOP_SPAN)
+        return tracer.span(name, **attributes)
+
+    def _get_observers(self):
+        """Get the metrics registry and the active profilers which record
+        the requests of this RTC server"""
+
+        rtc_obj = self.get_rtc_obj()
+        observers = list(getattr(rtc_obj, "_profilers", None) or [])
+        metrics = getattr(rtc_obj, "metrics", None)
+        if metrics is not None:
+            observers.append(metrics)
+        return observers
+
+    def _get_endpoint(self, url):
+        rtc_obj = self.get_rtc_obj()
+        return normalize_endpoint(url, getattr(rtc_obj, "url", self.url))
+
+    def _record_request(self,
+                        method,
+                        url,
+                        response,
+                        elapsed,
+                        kwargs,
+                        span=NOOP_SPAN):
+        observers = self._get_observers()
+        if not observers and span is NOOP_SPAN:
+            return
+
+        if response is None:
+            status, bytes_received = "error", 0
+        else:
+            status = response.status_code
+            bytes_received = get_body_size(response, kwargs.get("stream"))
+        bytes_sent = get_data_size(kwargs.get("data"))
+        if not bytes_sent and kwargs.get("json") is not None:
+            bytes_sent = len(jsonlib.dumps(kwargs.get("json")))
+        span.set_attribute("http.status_code", status)
+        span.set_attribute("rtcclient.bytes_sent", bytes_sent)
+        span.set_attribute("rtcclient.bytes_received", bytes_received)
+
+        endpoint = self._get_endpoint(url)
+        for observer in observers:
+            observer.record_request(method,
+                                    endpoint,
+                                    status,
+                                    elapsed,
+                                    bytes_sent=bytes_sent,
+                                    bytes_received=bytes_received)
+
+    def _record_build(self, resource_name, elapsed):
+        for observer in self._get_observers():
+            observer.record_build(resource_name, elapsed)
+
+    def _record_cache(self, name, hit):
+        for observer in self._get_observers():
+            observer.record_cache(name, hit)
+
+    def _parse(self, parse, content, url=None):
+        """Parse the response body and record the parse time
+
+        :param parse: the function to parse the response body
+        :param content: the response body
+        :param url: (optional) the request url, used to group the parse time
+        :return: the parsed result
+        """
+
+        with self._span(
+                "rtcclient.parse", **{
+                    "rtcclient.endpoint": self._get_endpoint(url),
+                    "rtcclient.bytes": get_data_size(content)
+                }):
+            start = time.perf_counter()
+            result = parse(content)
+            elapsed = time.perf_counter() - start
+        observers = self._get_observers()
+        if observers:
+            endpoint = self._get_endpoint(url)
+            for observer in observers:
+                observer.record_parse(endpoint, elapsed)
+        return result
+
+    def _parse_xml(self, content, url=None):
+        """Parse the XML response body into the raw data (OrderedDict) and
+        record the parse time
+
+        :param content: the response body
+        :param url: (optional) the request url, used to group the parse time
+        :return: the parsed :class:`OrderedDict` object
+        """
+
+        return self._parse(xmltodict.parse, content, url)
+
+    def _parse_collection(self, content, entry_tag, url=None):
+        """Parse the XML response body of a collection incrementally with
+        :class:`rtcclient.xmlstream.CollectionParser` and record the parse
+        time
+
+        :param content: the response body
+        :param entry_tag: the qualified name of the entries (e.g.
+            oslc_cm:ChangeRequest)
+        :param url: (optional) the request url, used to group the parse time
+        :return: a :class:`tuple` contains the qualified name of the root
+            element, the attributes of the root element and the
+            :class:`list` of the entries
+        :rtype: tuple
+        """
+
+        def parse(content):
+            parser = CollectionParser(content, entry_tag)
+            entries = list(parser)
+            return parser.tag, parser.attributes, entries
+
+        return self._parse(parse, content, url)
+
+    def _parse_json(self, content, url=None):
+        """Parse the OSLC JSON response body into the same raw data as
+        :meth:`_parse_xml` and record the parse time
+
+        Refer to :func:`rtcclient.oslc_json.loads` for the mapping.
+
+        :param content: the response body
+        :param url: (optional) the request url, used to group the parse time
+        :return: the raw data of the resource
+        :rtype: dict
+        """
+
+        return self._parse(oslc_json.loads, content, url)
+
+    def _parse_json_collection(self, content, url=None):
+        """Parse the OSLC JSON response body of a collection and record the
+        parse time
+
+        :param content: the response body
+        :param url: (optional) the request url, used to group the parse time
+        :return: a :class:`tuple` contains the attributes of the collection
+            and the :class:`list` of the entries
+        :rtype: tuple
+        """
+
+        return self._parse(oslc_json.loads_collection, content, url)
+
     @classmethod
     def validate_url(cls, url):
         """Strip and trailing slash to validate a url
@@ -266,10 +606,15 @@ class FieldBase(RTCBase):
         self.field_alias = dict()
         self.rtc_obj = rtc_obj
         self.raw_data = raw_data
-        if raw_data is not None:
-            self.__initializeFromRaw()
-        elif self.url:
-            self._initialize()
+        with self._span(
+                "rtcclient.build", **{
+                    "rtcclient.resource": self.__class__.__name__,
+                    "rtcclient.url": self.url or ""
+                }):
+            if raw_data is not None:
+                self.__initializeFromRaw()
+            elif self.url:
+                self._initialize()
 
     @abc.abstractmethod
     def __str__(self):
@@ -295,7 +640,7 @@ class FieldBase(RTCBase):
     def __initialize(self, resp):
         """Initialize from the response"""
 
-        raw_data = xmltodict.parse(resp.content)
+        raw_data = self._parse_xml(resp.content, self.url)
         root_key = list(raw_data.keys())[0]
         self.raw_data = raw_data.get(root_key)
         self.__initializeFromRaw()
@@ -303,14 +648,26 @@ class FieldBase(RTCBase):
     def __initializeFromRaw(self):
         """Initialze from raw data (OrderedDict)"""
 
+        if not self.raw_data:
+            # e.g. a workitem to be updated without being retrieved
+            return
+        for key, attr, value in self._process_raw_data(self.raw_data):
+            self.field_alias[attr] = key
+            self.setattr(attr, value)
+
+    def _process_raw_data(self, raw_data):
+        """Process the items of the raw data concurrently
+
+        :return: a :class:`list` of the (property name, attribute name,
+            value) of the attributes
+        """
+
         with Pool() as pool:
-            for processed in pool.map(self.__process_items,
-                                      self.raw_data.items()):
-                if processed is None:
-                    continue
-                key, attr, value = processed
-                self.field_alias[attr] = key
-                self.setattr(attr, value)
+            return [
+                processed for processed in pool.map(self.__process_items,
+                                                    raw_data.items())
+                if processed is not None
+            ]
 
     def __process_items(self, item):
         """Process a single work item element"""
@@ -338,11 +695,17 @@ class FieldBase(RTCBase):
                 value = list(value.values())[0]
 
                 try:
-                    value = self.__get_rdf_resource_title(value)
+                    value = self._get_link_title(value)
                 except (exception.RTCException, Exception):
                     self.log.error("Unable to handle %s", value)
         return key, attr, value
 
+    def _get_link_title(self, rdf_url):
+        """Get the title of the linked resource, which is the value of the
+        attribute of the link"""
+
+        return self.__get_rdf_resource_title(rdf_url)
+
     def __get_rdf_resource_title(self, rdf_url):
         # handle for /jts/users
         if "/jts/users" in rdf_url:
@@ -362,7 +725,7 @@ class FieldBase(RTCBase):
             proxies=self.rtc_obj.proxies,
             headers=self.rtc_obj.headers,
         )
-        raw_data = xmltodict.parse(resp.content)
+        raw_data = self._parse_xml(resp.content, rdf_url)
 
         root_key = list(raw_data.keys())[0]
         total_count = raw_data[root_key].get("@oslc_cm:totalCount")
@@ -404,3 +767,22 @@ class FieldBase(RTCBase):
 
     def setattr(self, attr, value):
         self.__setattr__(attr, value)
+
+
+def _get_content_total(response, received):
+    """Get the total size of the content from `Content-Range` (206 and 416)
+    or `Content-Length` (200), or `None` if unknown"""
+
+    if response.status_code == 416:
+        matched = re.match(r"bytes \*/(\d+)",
+                           response.headers.get("Content-Range") or "")
+        return int(matched.group(1)) if matched else received
+    if response.status_code == 206:
+        matched = re.match(r"bytes (\d+)-\d+/(\d+)",
+                           response.headers.get("Content-Range") or "")
+        if not matched or int(matched.group(1)) != received:
+            raise exception.RTCException("Unexpected Content-Range: %s" %
+                                         response.headers.get("Content-Range"))
+        return int(matched.group(2))
+    length = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
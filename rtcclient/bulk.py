@@ -0,0 +1,84 @@
+import logging
+from multiprocessing.pool import ThreadPool as Pool
+
+from rtcclient import exception
+
+log = logging.getLogger("bulk")
+
+
+class BulkResult(object):
+    """The result of one item of a bulk operation (e.g.
+    :meth:`rtcclient.client.RTCClient.createWorkitems`)
+
+    :param index: the index of the item in the input
+    :param item: the input item
+    :param value: (optional) the result value, e.g. the created
+        :class:`rtcclient.workitem.Workitem` object
+    :param error: (optional) the exception raised for this item
+    """
+
+    __slots__ = ("index", "item", "value", "error")
+
+    def __init__(self, index, item, value=None, error=None):
+        self.index = index
+        self.item = item
+        self.value = value
+        self.error = error
+
+    def __repr__(self):
+        if self.error is not None:
+            return "<BulkResult %s error=%r>" % (self.index, self.error)
+        return "<BulkResult %s %r>" % (self.index, self.value)
+
+    @property
+    def ok(self):
+        """Whether the item succeeded"""
+
+        return self.error is None
+
+
+def validate_concurrency(concurrency):
+    """Check the maximum number of the requests in flight
+
+    :param concurrency: the maximum number of the requests in flight
+    :return: the valid concurrency
+    :rtype: int
+    """
+
+    if (isinstance(concurrency, bool) or not isinstance(concurrency, int) or
+            concurrency < 1):
+        raise exception.BadValue("Invalid concurrency: %s" % concurrency)
+    return concurrency
+
+
+def run_bulk(func, items, concurrency=8):
+    """Call the function for each item with at most `concurrency` calls in
+    flight, and collect the results in the input order
+
+    The exceptions raised for an item are kept in its
+    :class:`BulkResult` instead of stopping the other items.
+
+    :param func: the function called with each item
+    :param items: the input items
+    :param concurrency: (default is 8) the maximum number of the calls in
+        flight
+    :return: a :class:`list` of :class:`BulkResult` objects in the input
+        order
+    :rtype: list
+    """
+
+    concurrency = validate_concurrency(concurrency)
+    items = list(items)
+
+    def call(indexed):
+        index, item = indexed
+        try:
+            return BulkResult(index, item, value=func(item))
+        except Exception as excp:
+            log.error("Failed to handle item %s: %s", index, excp)
+            return BulkResult(index, item, error=excp)
+
+    if concurrency == 1 or len(items) <= 1:
+        return [call(indexed) for indexed in enumerate(items)]
+    with Pool(min(concurrency, len(items))) as pool:
+        return pool.map(call, enumerate(items))
@@ -0,0 +1,304 @@
+import base64
+import gzip
+import json
+import logging
+import tempfile
+import threading
+import time
+
+from rtcclient import exception
+from rtcclient import requests
+from rtcclient import urlencode
+
+RECORD = "record"
+REPLAY = "replay"
+
+# the request bodies of these endpoints contain the credentials, which are
+# neither stored nor matched
+_CREDENTIAL_ENDPOINTS = ("j_security_check",)
+_DROPPED_HEADERS = frozenset(
+    ["content-encoding", "transfer-encoding", "content-length"])
+# the bytes of a streamed response body kept in memory while it is
+# recorded, the rest is spooled to a temporary file
+_SPOOL_SIZE = 2**20
+
+
+class Cassette(object):
+    """Record the HTTP interactions of
+    :class:`rtcclient.client.RTCClient` into a compact file, or replay them
+    without any RTC server
+
+    In the record mode, every request is sent to the RTC server and the
+    request/response pair is kept. The interactions are written to the file
+    when the cassette is closed. In the replay mode, the responses are served
+    from the file and a request which was not recorded raises
+    :class:`rtcclient.exception.CassetteMismatch`::
+
+        with Cassette("nightly.json.gz", mode="record") as cassette:
+            myclient = RTCClient(url, username, password, cassette=cassette)
+            myclient.getWorkitems(projectarea_name="ProjectArea")
+
+        with Cassette("nightly.json.gz", mode="replay") as cassette:
+            myclient = RTCClient(url, username, password, cassette=cassette)
+            myclient.getWorkitems(projectarea_name="ProjectArea")
+
+    The requests are matched by the method, the url (with the query
+    parameters) and the body. The same request can be recorded several
+    times, and its responses are replayed in the recorded order.
+
+    The streamed responses (e.g. the downloads of the attachments) are
+    recorded while they are read, without loading them into memory. Only
+    the bytes read are recorded, and a connection dropped in the middle of
+    the body is dropped again when it is replayed.
+
+    :param path: the cassette file path. It is gzip-compressed if the path
+        ends with `.gz`
+    :param mode: (default is "replay") either "record" or "replay"
+    :param latency: (optional) the simulated latency in the replay mode,
+        either the seconds to wait before each response or "recorded" to
+        wait as long as the recorded requests took. No latency if `None`
+    """
+
+    log = logging.getLogger("cassette.Cassette")
+
+    def __init__(self, path, mode=REPLAY, latency=None):
+        if mode not in (RECORD, REPLAY):
+            raise exception.BadValue("Unsupported cassette mode: %s" % mode)
+        if (latency is not None and latency != "recorded" and
+                not isinstance(latency, (int, float))):
+            raise exception.BadValue("Invalid latency: %s" % latency)
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.interactions = list()
+        self._lock = threading.Lock()
+        self._pending = dict()
+        # the index of the interaction to the spooled body of its streamed
+        # response, and whether the body was interrupted
+        self._spools = dict()
+        if mode == REPLAY:
+            self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excinfo):
+        self.close()
+        return False
+
+    def _open(self, mode):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t", encoding="UTF-8")
+        return open(self.path, mode, encoding="UTF-8")
+
+    def load(self):
+        """Load the interactions from the cassette file"""
+
+        with self._open("r") as fh:
+            self.interactions = json.load(fh)["interactions"]
+
+        self._pending = dict()
+        for interaction in self.interactions:
+            key = self._get_key(interaction["request"])
+            self._pending.setdefault(key, list()).append(interaction)
+        self.log.debug("Load %s interactions from %s", len(self.interactions),
+                       self.path)
+
+    def save(self):
+        """Write the recorded interactions to the cassette file"""
+
+        with self._lock:
+            interactions = list(self.interactions)
+            spools = dict(self._spools)
+        # the interactions are written one by one, so that only one spooled
+        # body is loaded at a time
+        with self._open("w") as fh:
+            fh.write('{"version":1,"interactions":[')
+            for index, interaction in enumerate(interactions):
+                if index:
+                    fh.write(",")
+                if index in spools:
+                    interaction = self._load_spool(interaction, *spools[index])
+                json.dump(interaction, fh, separators=(",", ":"))
+            fh.write("]}")
+        self.log.info("Save %s interactions to %s", len(self.interactions),
+                      self.path)
+
+    def close(self):
+        """Save the cassette in the record mode"""
+
+        if self.mode == RECORD:
+            self.save()
+            with self._lock:
+                spools = list(self._spools.values())
+                self._spools.clear()
+            for spool, _ in spools:
+                spool.close()
+
+    def play(self, method, url, send_request, **kwargs):
+        """Send the request in the record mode or serve the recorded
+        response in the replay mode
+
+        :param method: the HTTP method
+        :param url: the request url
+        :param send_request: the function to send the request, e.g.
+            `requests.get`
+        :param kwargs: Optional arguments that ``request`` takes.
+        :return: :class:`Response <Response>` object
+        :rtype: requests.Response
+        """
+
+        request = self._serialize_request(method, url, kwargs)
+        if self.mode == RECORD:
+            start = time.perf_counter()
+            response = send_request(url, **kwargs)
+            elapsed = time.perf_counter() - start
+            stream = kwargs.get("stream", False)
+            interaction = {
+                "request": request,
+                "response": self._serialize_response(response, stream=stream),
+                "elapsed": round(elapsed, 6)
+            }
+            with self._lock:
+                if stream:
+                    self._spools[len(self.interactions)] = self._tee(response)
+                self.interactions.append(interaction)
+            return response
+
+        key = self._get_key(request)
+        with self._lock:
+            pending = self._pending.get(key)
+            interaction = pending.pop(0) if pending else None
+        if interaction is None:
+            excp_msg = ("No recorded interaction matches the request: "
+                        "%s %s" % (method, request["url"]))
+            self.log.error(excp_msg)
+            raise exception.CassetteMismatch(excp_msg)
+
+        latency = (interaction.get("elapsed", 0)
+                   if self.latency == "recorded" else self.latency)
+        if latency:
+            time.sleep(latency)
+        return self._build_response(interaction["response"], request["url"])
+
+    @staticmethod
+    def _get_key(request):
+        return (request["method"], request["url"], request.get("body"))
+
+    @staticmethod
+    def _serialize_request(method, url, kwargs):
+        params = kwargs.get("params")
+        if params:
+            url = requests.Request(method, url, params=params).prepare().url
+
+        body = None
+        data = kwargs.get("data")
+        if kwargs.get("json") is not None:
+            body = json.dumps(kwargs.get("json"), sort_keys=True)
+        elif isinstance(data, dict):
+            body = urlencode(sorted(data.items()))
+        elif isinstance(data, bytes):
+            body = data.decode("UTF-8", "replace")
+        elif isinstance(data, str):
+            body = data
+        elif kwargs.get("files"):
+            # only the file names, since the file objects are consumed
+            body = json.dumps(
+                sorted((name, value[0] if isinstance(value, tuple) else name)
+                       for name, value in kwargs.get("files").items()))
+
+        if url.endswith(_CREDENTIAL_ENDPOINTS):
+            body = None
+        return {"method": method, "url": url, "body": body}
+
+    @staticmethod
+    def _tee(response):
+        """Spool the body of the streamed response while it is read"""
+
+        spooled = [tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE), False]
+        iter_content = response.iter_content
+
+        def tee(chunk_size=1, decode_unicode=False):
+            try:
+                for chunk in iter_content(chunk_size, decode_unicode):
+                    spooled[0].write(chunk if isinstance(chunk, bytes) else
+                                     chunk.encode("UTF-8"))
+                    yield chunk
+            except requests.exceptions.RequestException:
+                spooled[1] = True
+                raise
+
+        response.iter_content = tee
+        return spooled
+
+    @classmethod
+    def _load_spool(cls, interaction, spool, interrupted):
+        spool.seek(0)
+        content = spool.read()
+        spool.seek(0, 2)
+        interaction = dict(interaction)
+        interaction["response"] = dict(interaction["response"])
+        interaction["response"].update(cls._serialize_body(content))
+        if interrupted:
+            interaction["response"]["interrupted"] = True
+        return interaction
+
+    @staticmethod
+    def _serialize_body(content):
+        # the body is stored decoded
+        try:
+            return {"body": content.decode("UTF-8")}
+        except UnicodeDecodeError:
+            return {
+                "body": base64.b64encode(content).decode("ascii"),
+                "encoding": "base64"
+            }
+
+    @classmethod
+    def _serialize_response(cls, response, stream=False):
+        headers = dict((key, value)
+                       for key, value in response.headers.items()
+                       if key.lower() not in _DROPPED_HEADERS)
+        for key in headers:
+            # never store the session tokens
+            if key.lower() == "set-cookie":
+                headers[key] = "JSESSIONID=recorded"
+        serialized = {"status_code": response.status_code, "headers": headers}
+        if stream:
+            # the body is spooled while it is read, and the size given by
+            # the RTC server is kept to replay the interrupted downloads
+            content_length = response.headers.get("Content-Length")
+            if content_length is not None:
+                headers["Content-Length"] = content_length
+            serialized["body"] = ""
+            return serialized
+        content = response.content or b""
+        headers["Content-Length"] = str(len(content))
+        serialized.update(cls._serialize_body(content))
+        return serialized
+
+    @staticmethod
+    def _build_response(serialized, url):
+        response = requests.Response()
+        response.status_code = serialized["status_code"]
+        response.headers.update(serialized["headers"])
+        response.url = url
+        response.encoding = "UTF-8"
+        # the streamed responses are closed without any connection
+        response._content_consumed = True
+        if serialized.get("interrupted"):
+            iter_content = response.iter_content
+
+            def interrupt(chunk_size=1, decode_unicode=False):
+                for chunk in iter_content(chunk_size, decode_unicode):
+                    yield chunk
+                raise requests.exceptions.ChunkedEncodingError(
+                    "The recorded connection was broken")
+
+            response.iter_content = interrupt
+        if serialized.get("encoding") == "base64":
+            response._content = base64.b64decode(serialized["body"])
+        else:
+            response._content = serialized["body"].encode("UTF-8")
+        return response
@@ -1,5 +1,8 @@
+import collections.abc
 import copy
 import logging
+import threading
+import time
 from multiprocessing.pool import ThreadPool as Pool
 
 from typing import Union
@@ -8,19 +11,29 @@ import six
 import xmltodict
 
 from rtcclient import exception
-from rtcclient import urlencode, urlparse, urlquote, OrderedDict
+from rtcclient import urlencode, urlparse, urlquote
 from rtcclient.base import RTCBase
+from rtcclient.bulk import BulkResult, run_bulk, validate_concurrency
+from rtcclient.frame import WorkitemFrame
+from rtcclient.hierarchy import Hierarchy
+from rtcclient.journal import CreateJournal, validate_key
+from rtcclient.metrics import MetricsRegistry
 from rtcclient.models import FiledAgainst, FoundIn, Comment, Action, State  # noqa: F401
 from rtcclient.models import IncludedInBuild, ChangeSet, Attachment  # noqa: F401
 from rtcclient.models import Severity, Priority, ItemType, SavedQuery  # noqa: F401
 from rtcclient.models import TeamArea, Member, Administrator, PlannedFor  # noqa: F401
+from rtcclient.profiler import Profiler, profile_calls
 from rtcclient.project_area import ProjectArea  # noqa: F401
 from rtcclient.query import Query
+from rtcclient.records import RecordBuilder, WorkitemRecord
 from rtcclient.template import Templater
-from rtcclient.utils import capitalize
-from rtcclient.workitem import Workitem  # noqa: F401
+from rtcclient.utils import capitalize, get_body_size, get_etag
+from rtcclient.utils import is_retryable_error
+from rtcclient.workitem import CHILDREN_TAG, Workitem  # noqa: F401
+from rtcclient.writequeue import WriteQueue
 
 
+@profile_calls
 class RTCClient(RTCBase):
     """A wrapped class for :class:`RTC Client` to perform all related
     operations
@@ -37,6 +50,37 @@ class RTCClient(RTCBase):
         the url ends with 'jazz', otherwise to `False` if with 'ccm'
         (Refer to issue #68 for details)
     :type ends_with_jazz: bool
+    :param metrics: (optional) the :class:`rtcclient.metrics.MetricsRegistry`
+        object to record the request/parse/construction metrics. If `None`,
+        a new registry will be created, which is accessible from
+        `RTCClient.metrics`
+    :param tracer: (optional) the :class:`rtcclient.tracing.Tracer` object
+        to emit the spans of requests, pages, parsing and object
+        construction. If `None`, no spans are emitted
+    :param cassette: (optional) the :class:`rtcclient.cassette.Cassette`
+        object to record all the requests/responses into a file, or to
+        replay them from the file without any RTC server
+    :param representation: (default is "xml") the representation of the
+        workitem reads (:meth:`getWorkitem`, :meth:`getWorkitems`,
+        :meth:`queryWorkitems` and the children/parent workitems), either
+        "xml" or "json". The JSON representation
+        (application/x-oslc-cm-change-request+json) is much faster to parse
+        for the large result sets, and is mapped onto the same attributes
+    :param journal: (optional) the :class:`rtcclient.journal.CreateJournal`
+        object to journal the workitems created with idempotency keys. If
+        `None`, the keys are only journaled in memory
+    :param idempotency_property: (default is "dc:subject") the property to
+        store the idempotency keys of the created workitems. The key is
+        added as a tag if it is "dc:subject" (the tags are lowercased by the
+        RTC server, so are the keys), otherwise the property (e.g. a custom
+        attribute) is set to the key
+    :param bytecode_cache: (optional) the folder (or the
+        :class:`jinja2.BytecodeCache` object) to keep the compiled templates
+        across the processes (refer to :class:`rtcclient.template.Templater`)
+    :param file_cache: (optional) the
+        :class:`rtcclient.filecache.FileStateCache` object to keep the
+        fetched file states of the changesets locally, so that each file
+        state is only downloaded once
 
     Tips: You can also customize your preferred properties to be returned
     by specified `returned_properties` when the called methods have
@@ -51,6 +95,10 @@ class RTCClient(RTCBase):
 
     log = logging.getLogger("client.RTCClient")
 
+    # the paged resources which are workitems
+    _WORKITEM_RESOURCES = ("Workitem", "Query", "RunQuery", "Parent",
+                           "Children")
+
     def __init__(self,
                  url,
                  username,
@@ -61,6 +109,14 @@ class RTCClient(RTCBase):
                  ends_with_jazz=True,
                  verify: Union[bool, str] = False,
                  old_rtc_authentication=False,
+                 metrics=None,
+                 tracer=None,
+                 cassette=None,
+                 representation="xml",
+                 journal=None,
+                 idempotency_property="dc:subject",
+                 bytecode_cache=None,
+                 file_cache=None,
                  **kwargs):
         """Initialization
 
@@ -73,6 +129,22 @@ class RTCClient(RTCBase):
         self.proxies = proxies
         self.verify = verify
         self.old_rtc_authentication = old_rtc_authentication
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._profilers = list()
+        self._profilers_lock = threading.Lock()
+        # the actions of the workflows, keyed by the project area id and the
+        # workflow id
+        self._actions = dict()
+        self._actions_lock = threading.Lock()
+        self.tracer = tracer
+        self.cassette = cassette
+        if representation not in ("xml", "json"):
+            raise exception.BadValue("Unsupported representation: %s" %
+                                     representation)
+        self.representation = representation
+        self.journal = journal if journal is not None else CreateJournal()
+        self.idempotency_property = idempotency_property
+        self.file_cache = file_cache
         RTCBase.__init__(self, url, **kwargs)
 
         if not isinstance(ends_with_jazz, bool):
@@ -81,7 +153,9 @@ class RTCClient(RTCBase):
         self.jazz = ends_with_jazz
         self.headers = self._get_headers()
         self.searchpath = searchpath
-        self.templater = Templater(self, searchpath=self.searchpath)
+        self.templater = Templater(self,
+                                   searchpath=self.searchpath,
+                                   bytecode_cache=bytecode_cache)
         self.query = Query(self)
 
     def __str__(self):
@@ -90,6 +164,14 @@ class RTCClient(RTCBase):
     def get_rtc_obj(self):
         return self
 
+    def _get_read_headers(self):
+        """Get the headers to read the workitems in the configured
+        representation"""
+
+        if self.representation == "json":
+            return dict(self.headers, Accept=self.OSLC_CR_JSON)
+        return self.headers
+
     def _get_headers(self):
         if self.jazz is True:
             _allow_redirects = True
@@ -191,6 +273,35 @@ class RTCClient(RTCBase):
         _headers["Accept"] = self.CONTENT_XML
         return _headers
 
+    def profile(self, n_plus_one_threshold=10):
+        """Create a :class:`rtcclient.profiler.Profiler` to record the
+        requests caused by every public call, which can be used either as a
+        context manager or as a decorator::
+
+            with myclient.profile() as p:
+                wk = myclient.getWorkitem(123456)
+                wk.getChildren()
+            print(p.summary())
+
+        :param n_plus_one_threshold: (default is 10) log a warning when a
+            single call sends more requests than this threshold to the same
+            endpoint. Set to `None` to disable the check
+        :return: the :class:`rtcclient.profiler.Profiler` object
+        :rtype: rtcclient.profiler.Profiler
+        """
+
+        return Profiler(self, n_plus_one_threshold=n_plus_one_threshold)
+
+    def _add_profiler(self, profiler):
+        with self._profilers_lock:
+            # replace the list instead of appending to keep it safe for the
+            # threads iterating the current profilers
+            self._profilers = self._profilers + [profiler]
+
+    def _remove_profiler(self, profiler):
+        with self._profilers_lock:
+            self._profilers = [p for p in self._profilers if p is not profiler]
+
     def relogin(self):
         """Relogin the RTC Server/Jazz when the token expires
 
@@ -494,6 +605,9 @@ class RTCClient(RTCBase):
 
     def getOwnedBy(self, username, projectarea_id=None, projectarea_name=None):
 
+        return Member(self._get_member_url(username), self)
+
+    def _get_member_url(self, username):
         parse_result = urlparse.urlparse(self.url)
         new_path = "/".join(["/jts/users", urlquote(username)])
         new_parse_result = urlparse.ParseResult(scheme=parse_result.scheme,
@@ -502,7 +616,7 @@ class RTCClient(RTCBase):
                                                 params=parse_result.params,
                                                 query=parse_result.query,
                                                 fragment=parse_result.fragment)
-        return Member(urlparse.urlunparse(new_parse_result), self)
+        return urlparse.urlunparse(new_parse_result)
 
     def getPlannedFor(self,
                       plannedfor_name,
@@ -1014,15 +1128,19 @@ class RTCClient(RTCBase):
             resp = self.get(req_url,
                             verify=self.verify,
                             proxies=self.proxies,
-                            headers=self.headers)
-            raw_data = xmltodict.parse(resp.content)
-            workitem_raw = raw_data["oslc_cm:ChangeRequest"]
+                            headers=self._get_read_headers())
+            if self.representation == "json":
+                workitem_raw = self._parse_json(resp.content, req_url)
+            else:
+                raw_data = self._parse_xml(resp.content, req_url)
+                workitem_raw = raw_data["oslc_cm:ChangeRequest"]
 
             return Workitem(workitem_url,
                             self,
                             workitem_id=workitem_id,
                             raw_data=workitem_raw,
-                            skip_full_attributes=skip_full_attributes)
+                            skip_full_attributes=skip_full_attributes,
+                            etag=get_etag(resp))
 
         except ValueError:
             excp_msg = "Please input a valid workitem id"
@@ -1037,7 +1155,10 @@ class RTCClient(RTCBase):
                      projectarea_name=None,
                      returned_properties=None,
                      archived=False,
-                     skip_full_attributes=True):
+                     skip_full_attributes=True,
+                     compact=False,
+                     keep_raw_data=False,
+                     as_frame=False):
         """Get all :class:`rtcclient.workitem.Workitem` objects by
         project area id or name
 
@@ -1056,6 +1177,17 @@ class RTCClient(RTCBase):
         :param returned_properties: the returned properties that you want.
             Refer to :class:`rtcclient.client.RTCClient` for more explanations
         :param archived: (default is False) whether the workitems are archived
+        :param compact: (default is False) return the compact
+            :class:`rtcclient.records.WorkitemRecord` objects instead of the
+            :class:`rtcclient.workitem.Workitem` objects, which take much
+            less memory for the large result sets. The records are built
+            from the entries, and the title of each resource linked by
+            several workitems (e.g. the project area) is retrieved once
+        :param keep_raw_data: (default is False) whether the compact records
+            keep the raw data
+        :param as_frame: (default is False) return a
+            :class:`rtcclient.frame.WorkitemFrame` object, which keeps one
+            column per attribute for the analytics
         :return: a :class:`list` that contains all the
             :class:`rtcclient.workitem.Workitem` objects
         :rtype: list
@@ -1090,7 +1222,9 @@ class RTCClient(RTCBase):
                 page_size="100",
                 returned_properties=rp,
                 archived=archived,
-                skip_full_attributes=skip_full_attributes)
+                skip_full_attributes=skip_full_attributes,
+                compact=compact or as_frame,
+                keep_raw_data=keep_raw_data)
             if workitems is not None:
                 workitems_list.extend(workitems)
 
@@ -1098,8 +1232,79 @@ class RTCClient(RTCBase):
             self.log.warning("Cannot find a workitem in the ProjectAreas "
                              "with ids: %s" % projectarea_ids)
             return None
+        if as_frame:
+            return WorkitemFrame.from_workitems(workitems_list)
         return workitems_list
 
+    def getHierarchy(self,
+                     root_id,
+                     depth=None,
+                     returned_properties="dc:identifier,dc:title",
+                     concurrency=8):
+        """Get the tree of the children workitems under a workitem
+
+        The tree is traversed breadth-first: the children of all the
+        workitems on a level are retrieved concurrently, each workitem only
+        once, and only with the returned properties as compact records
+        (refer to :class:`rtcclient.records.WorkitemRecord`)::
+
+            tree = myclient.getHierarchy(123, depth=2)
+            print(len(tree), tree.children[tree.root])
+
+        :param root_id: the root workitem id/number
+            (integer or equivalent string)
+        :param depth: (optional) the maximum number of the levels under the
+            root workitem. All the levels are retrieved if `None`
+        :param returned_properties: (default is "dc:identifier,dc:title")
+            the returned properties of the workitems. Refer to
+            :class:`rtcclient.client.RTCClient` for more explanations.
+            "dc:identifier" is always returned
+        :param concurrency: (default is 8) the maximum number of the
+            requests in flight
+        :return: the :class:`rtcclient.hierarchy.Hierarchy` object
+        :rtype: rtcclient.hierarchy.Hierarchy
+        """
+
+        concurrency = validate_concurrency(concurrency)
+        if depth is not None and (isinstance(depth, bool) or
+                                  not isinstance(depth, int) or depth < 0):
+            raise exception.BadValue("Invalid depth: %s" % depth)
+        rp = returned_properties
+        if rp is not None and "dc:identifier" not in rp.split(","):
+            rp = ",".join([rp, "dc:identifier"])
+
+        root = self.getWorkitem(root_id, returned_properties=rp)
+        tree = Hierarchy(root.identifier)
+        tree.add(WorkitemRecord.from_workitem(root))
+
+        def get_children(workitem_id):
+            return self._get_paged_resources("Children",
+                                             workitem_id=workitem_id,
+                                             customized_attr=CHILDREN_TAG,
+                                             page_size="100",
+                                             returned_properties=rp,
+                                             compact=True) or []
+
+        level = [tree.root]
+        while level and (depth is None or tree.levels[level[0]] < depth):
+            self.log.debug(
+                "Retrieve the children of %s workitems on level "
+                "%s", len(level), tree.levels[level[0]])
+            next_level = list()
+            for result in run_bulk(get_children, level,
+                                   concurrency=concurrency):
+                if not result.ok:
+                    tree.errors[result.item] = result.error
+                    continue
+                for child in result.value:
+                    if child is not None and tree.add(child, result.item):
+                        next_level.append(str(child.identifier))
+            level = next_level
+
+        self.log.info("Get %s workitems under <Workitem %s>", len(tree),
+                      tree.root)
+        return tree
+
     def _validate_returned_properties(self, returned_properties=None):
         if returned_properties is not None:
             # retrieve project area info and state
@@ -1119,9 +1324,24 @@ class RTCClient(RTCBase):
                        template=None,
                        copied_from=None,
                        keep=False,
+                       idempotency_key=None,
+                       retries=0,
                        **kwargs):
         """Create a workitem
 
+        With an `idempotency_key`, the key is stored in the workitem (refer
+        to `idempotency_property` in :class:`RTCClient`) and journaled, so
+        that the workitem is created at most once even if the request is
+        retried or the same key is created again: before a retry, the
+        workitem is looked up by the key in a single query, and the existing
+        workitem is returned if the earlier attempt succeeded::
+
+            wi = myclient.createWorkitem("defect", "crash on save",
+                                         projectarea_name="ProjectArea",
+                                         template=template,
+                                         idempotency_key="import-4711",
+                                         retries=3)
+
         :param item_type: the type of the workitem
             (e.g. task/defect/issue)
         :param title: the title of the new created workitem
@@ -1137,6 +1357,12 @@ class RTCClient(RTCBase):
         :param keep: refer to `keep` in
             :class:`rtcclient.template.Templater.getTemplate`. Only works when
             `template` is not specified
+        :param idempotency_key: (optional) the unique key of the workitem,
+            which contains only the letters, digits, "_", ".", ":" and "-".
+            The key is case-insensitive if it is stored as a tag
+        :param retries: (default is 0) the number of the retries when the
+            connection fails or the RTC server returns 5xx. Only works with
+            `idempotency_key`
         :param kwargs: Optional/mandatory arguments when creating a new
             workitem. More details, please refer to `kwargs` in
             :class:`rtcclient.template.Templater.render`
@@ -1144,6 +1370,9 @@ class RTCClient(RTCBase):
         :rtype: rtcclient.workitem.Workitem
         """
 
+        if idempotency_key is not None:
+            idempotency_key = self._normalizeIdempotencyKey(idempotency_key)
+
         if not isinstance(projectarea_id,
                           six.string_types) or not projectarea_id:
             projectarea = self.getProjectArea(projectarea_name)
@@ -1186,7 +1415,512 @@ class RTCClient(RTCBase):
             self.url, "oslc/contexts", projectarea_id,
             "workitems/%s" % itemtype.identifier
         ])
-        return self._createWorkitem(wi_url_post, wi_raw)
+        return self._createWorkitem(wi_url_post,
+                                    wi_raw,
+                                    idempotency_key=idempotency_key,
+                                    retries=retries)
+
+    def createWorkitems(self,
+                        specs,
+                        template=None,
+                        item_type=None,
+                        projectarea_id=None,
+                        projectarea_name=None,
+                        retries=0,
+                        concurrency=8):
+        """Create many workitems from the templates concurrently
+
+        Compared with calling :meth:`createWorkitem` for each workitem, the
+        project areas, the workitem types and the values of the fields
+        (e.g. the severity or the owner) are only retrieved once, and each
+        template is only loaded, compiled and checked once. The payloads are
+        then posted with at most `concurrency` requests in flight.
+
+        A failed workitem does not stop the others: its error is kept in
+        its result, e.g. when one of its field values (e.g. the severity
+        name) is not found, instead of posting the unresolved value::
+
+            results = myclient.createWorkitems(
+                [{"title": "defect 1", "severity": "Major",
+                  "filedAgainst": "Category 1"},
+                 {"title": "defect 2", "severity": "Minor",
+                  "filedAgainst": "Category 1"}],
+                template="defect.template",
+                item_type="Defect",
+                projectarea_name="ProjectArea",
+                concurrency=16)
+            failed = [result for result in results if not result.ok]
+
+        :param specs: the workitems to create. Each of them is a
+            :class:`dict` of `title`, `description` (optional) and the
+            fields to render (refer to `kwargs` in
+            :class:`rtcclient.template.Templater.render`). It may also
+            contain `item_type`, `template`, `projectarea_id` or
+            `projectarea_name` to override the arguments below, and an
+            `idempotency_key` (refer to :meth:`createWorkitem`) so that the
+            failed workitems can be created again safely
+        :param template: the template to render for all the workitems
+        :param item_type: the type of all the workitems (e.g. Defect)
+        :param projectarea_id: the :class:`rtcclient.project_area.ProjectArea`
+            id
+        :param projectarea_name: the project area name
+        :param retries: (default is 0) the number of the retries of each
+            workitem with an `idempotency_key`. Refer to
+            :meth:`createWorkitem`
+        :param concurrency: (default is 8) the maximum number of the
+            requests in flight
+        :return: a :class:`list` of :class:`rtcclient.bulk.BulkResult`
+            objects in the order of `specs`, whose `value` is the created
+            :class:`rtcclient.workitem.Workitem` object
+        :rtype: list
+        """
+
+        concurrency = validate_concurrency(concurrency)
+        specs = list(specs)
+        defaults = {
+            "template": template,
+            "item_type": item_type,
+            "projectarea_id": projectarea_id,
+            "projectarea_name": projectarea_name
+        }
+        results, prepared = self._prepareWorkitems(specs, defaults)
+        resolve = self._resolveValidValues(prepared, concurrency)
+
+        def create(item):
+            _, _, url_post, temp, pa_id, title, description, key, kwargs = item
+            kwargs = dict((keyword, resolve(pa_id, keyword, value))
+                          for keyword, value in kwargs.items())
+            wi_raw = self.templater._render_template(temp,
+                                                     title=title,
+                                                     description=description,
+                                                     **kwargs)
+            return self._createWorkitem(url_post,
+                                        wi_raw,
+                                        idempotency_key=key,
+                                        retries=retries)
+
+        self.log.info(
+            "Start to create %s workitems with %s requests in "
+            "flight", len(prepared), concurrency)
+        for (index, spec, *_), result in zip(
+                prepared, run_bulk(create, prepared, concurrency=concurrency)):
+            results[index] = BulkResult(index,
+                                        spec,
+                                        value=result.value,
+                                        error=result.error)
+        return results
+
+    def _prepareWorkitems(self, specs, defaults):
+        """Check the specs of :meth:`createWorkitems`, and get the results
+        of the invalid ones and the prepared items of the others"""
+
+        lookups = dict()
+
+        def lookup(key, func, *args):
+            # retrieve the shared metadata once, including the failures
+            if key not in lookups:
+                try:
+                    lookups[key] = (func(*args), None)
+                except Exception as excp:
+                    lookups[key] = (None, excp)
+            value, excp = lookups[key]
+            if excp is not None:
+                raise excp
+            return value
+
+        def get_projectarea(pa_id, pa_name):
+            if isinstance(pa_id, six.string_types) and pa_id:
+                return self.getProjectAreaByID(pa_id)
+            return self.getProjectArea(pa_name)
+
+        def get_fields(template):
+            if not template:
+                raise exception.EmptyAttrib("No template is specified")
+            return (self.templater._get_template(template),
+                    self.listFields(template))
+
+        results = [None] * len(specs)
+        prepared = list()
+        keys = set()
+        for index, spec in enumerate(specs):
+            try:
+                kwargs = dict(spec)
+                options = dict((key, kwargs.pop(key, default))
+                               for key, default in defaults.items())
+                title = kwargs.pop("title", None)
+                if not title:
+                    raise exception.EmptyAttrib("No title is specified")
+                description = kwargs.pop("description", None)
+                key = kwargs.pop("idempotency_key", None)
+                if key is not None:
+                    key = self._normalizeIdempotencyKey(key)
+                    if key in keys:
+                        raise exception.BadValue(
+                            "Duplicate idempotency key: %s" % key)
+                    keys.add(key)
+                projectarea = lookup(("projectarea", options["projectarea_id"],
+                                      options["projectarea_name"]),
+                                     get_projectarea, options["projectarea_id"],
+                                     options["projectarea_name"])
+                itemtype = lookup(
+                    ("itemtype", projectarea.id, options["item_type"]),
+                    projectarea.getItemType, options["item_type"])
+                temp, parameters = lookup(("template", options["template"]),
+                                          get_fields, options["template"])
+                self._findMissingParams(set(parameters), **kwargs)
+            except Exception as excp:
+                self.log.error("Unable to create workitem %s: %s", index, excp)
+                results[index] = BulkResult(index, spec, error=excp)
+                continue
+
+            url_post = "/".join([
+                self.url, "oslc/contexts", projectarea.id,
+                "workitems/%s" % itemtype.identifier
+            ])
+            prepared.append((index, spec, url_post, temp, projectarea.id, title,
+                             description, key, kwargs))
+
+        return results, prepared
+
+    def _resolveValidValues(self, prepared, concurrency):
+        """Retrieve the distinct field values of the prepared workitems
+        concurrently, and get the function to resolve a field value"""
+
+        values = set()
+        for _, _, _, _, pa_id, _, _, _, kwargs in prepared:
+            values.update((pa_id, keyword, value)
+                          for keyword, value in kwargs.items()
+                          if isinstance(value, collections.abc.Hashable))
+        resolved = dict((result.item, result) for result in run_bulk(
+            lambda key: self._retrieveValidValue(*key, strict=True),
+            list(values),
+            concurrency=concurrency))
+
+        def resolve(pa_id, keyword, value):
+            if not isinstance(value, collections.abc.Hashable):
+                return self._retrieveValidValue(pa_id,
+                                                keyword,
+                                                value,
+                                                strict=True)
+            # the failure is reported to every workitem with the value
+            result = resolved[(pa_id, keyword, value)]
+            if result.error is not None:
+                raise result.error
+            return result.value
+
+        return resolve
+
+    def updateWorkitems(self, updates, concurrency=8):
+        """Update the fields of many workitems concurrently
+
+        Each workitem is updated with :meth:`Workitem.update`, i.e. a PUT
+        scoped to its fields and protected with `If-Match`. The workitems
+        are not retrieved, only their ETags unless they are given as
+        :class:`rtcclient.workitem.Workitem` objects retrieved with them.
+        A conflict (the workitem changed since its ETag) or any other
+        failure is reported in the result of that workitem::
+
+            results = myclient.updateWorkitems(
+                {123: {"ownedBy": member_url},
+                 124: {"title": "new title", "rtc_cm:contextId": "_abc"}},
+                concurrency=16)
+            conflicts = [result.item[0] for result in results
+                         if isinstance(result.error, exception.Conflict)]
+
+        :param updates: a :class:`dict` of the workitem ids (or the
+            :class:`rtcclient.workitem.Workitem` objects) to the fields to
+            update (refer to `fields` in :meth:`Workitem.update`), or an
+            iterable of such pairs
+        :param concurrency: (default is 8) the maximum number of the
+            workitems updated at the same time
+        :return: a :class:`list` of :class:`rtcclient.bulk.BulkResult`
+            objects in the order of `updates`, whose `item` is the
+            (workitem, fields) pair and `value` is the updated
+            :class:`rtcclient.workitem.Workitem` object
+        :rtype: list
+        """
+
+        concurrency = validate_concurrency(concurrency)
+        if isinstance(updates, collections.abc.Mapping):
+            updates = updates.items()
+
+        def update(item):
+            workitem, fields = item
+            if not isinstance(workitem, Workitem):
+                workitem = self._getWorkitemStub(workitem)
+            return workitem.update(fields)
+
+        results = run_bulk(update, updates, concurrency=concurrency)
+        self.log.info("Updated %s of %s workitems",
+                      sum(1 for result in results if result.ok), len(results))
+        return results
+
+    def addComments(self, comments, concurrency=8):
+        """Add comments to many workitems concurrently
+
+        Each comment is posted with :meth:`Workitem.addComment` in a single
+        request, without retrieving the workitem or its comments::
+
+            results = myclient.addComments(
+                [(123, "Build 42 passed"), (124, "Build 42 failed")],
+                concurrency=16)
+
+        :param comments: the (workitem, message) pairs, where the workitem
+            is the id/number (integer or equivalent string) or the
+            :class:`rtcclient.workitem.Workitem` object. Several comments
+            can be added to the same workitem
+        :param concurrency: (default is 8) the maximum number of the
+            requests in flight
+        :return: a :class:`list` of :class:`rtcclient.bulk.BulkResult`
+            objects in the order of `comments`, whose `value` is the added
+            :class:`rtcclient.models.Comment` object, or `None` if the RTC
+            server does not return its url
+        :rtype: list
+        """
+
+        concurrency = validate_concurrency(concurrency)
+
+        def add(item):
+            workitem, msg = item
+            if not isinstance(workitem, Workitem):
+                workitem = self._getWorkitemStub(workitem)
+            return workitem.addComment(msg)
+
+        results = run_bulk(add, comments, concurrency=concurrency)
+        self.log.info("Added %s of %s comments",
+                      sum(1 for result in results if result.ok), len(results))
+        return results
+
+    def updateSubscribers(self, mapping, concurrency=8):
+        """Add and remove the subscribers of many workitems concurrently
+
+        Each workitem is changed in an edit session (refer to
+        :class:`rtcclient.workitem.WorkitemEdit`) without retrieving the
+        workitem: its current subscribers are retrieved in a scoped GET, and
+        only the `rtc_cm:subscribers` property is written in a PUT, which is
+        skipped if nothing would change::
+
+            results = myclient.updateSubscribers(
+                {123: {"add": ["tester2@email.com"]},
+                 124: {"add": ["tester2@email.com"],
+                       "remove": ["tester1@email.com"]}},
+                concurrency=16)
+
+        :param mapping: a :class:`dict` of the workitem ids (or the
+            :class:`rtcclient.workitem.Workitem` objects) to the changes,
+            which is a :class:`dict` of "add" and/or "remove" to the
+            :class:`list` of the subscribers' emails, or an iterable of such
+            pairs
+        :param concurrency: (default is 8) the maximum number of the
+            requests in flight
+        :return: a :class:`list` of :class:`rtcclient.bulk.BulkResult`
+            objects in the order of `mapping`, whose `item` is the
+            (workitem, changes) pair and `value` is the
+            :class:`rtcclient.workitem.Workitem` object
+        :rtype: list
+        """
+
+        concurrency = validate_concurrency(concurrency)
+        if isinstance(mapping, collections.abc.Mapping):
+            mapping = mapping.items()
+
+        def update(item):
+            workitem, changes = item
+            if not isinstance(changes, collections.abc.Mapping) or \
+                    not set(changes).issubset(["add", "remove"]):
+                raise exception.BadValue("Invalid subscriber changes: %s" %
+                                         changes)
+            if not isinstance(workitem, Workitem):
+                workitem = self._getWorkitemStub(workitem)
+            # the subscribers are merged into the current ones under the
+            # ETag of the scoped GET, so the stubs are not retrieved first
+            with workitem.edit(strict=workitem.etag is not None) as tx:
+                tx.addSubscribers(changes.get("add") or [])
+                tx.removeSubscribers(changes.get("remove") or [])
+            return workitem
+
+        results = run_bulk(update, mapping, concurrency=concurrency)
+        self.log.info("Updated the subscribers of %s of %s workitems",
+                      sum(1 for result in results if result.ok), len(results))
+        return results
+
+    def relinkHierarchy(self, mapping, concurrency=8):
+        """Move many workitems to new parents concurrently
+
+        Only the parent link of each workitem is written, in a single PUT
+        without retrieving the workitem or the children of its old and new
+        parents, whose children links are maintained by the server::
+
+            results = myclient.relinkHierarchy({123: 100, 124: 100,
+                                                125: None})
+
+        :param mapping: a :class:`dict` of the workitem ids (or the
+            :class:`rtcclient.workitem.Workitem` objects) to the new parent
+            workitem ids/numbers (integer or equivalent string), or `None`
+            to remove the parent. An iterable of such pairs is accepted as
+            well
+        :param concurrency: (default is 8) the maximum number of the
+            requests in flight
+        :return: a :class:`list` of :class:`rtcclient.bulk.BulkResult`
+            objects in the order of `mapping`, whose `item` is the
+            (workitem, parent) pair and `value` is the
+            :class:`rtcclient.workitem.Workitem` object
+        :rtype: list
+        """
+
+        concurrency = validate_concurrency(concurrency)
+        if isinstance(mapping, collections.abc.Mapping):
+            mapping = mapping.items()
+
+        def relink(item):
+            workitem, parent_id = item
+            if not isinstance(workitem, Workitem):
+                workitem = self._getWorkitemStub(workitem)
+            if parent_id is None:
+                workitem.removeParent()
+            else:
+                workitem.addParent(parent_id)
+            return workitem
+
+        results = run_bulk(relink, mapping, concurrency=concurrency)
+        self.log.info("Relinked %s of %s workitems",
+                      sum(1 for result in results if result.ok), len(results))
+        return results
+
+    def createWriteQueue(self,
+                         maxsize=1000,
+                         concurrency=4,
+                         linger=0.05,
+                         retries=2,
+                         on_error=None):
+        """Create a write-behind queue of the changes of the workitems
+
+        The comments, subscribers, links and fields are queued without
+        blocking on any request, and the pending changes of the same
+        workitem are written together in the background. Refer to
+        :class:`rtcclient.writequeue.WriteQueue` for more details::
+
+            with myclient.createWriteQueue(concurrency=8) as writes:
+                for workitem_id in workitem_ids:
+                    writes.addSubscriber(workitem_id, "tester1@email.com")
+                    writes.addComment(workitem_id, "subscribed by the bot")
+
+        :param maxsize: (default is 1000) the maximum number of the pending
+            changes, queueing a change blocks while the queue is full
+        :param concurrency: (default is 4) the number of the workers
+        :param linger: (default is 0.05) the seconds to wait for more
+            changes of a workitem before writing them
+        :param retries: (default is 2) the number of the retries of a
+            workitem on conflicts
+        :param on_error: (optional) the function called with the workitem
+            id and the exception when the changes of a workitem fail
+        :return: the :class:`rtcclient.writequeue.WriteQueue` object
+        :rtype: rtcclient.writequeue.WriteQueue
+        """
+
+        return WriteQueue(self,
+                          maxsize=maxsize,
+                          concurrency=concurrency,
+                          linger=linger,
+                          retries=retries,
+                          on_error=on_error)
+
+    def applyAction(self, workitem_ids, action_name, retries=2, concurrency=8):
+        """Apply the workflow action to many workitems concurrently
+
+        Each workitem is changed with :meth:`Workitem.applyAction`: its
+        state and ETag are retrieved in a scoped GET (unless they are known
+        by the given :class:`rtcclient.workitem.Workitem` objects), the
+        action is resolved in the workflow of the state, and the state is
+        changed in a PUT, which is retried on conflicts. The actions of each
+        workflow are only retrieved once::
+
+            results = myclient.applyAction(sprint_ids, "Resolve",
+                                           concurrency=16)
+            failed = [result for result in results if not result.ok]
+
+        :param workitem_ids: the workitem ids/numbers (integer or
+            equivalent string) or the :class:`rtcclient.workitem.Workitem`
+            objects
+        :param action_name: the name/title of the action (e.g. Resolve)
+        :param retries: (default is 2) the number of the retries on
+            conflicts for each workitem
+        :param concurrency: (default is 8) the maximum number of the
+            workitems changed at the same time
+        :return: a :class:`list` of :class:`rtcclient.bulk.BulkResult`
+            objects in the order of `workitem_ids`, whose `value` is the
+            changed :class:`rtcclient.workitem.Workitem` object
+        :rtype: list
+        """
+
+        concurrency = validate_concurrency(concurrency)
+        if not isinstance(action_name, six.string_types) or not action_name:
+            raise exception.BadValue("Please specify a valid action name")
+
+        def apply(workitem):
+            if not isinstance(workitem, Workitem):
+                workitem = self._getWorkitemStub(workitem)
+            return workitem.applyAction(action_name, retries=retries)
+
+        results = run_bulk(apply, workitem_ids, concurrency=concurrency)
+        self.log.info("Applied <Action %s> to %s of %s workitems", action_name,
+                      sum(1 for result in results if result.ok), len(results))
+        return results
+
+    def _getWorkflowAction(self, state_url, action_name):
+        """Get the :class:`rtcclient.models.Action` object by its name in
+        the workflow of the state, whose actions are cached
+
+        :param state_url: the url of the state, e.g.
+            .../oslc/workflows/<projectarea id>/states/<workflow id>/<state>
+        :param action_name: the name/title of the action
+        :return: the :class:`rtcclient.models.Action` object
+        :rtype: rtcclient.models.Action
+        """
+
+        parts = state_url.rstrip("/").split("/")
+        key = (parts[-4], parts[-2])
+        actions = self._actions.get(key)
+        hit = actions is not None
+        if actions is None:
+            with self._actions_lock:
+                actions = self._actions.get(key)
+                hit = actions is not None
+                if actions is None:
+                    actions = dict(
+                        (action.title, action) for action in
+                        self._get_paged_resources("Action",
+                                                  projectarea_id=key[0],
+                                                  customized_attr=key[1],
+                                                  page_size="100") or [])
+                    self._actions[key] = actions
+        self._record_cache("workflow_actions", hit)
+        action = actions.get(action_name)
+        if action is None:
+            self.log.error("No Action named %s in the workflow %s", action_name,
+                           key[1])
+            raise exception.NotFound("No Action named %s in the workflow %s" %
+                                     (action_name, key[1]))
+        return action
+
+    def _getWorkitemStub(self, workitem_id):
+        """Build a :class:`rtcclient.workitem.Workitem` object without any
+        request, e.g. to update it"""
+
+        try:
+            if isinstance(workitem_id, bool):
+                raise ValueError()
+            if isinstance(workitem_id, six.string_types):
+                workitem_id = int(workitem_id)
+            if not isinstance(workitem_id, int):
+                raise ValueError()
+        except ValueError:
+            raise exception.BadValue("Invalid workitem id: %s" % workitem_id)
+        workitem_url = "/".join([self.url, "oslc/workitems/%s" % workitem_id])
+        return Workitem(workitem_url,
+                        self,
+                        workitem_id=workitem_id,
+                        raw_data=dict())
 
     def copyWorkitem(self,
                      copied_from,
@@ -1236,7 +1970,154 @@ class RTCClient(RTCBase):
                                                    description=description)
         return self._createWorkitem(wi_url_post, wi_raw)
 
-    def _createWorkitem(self, url_post, workitem_raw):
+    def getWorkitemByKey(self,
+                         idempotency_key,
+                         projectarea_id=None,
+                         projectarea_name=None,
+                         returned_properties=None):
+        """Get the workitem created with the idempotency key (refer to
+        :meth:`createWorkitem`) in a single query
+
+        At least either of `projectarea_id` and `projectarea_name` is given
+
+        :param idempotency_key: the idempotency key
+        :param projectarea_id: the :class:`rtcclient.project_area.ProjectArea`
+            id
+        :param projectarea_name: the
+            :class:`rtcclient.project_area.ProjectArea` name
+        :param returned_properties: the returned properties that you want.
+            Refer to :class:`rtcclient.client.RTCClient` for more explanations
+        :return: the :class:`rtcclient.workitem.Workitem` object, or `None`
+            if no workitem was created with the key
+        :rtype: rtcclient.workitem.Workitem
+        """
+
+        idempotency_key = self._normalizeIdempotencyKey(idempotency_key)
+        pa_id = self._pre_get_resource(projectarea_id=projectarea_id,
+                                       projectarea_name=projectarea_name)
+        return self._lookupWorkitem(
+            pa_id,
+            idempotency_key,
+            returned_properties=self._validate_returned_properties(
+                returned_properties))
+
+    def _lookupWorkitem(self,
+                        projectarea_id,
+                        idempotency_key,
+                        returned_properties=None):
+        query_str = '%s="%s"' % (self.idempotency_property, idempotency_key)
+        req_url = "".join([
+            self.url,
+            "/oslc/contexts/%s/workitems" % projectarea_id,
+            "?oslc_cm.query=%s&oslc_cm.pageSize=1" % urlquote(query_str)
+        ])
+        rp = returned_properties
+        if rp is not None:
+            if "dc:identifier" not in rp.split(","):
+                rp = ",".join([rp, "dc:identifier"])
+            req_url = "".join([req_url, "&oslc_cm.properties=", urlquote(rp)])
+        resp = self.get(req_url,
+                        verify=self.verify,
+                        proxies=self.proxies,
+                        headers=self._get_read_headers())
+        if self.representation == "json":
+            _, entries = self._parse_json_collection(resp.content, req_url)
+        else:
+            _, _, entries = self._parse_collection(resp.content,
+                                                   "oslc_cm:ChangeRequest",
+                                                   req_url)
+        if not entries:
+            return None
+
+        workitem_raw = entries[0]
+        workitem_id = workitem_raw["dc:identifier"]
+        workitem_url = "/".join([self.url, "oslc/workitems/%s" % workitem_id])
+        self.log.debug("Found <Workitem %s> with the idempotency key %s",
+                       workitem_id, idempotency_key)
+        return Workitem(workitem_url,
+                        self,
+                        workitem_id=workitem_id,
+                        raw_data=workitem_raw)
+
+    def _normalizeIdempotencyKey(self, idempotency_key):
+        """Check the idempotency key, which is lowercased if it is stored as
+        a tag (the tags are lowercased by the RTC server)"""
+
+        validate_key(idempotency_key)
+        if self.idempotency_property == "dc:subject":
+            return idempotency_key.lower()
+        return idempotency_key
+
+    def _setIdempotencyKey(self, workitem_raw, idempotency_key):
+        """Store the idempotency key in the rendered workitem"""
+
+        raw_data = xmltodict.parse(workitem_raw)
+        workitem = raw_data["oslc_cm:ChangeRequest"]
+        prop = self.idempotency_property
+        if prop == "dc:subject":
+            tags = (workitem.get(prop) or "").replace(",", " ").split()
+            if idempotency_key not in tags:
+                tags.append(idempotency_key)
+            workitem[prop] = ", ".join(tags)
+        else:
+            workitem[prop] = idempotency_key
+        return xmltodict.unparse(raw_data, encoding="UTF-8")
+
+    def _createWorkitem(self,
+                        url_post,
+                        workitem_raw,
+                        idempotency_key=None,
+                        retries=0):
+        if idempotency_key is None:
+            return self._postWorkitem(url_post, workitem_raw)
+
+        projectarea_id = url_post.split("/oslc/contexts/")[1].split("/")[0]
+        entry = self.journal.get(idempotency_key)
+        if entry is not None:
+            state, workitem_id = entry
+            if workitem_id is not None:
+                self.log.info(
+                    "<Workitem %s> was created with the idempotency "
+                    "key %s", workitem_id, idempotency_key)
+                return self.getWorkitem(workitem_id)
+            # the outcome of the earlier attempt is unknown
+            workitem = self._lookupWorkitem(projectarea_id, idempotency_key)
+            if workitem is not None:
+                self.journal.commit(idempotency_key, workitem.identifier)
+                return workitem
+
+        workitem_raw = self._setIdempotencyKey(workitem_raw, idempotency_key)
+        self.journal.begin(idempotency_key)
+        attempt = 0
+        while True:
+            try:
+                workitem = None
+                if attempt:
+                    # the earlier attempt may have been created
+                    workitem = self._lookupWorkitem(projectarea_id,
+                                                    idempotency_key)
+                if workitem is None:
+                    workitem = self._postWorkitem(url_post, workitem_raw)
+                break
+            except Exception as excp:
+                if not is_retryable_error(excp):
+                    if not attempt:
+                        # rejected by the RTC server, nothing is created
+                        self.journal.discard(idempotency_key)
+                    raise
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                self.log.warning(
+                    "Failed to create the workitem with the idempotency "
+                    "key %s (%s), retry %s/%s", idempotency_key, excp, attempt,
+                    retries)
+                time.sleep(min(0.1 * 2**(attempt - 1), 2))
+
+        self.journal.commit(idempotency_key, workitem.identifier)
+        return workitem
+
+    def _postWorkitem(self, url_post, workitem_raw):
         headers = copy.deepcopy(self.headers)
         headers['Content-Type'] = self.OSLC_CR_XML
 
@@ -1246,7 +2127,7 @@ class RTCClient(RTCBase):
                          proxies=self.proxies,
                          data=workitem_raw)
 
-        raw_data = xmltodict.parse(resp.content)
+        raw_data = self._parse_xml(resp.content, url_post)
         workitem_raw = raw_data["oslc_cm:ChangeRequest"]
         workitem_id = workitem_raw["dc:identifier"]
         workitem_url = "/".join([self.url, "oslc/workitems/%s" % workitem_id])
@@ -1279,15 +2160,30 @@ class RTCClient(RTCBase):
     def _retrieveValidInfo(self, projectarea_id, **kwargs):
         # get rdf:resource by keywords
         for keyword in kwargs.keys():
-            try:
-                keyword_cls = eval("self.get" + capitalize(keyword))
-                keyword_obj = keyword_cls(kwargs[keyword],
-                                          projectarea_id=projectarea_id)
-                kwargs[keyword] = keyword_obj.url
-            except Exception as excp:
-                self.log.error(excp)
+            kwargs[keyword] = self._retrieveValidValue(projectarea_id, keyword,
+                                                       kwargs[keyword])
         return kwargs
 
+    def _retrieveValidValue(self, projectarea_id, keyword, value, strict=False):
+        if strict:
+            # only the fields without any lookup (e.g. the custom attributes)
+            # keep their values, the failed lookups are raised
+            keyword_cls = getattr(self, "get" + capitalize(keyword), None)
+            if keyword_cls is None:
+                return value
+            keyword_obj = keyword_cls(value, projectarea_id=projectarea_id)
+            if keyword_obj is None:
+                raise exception.NotFound("No %s named %s" % (keyword, value))
+            return keyword_obj.url
+
+        try:
+            keyword_cls = eval("self.get" + capitalize(keyword))
+            keyword_obj = keyword_cls(value, projectarea_id=projectarea_id)
+            return keyword_obj.url
+        except Exception as excp:
+            self.log.error(excp)
+            return value
+
     def _findMissingParams(self, parameters, **kwargs):
         known_parameters = ["title", "description"]
         for known_parameter in known_parameters:
@@ -1346,7 +2242,9 @@ class RTCClient(RTCBase):
                              archived=False,
                              returned_properties=None,
                              filter_rule=None,
-                             skip_full_attributes=True):
+                             skip_full_attributes=True,
+                             compact=False,
+                             keep_raw_data=False):
 
         self.log.debug(
             "Start to fetch all %ss with [ProjectArea ID: %s] "
@@ -1484,65 +2382,75 @@ class RTCClient(RTCBase):
         pa_url = ("/".join([self.url, "oslc/projectareas", projectarea_id])
                   if projectarea_id else None)
 
-        self.skip_full_attributes = skip_full_attributes
-        resp = self.get(resource_url,
-                        verify=self.verify,
-                        proxies=self.proxies,
-                        headers=self.headers)
-        raw_data = xmltodict.parse(resp.content)
-
-        try:
-            total_count = int(
-                raw_data.get("oslc_cm:Collection").get("@oslc_cm:totalCount"))
-            if total_count == 0:
-                self.log.warning("No %ss are found", resource_name)
-                return None
-        except Exception:
-            pass
+        headers = self.headers
+        use_json = (self.representation == "json" and
+                    resource_name in self._WORKITEM_RESOURCES)
+        if use_json:
+            headers = self._get_read_headers()
 
+        self.skip_full_attributes = skip_full_attributes
         resources_list = []
-
-        while True:
-            entries = (raw_data.get("oslc_cm:Collection").get(
-                entry_map[resource_name]))
-
-            if entries is None:
-                break
-
-            # for the last single entry
-            if isinstance(entries, OrderedDict):
-                resource = self._handle_resource_entry(
-                    resource_name,
-                    entries,
-                    projectarea_url=pa_url,
-                    archived=archived,
-                    filter_rule=filter_rule,
-                    skip_full_attributes=skip_full_attributes)
-                if resource is not None:
-                    resources_list.append(resource)
-                break
-
-            # iterate all the entries
-            with Pool() as p:
-                resources_list.extend(
-                    list(
-                        filter(
-                            None,
-                            p.starmap(self._handle_resource_entry,
-                                      [(resource_name, entry, pa_url, archived,
-                                        filter_rule, skip_full_attributes)
-                                       for entry in entries]))))
-
-            # find the next page
-            url_next = raw_data.get('oslc_cm:Collection').get('@oslc_cm:next')
-            if url_next:
-                resp = self.get(url_next,
+        page_url = resource_url
+        page_index = 0
+        builder = None
+        if compact and resource_name in self._WORKITEM_RESOURCES:
+            # the records are built from the entries, and the titles of the
+            # resources linked by several workitems are retrieved once
+            builder = RecordBuilder(self,
+                                    keep_raw_data=keep_raw_data,
+                                    skip_full_attributes=skip_full_attributes)
+
+        while page_url:
+            with self._span(
+                    "rtcclient.page", **{
+                        "rtcclient.resource": resource_name,
+                        "rtcclient.page_index": page_index
+                    }) as span:
+                resp = self.get(page_url,
                                 verify=self.verify,
                                 proxies=self.proxies,
-                                headers=self.headers)
-                raw_data = xmltodict.parse(resp.content)
-            else:
-                break
+                                headers=headers)
+                span.set_attribute("rtcclient.bytes", get_body_size(resp))
+                if use_json:
+                    attributes, entries = self._parse_json_collection(
+                        resp.content, page_url)
+                    tag = "oslc_cm:Collection"
+                else:
+                    tag, attributes, entries = self._parse_collection(
+                        resp.content, entry_map[resource_name], page_url)
+                if tag != "oslc_cm:Collection":
+                    excp_msg = "Unexpected response of %s: %s" % (page_url, tag)
+                    self.log.error(excp_msg)
+                    raise exception.RTCException(excp_msg)
+
+                if page_index == 0:
+                    try:
+                        total_count = int(attributes.get("@oslc_cm:totalCount"))
+                        if total_count == 0:
+                            self.log.warning("No %ss are found", resource_name)
+                            return None
+                    except Exception:
+                        pass
+
+                if not entries:
+                    span.set_attribute("rtcclient.entry_count", 0)
+                    break
+
+                # find the next page, a page of a single entry may not be
+                # the last one
+                page_url = attributes.get("@oslc_cm:next")
+                span.set_attribute("rtcclient.entry_count", len(entries))
+
+                if builder is not None:
+                    resources = self._handle_record_entries(
+                        builder, resource_name, entries, pa_url, archived,
+                        filter_rule)
+                else:
+                    resources = self._handle_resource_entries(
+                        resource_name, entries, pa_url, archived, filter_rule,
+                        skip_full_attributes)
+                resources_list.extend(resources)
+            page_index += 1
 
         if not resources_list:
             self.log.warning(
@@ -1554,13 +2462,56 @@ class RTCClient(RTCBase):
         self.log.debug("Successfully fetching all the paged resources")
         return resources_list
 
-    def _handle_resource_entry(self,
-                               resource_name,
-                               entry,
-                               projectarea_url=None,
-                               archived=False,
-                               filter_rule=None,
-                               skip_full_attributes=True):
+    def _handle_resource_entries(self, resource_name, entries, pa_url, archived,
+                                 filter_rule, skip_full_attributes):
+        if len(entries) == 1:
+            resources = [
+                self._handle_resource_entry(
+                    resource_name,
+                    entries[0],
+                    projectarea_url=pa_url,
+                    archived=archived,
+                    filter_rule=filter_rule,
+                    skip_full_attributes=skip_full_attributes)
+            ]
+        else:
+            # iterate all the entries
+            with Pool() as p:
+                resources = p.starmap(self._handle_resource_entry,
+                                      [(resource_name, entry, pa_url, archived,
+                                        filter_rule, skip_full_attributes)
+                                       for entry in entries])
+        return list(filter(None, resources))
+
+    def _handle_record_entries(self, builder, resource_name, entries, pa_url,
+                               archived, filter_rule):
+        entries = [
+            entry for entry in entries
+            if self._match_resource_entry(entry, pa_url, archived, filter_rule)
+        ]
+
+        def build(entry):
+            start = time.perf_counter()
+            record = builder.build(self._get_workitem_entry_url(entry), entry)
+            self._record_build(resource_name, time.perf_counter() - start)
+            return record
+
+        if len(entries) == 1:
+            return [build(entries[0])]
+        with Pool() as p:
+            return p.map(build, entries)
+
+    def _get_workitem_entry_url(self, entry):
+        resource_url = entry.get("@rdf:resource")
+        return "/".join(
+            [self.url, "oslc/workitems",
+             resource_url.split("/")[-1]])
+
+    def _match_resource_entry(self,
+                              entry,
+                              projectarea_url=None,
+                              archived=False,
+                              filter_rule=None):
         """
         :param filter_rule: a list of filter rules
             e.g. filter_rule = [("dc:creator", "@rdf:resource",
@@ -1575,7 +2526,7 @@ class RTCClient(RTCBase):
             try:
                 if entry.get("rtc_cm:projectArea").get(
                         "@rdf:resource") != projectarea_url:
-                    return None
+                    return False
             except AttributeError:
                 pass
 
@@ -1590,36 +2541,47 @@ class RTCClient(RTCBase):
                         frule_value = entry.get(fattr)
 
                     if frule_value != fvalue:
-                        return None
+                        return False
                 except AttributeError:
                     pass
 
         entry_archived = entry.get("rtc_cm:archived")
-        if (entry_archived is not None and
-                eval(entry_archived.capitalize()) != archived):
+        return (entry_archived is None or
+                eval(entry_archived.capitalize()) == archived)
+
+    def _handle_resource_entry(self,
+                               resource_name,
+                               entry,
+                               projectarea_url=None,
+                               archived=False,
+                               filter_rule=None,
+                               skip_full_attributes=True):
+        """
+        :param filter_rule: refer to :meth:`_match_resource_entry`
+        """
+
+        if not self._match_resource_entry(entry, projectarea_url, archived,
+                                          filter_rule):
             return None
 
         if resource_name == "Subscriber":
             resource_cls = Member
-        elif resource_name in ["Query", "RunQuery", "Parent", "Children"]:
+        elif resource_name in self._WORKITEM_RESOURCES:
             resource_cls = Workitem
         else:
             resource_cls = eval(resource_name)
 
-        if resource_name in [
-                "Workitem", "Query", "RunQuery", "Parent", "Children"
-        ]:
-            resource_url = entry.get("@rdf:resource")
-            resource_url = "/".join(
-                [self.url, "oslc/workitems",
-                 resource_url.split("/")[-1]])
+        if resource_name in self._WORKITEM_RESOURCES:
+            resource_url = self._get_workitem_entry_url(entry)
         else:
             resource_url = entry.get("@rdf:resource")
 
+        start = time.perf_counter()
         resource = resource_cls(resource_url,
                                 self,
                                 raw_data=entry,
                                 skip_full_attributes=skip_full_attributes)
+        self._record_build(resource_name, time.perf_counter() - start)
         return resource
 
     def queryWorkitems(self,
@@ -1627,7 +2589,10 @@ class RTCClient(RTCBase):
                        projectarea_id=None,
                        projectarea_name=None,
                        returned_properties=None,
-                       archived=False):
+                       archived=False,
+                       compact=False,
+                       keep_raw_data=False,
+                       as_frame=False):
         """Query workitems with the query string in a certain project area
 
         At least either of `projectarea_id` and `projectarea_name` is given
@@ -1639,6 +2604,12 @@ class RTCClient(RTCBase):
         :param returned_properties: the returned properties that you want.
             Refer to :class:`rtcclient.client.RTCClient` for more explanations
         :param archived: (default is False) whether the workitems are archived
+        :param compact: (default is False) return the compact
+            :class:`rtcclient.records.WorkitemRecord` objects instead
+        :param keep_raw_data: (default is False) whether the compact records
+            keep the raw data
+        :param as_frame: (default is False) return a
+            :class:`rtcclient.frame.WorkitemFrame` object instead
         :return: a :class:`list` that contains the queried
             :class:`rtcclient.workitem.Workitem` objects
         :rtype: list
@@ -1649,4 +2620,7 @@ class RTCClient(RTCBase):
                                          projectarea_id=projectarea_id,
                                          projectarea_name=projectarea_name,
                                          returned_properties=rp,
-                                         archived=archived)
+                                         archived=archived,
+                                         compact=compact,
+                                         keep_raw_data=keep_raw_data,
+                                         as_frame=as_frame)
@@ -15,3 +15,11 @@ class NotFound(RTCException):
 
 class EmptyAttrib(RTCException):
     pass
+
+
+class CassetteMismatch(RTCException):
+    pass
+
+
+class Conflict(RTCException):
+    pass
@@ -0,0 +1,245 @@
+import collections
+import hashlib
+import logging
+import os
+import shutil
+import threading
+
+from rtcclient import exception
+
+# the suffix of the file which keeps the file name of a cached file state
+_NAME_SUFFIX = ".name"
+
+
+class FileStateCache(object):
+    """A local cache of the fetched file states (refer to
+    :meth:`rtcclient.models.Change.fetchAfterStateFile`)
+
+    A file state is immutable once checked in, so its content is stored
+    once keyed by the item id and the state id, and then linked (or copied)
+    to the destination folders without any request::
+
+        cache = FileStateCache("/var/cache/rtc-files", max_size=10 * 2**30)
+        myclient = RTCClient(url, username, password, file_cache=cache)
+        mychangeset.fetchAllFiles("/tmp/review")
+
+    The least recently used file states are evicted once the total size of
+    the cache exceeds `max_size`. The cache survives a restart, the order of
+    the use is kept in the modification times of the files of the file
+    names, which are never linked to the destination folders.
+
+    The destination files are hard links to the cached files if `link` is
+    `True` (and the folders are on the same file system), so they must not
+    be modified in place.
+
+    :param path: the folder to store the file states
+    :param max_size: (default is 1 GiB) the maximum total bytes of the file
+        states
+    :param link: (default is `True`) whether to hard link the file states to
+        the destination files instead of copying them
+    """
+
+    log = logging.getLogger("filecache.FileStateCache")
+
+    def __init__(self, path, max_size=2**30, link=True):
+        if isinstance(max_size, bool) or not isinstance(max_size, int) or \
+                max_size < 0:
+            raise exception.BadValue("Invalid max_size: %s" % max_size)
+        self.path = path
+        self.max_size = max_size
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        # the key to the (file name, size), from the least recently used
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        # the keys being fetched
+        self._fetching = set()
+        self._cond = threading.Condition()
+        self.load()
+
+    def __repr__(self):
+        return "<FileStateCache %s: %s files, %s bytes>" % (
+            self.path, len(self), self.size)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._entries)
+
+    def __contains__(self, item_state):
+        with self._cond:
+            return self._get_key(*item_state) in self._entries
+
+    @property
+    def size(self):
+        """The total bytes of the cached file states"""
+
+        with self._cond:
+            return self._size
+
+    def load(self):
+        """Load the cached file states from the folder, in the order of
+        their last use"""
+
+        found = list()
+        if os.path.isdir(self.path):
+            for folder, _, file_names in os.walk(self.path):
+                for file_name in file_names:
+                    if not file_name.endswith(_NAME_SUFFIX):
+                        continue
+                    key = file_name[:-len(_NAME_SUFFIX)]
+                    blob_path = os.path.join(folder, key)
+                    try:
+                        with open(blob_path + _NAME_SUFFIX,
+                                  "r",
+                                  encoding="UTF-8") as fp:
+                            name = fp.read()
+                        used = os.stat(blob_path + _NAME_SUFFIX).st_mtime
+                        size = os.stat(blob_path).st_size
+                    except (IOError, OSError):
+                        # e.g. a file state partially evicted
+                        continue
+                    found.append((used, key, name, size))
+        with self._cond:
+            self._entries.clear()
+            self._size = 0
+            for _, key, name, size in sorted(found):
+                self._entries[key] = (name, size)
+                self._size += size
+        self.log.debug("Load %s file states (%s bytes) from %s", len(found),
+                       self._size, self.path)
+
+    def lookup(self, item, state):
+        """Get the file name of a cached file state, and mark it as the most
+        recently used
+
+        :param item: the item id of the file
+        :param state: the state id of the file
+        :return: the file name, or `None` if the file state is not cached
+        :rtype: str
+        """
+
+        key = self._get_key(item, state)
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+        try:
+            # the cached file may be linked to the destination files, whose
+            # modification times are kept
+            os.utime(self._get_blob_path(key) + _NAME_SUFFIX)
+        except OSError:
+            pass
+        return entry[0]
+
+    def fetch(self, item, state, download, folder, override=True):
+        """Link (or copy) the file state to a folder, which is downloaded
+        and cached first if it is not cached yet
+
+        The same file state is only downloaded once at a time, the other
+        callers wait for it.
+
+        :param item: the item id of the file
+        :param state: the state id of the file
+        :param download: the function called with the path to download the
+            file state to, which returns the file name
+        :param folder: the folder to store the file
+        :param override: (default is `True`) whether to replace the file if
+            it exists in the folder
+        :return: the file path, or `None` if the file exists and is not
+            overridden
+        :rtype: str
+        """
+
+        key = self._get_key(item, state)
+        with self._cond:
+            self._cond.wait_for(lambda: key not in self._fetching)
+            self._fetching.add(key)
+        try:
+            name = self.lookup(item, state)
+            if name is None:
+                name = self._store(key, download)
+            file_path = os.path.join(folder, name)
+            if not override and os.path.exists(file_path):
+                return None
+            return self._copy(key, file_path)
+        finally:
+            with self._cond:
+                self._fetching.discard(key)
+                self._cond.notify_all()
+            self._evict()
+
+    def clear(self):
+        """Remove all the cached file states"""
+
+        with self._cond:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._size = 0
+        for key in keys:
+            self._remove(key)
+
+    def _store(self, key, download):
+        blob_path = self._get_blob_path(key)
+        folder = os.path.dirname(blob_path)
+        if not os.path.isdir(folder):
+            os.makedirs(folder, exist_ok=True)
+        name = download(blob_path)
+        with open(blob_path + _NAME_SUFFIX, "w", encoding="UTF-8") as fp:
+            fp.write(name)
+        size = os.path.getsize(blob_path)
+        with self._cond:
+            self._entries[key] = (name, size)
+            self._size += size
+        return name
+
+    def _copy(self, key, file_path):
+        blob_path = self._get_blob_path(key)
+        if os.path.lexists(file_path):
+            os.remove(file_path)
+        if self.link:
+            try:
+                os.link(blob_path, file_path)
+                return file_path
+            except OSError as excp:
+                # e.g. on another file system
+                self.log.debug("Unable to link %s, copy it instead: %s",
+                               file_path, excp)
+        shutil.copyfile(blob_path, file_path)
+        return file_path
+
+    def _evict(self):
+        evicted = list()
+        with self._cond:
+            for key in list(self._entries):
+                if self._size <= self.max_size:
+                    break
+                if key in self._fetching:
+                    # being linked/copied
+                    continue
+                self._size -= self._entries.pop(key)[1]
+                evicted.append(key)
+        for key in evicted:
+            self._remove(key)
+        if evicted:
+            self.log.debug("Evict %s file states from %s", len(evicted),
+                           self.path)
+
+    def _remove(self, key):
+        blob_path = self._get_blob_path(key)
+        for path in (blob_path + _NAME_SUFFIX, blob_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _get_blob_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    @staticmethod
+    def _get_key(item, state):
+        return hashlib.sha1(
+            ("%s@%s" % (item, state)).encode("UTF-8")).hexdigest()
@@ -0,0 +1,518 @@
+import collections
+import datetime
+import importlib
+import logging
+import re
+import sys
+
+from rtcclient import exception
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# the kinds of the columns
+OBJECT = "object"
+CATEGORY = "category"
+INTEGER = "integer"
+FLOAT = "float"
+DATETIME = "datetime"
+
+_INTEGER = re.compile(r"^-?\d+$")
+_FLOAT = re.compile(r"^-?\d+\.\d+$")
+_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?Z$")
+
+
+def _require(module_name, feature):
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        excp_msg = "Please install %s to use %s" % (module_name, feature)
+        WorkitemFrame.log.error(excp_msg)
+        raise exception.RTCException(excp_msg)
+
+
+class WorkitemFrame(object):
+    """A columnar container of the workitems for the analytics, which keeps
+    one array per attribute instead of one object per workitem
+
+    The kind of each column is inferred from its values:
+
+        * "integer"/"float": the numeric attributes (e.g. identifier), which
+          are NumPy arrays. An integer column with any missing value is a
+          "float" column instead, whose values are floats with NaN (or
+          `None` without NumPy) for the missing ones
+        * "datetime": the dates (e.g. modified), which are NumPy
+          datetime64[ms] arrays with NaT for the missing values
+        * "category": the low-cardinality strings (e.g. state, severity),
+          which are stored as the codes of the interned categories (-1 for
+          the missing values)
+        * "object": anything else, kept as a :class:`list`
+
+    Without NumPy, the columns are kept as :class:`list` of int, float,
+    :class:`datetime.datetime` and the category codes. The filtering, group-by
+    and counting work the same, only slower::
+
+        frame = myclient.getWorkitems(projectarea_id=pa_id, as_frame=True)
+        print(frame.count("state"))
+        opened = frame.filter(state=["New", "In Progress"],
+                              severity="Major")
+        df = opened.to_pandas()
+
+    :param columns: a :class:`dict` of the column names to the stored
+        columns
+    :param kinds: a :class:`dict` of the column names to the kinds
+    :param categories: (optional) a :class:`dict` of the names of the
+        category columns to their categories
+    :param urls: (optional) the workitem urls
+    """
+
+    log = logging.getLogger("frame.WorkitemFrame")
+
+    def __init__(self, columns, kinds, categories=None, urls=None):
+        self._columns = dict(columns)
+        self._kinds = dict(kinds)
+        self._categories = dict(categories or {})
+        self._lookups = dict(
+            (name, dict((value, code)
+                        for code, value in enumerate(values)))
+            for name, values in self._categories.items())
+        if urls is None and self._columns:
+            urls = [None] * len(next(iter(self._columns.values())))
+        self.urls = list(urls or [])
+
+    def __repr__(self):
+        return "<WorkitemFrame %s rows x %s columns>" % (len(self),
+                                                         len(self._columns))
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    @property
+    def columns(self):
+        """The column names"""
+
+        return list(self._columns)
+
+    @classmethod
+    def from_workitems(cls, workitems, categorical=None, max_ratio=0.5):
+        """Build the frame from the workitems
+
+        :param workitems: the :class:`rtcclient.workitem.Workitem` or
+            :class:`rtcclient.records.WorkitemRecord` objects
+        :param categorical: (optional) the names of the columns to store as
+            categories. If `None`, the string columns with at most
+            `max_ratio` distinct values per row are categories
+        :param max_ratio: (default is 0.5) the ratio of the distinct values
+            to the rows, under which a string column is a category
+        :return: the :class:`WorkitemFrame` object
+        :rtype: rtcclient.frame.WorkitemFrame
+        """
+
+        names = collections.OrderedDict()
+        rows = list()
+        urls = list()
+        for workitem in workitems:
+            as_dict = getattr(workitem, "as_dict", None)
+            if as_dict is not None:
+                # rtcclient.records.WorkitemRecord
+                row = as_dict()
+            else:
+                row = dict((attr, getattr(workitem, attr, None))
+                           for attr in workitem.field_alias)
+            names.update((name, None) for name in row)
+            rows.append(row)
+            urls.append(workitem.url)
+
+        columns = dict()
+        kinds = dict()
+        categories = dict()
+        for name in names:
+            values = [row.get(name) for row in rows]
+            kind = _infer_kind(values, max_ratio, categorical is not None and
+                               name in categorical)
+            if categorical is not None and kind == CATEGORY and \
+                    name not in categorical:
+                kind = OBJECT
+            kinds[name] = kind
+            if kind == CATEGORY:
+                categories[name], columns[name] = _encode(values)
+            else:
+                columns[name] = _build_column(kind, values)
+        return cls(columns, kinds, categories=categories, urls=urls)
+
+    def kind(self, name):
+        """Get the kind of the column
+
+        :param name: the column name
+        :return: one of "integer", "float", "datetime", "category" and
+            "object"
+        :rtype: str
+        """
+
+        self._check_column(name)
+        return self._kinds[name]
+
+    def categories(self, name):
+        """Get the categories of a category column
+
+        :param name: the column name
+        :return: a :class:`list` of the categories, whose indexes are the
+            codes
+        :rtype: list
+        """
+
+        self._check_column(name, CATEGORY)
+        return list(self._categories[name])
+
+    def codes(self, name):
+        """Get the codes of a category column, -1 for the missing values
+
+        :param name: the column name
+        :return: the NumPy int32 array (or a :class:`list` without NumPy)
+        """
+
+        self._check_column(name, CATEGORY)
+        return self._columns[name]
+
+    def column(self, name):
+        """Get the values of a column
+
+        The numeric and date columns are returned as they are stored. The
+        category columns are decoded into the interned strings.
+
+        :param name: the column name
+        :return: the NumPy array or the :class:`list` of the values
+        """
+
+        self._check_column(name)
+        stored = self._columns[name]
+        if self._kinds[name] != CATEGORY:
+            return stored
+        decoder = list(self._categories[name]) + [None]
+        if numpy is not None:
+            return numpy.asarray(decoder, dtype=object)[stored]
+        return [decoder[code] for code in stored]
+
+    def row(self, index):
+        """Get the values of a row
+
+        :param index: the row index
+        :return: a :class:`dict` of the column names to the values
+        :rtype: dict
+        """
+
+        return dict((name, self._value(name, index)) for name in self._columns)
+
+    def _value(self, name, index):
+        value = self._columns[name][index]
+        if self._kinds[name] == CATEGORY:
+            return self._categories[name][value] if value >= 0 else None
+        return _to_python(value)
+
+    def mask(self, name, value):
+        """Compare a column with the value
+
+        :param name: the column name
+        :param value: the value, or a :class:`list`/:class:`tuple`/
+            :class:`set` of the values to match any of them
+        :return: the NumPy boolean array (or a :class:`list` without NumPy)
+        """
+
+        self._check_column(name)
+        kind = self._kinds[name]
+        stored = self._columns[name]
+        if isinstance(value, (list, tuple, set, frozenset)):
+            wanted = list(value)
+        else:
+            wanted = [value]
+
+        if kind == CATEGORY:
+            lookup = self._lookups[name]
+            wanted = [
+                -1 if item is None else lookup.get(item, -2) for item in wanted
+            ]
+        elif kind != OBJECT:
+            wanted = [_convert(kind, item) for item in wanted]
+
+        if numpy is not None and kind != OBJECT:
+            if kind == CATEGORY or len(wanted) > 1:
+                return numpy.isin(stored, wanted)
+            return stored == wanted[0]
+        if kind == OBJECT:
+            # the values may be unhashable, e.g. lists
+            return [item in wanted for item in stored]
+        wanted = set(wanted)
+        return [item in wanted for item in stored]
+
+    def filter(self, mask=None, **conditions):
+        """Keep the rows matching the mask and all the conditions
+
+        :param mask: (optional) a boolean array or :class:`list`, e.g.
+            `frame["identifier"] > 100` with NumPy
+        :param conditions: the column names to the values (refer to
+            :meth:`mask`), e.g. `state=["New", "In Progress"]`
+        :return: the filtered :class:`WorkitemFrame` object
+        :rtype: rtcclient.frame.WorkitemFrame
+        """
+
+        masks = list() if mask is None else [mask]
+        masks.extend(
+            self.mask(name, value) for name, value in conditions.items())
+        if not masks:
+            return self.take(range(len(self)))
+
+        if numpy is not None:
+            combined = numpy.ones(len(self), dtype=bool)
+            for item in masks:
+                combined &= numpy.asarray(item, dtype=bool)
+            return self.take(numpy.flatnonzero(combined))
+        return self.take(
+            [idx for idx, matched in enumerate(zip(*masks)) if all(matched)])
+
+    def take(self, indices):
+        """Select the rows by their indexes
+
+        :param indices: the row indexes
+        :return: the :class:`WorkitemFrame` object with the selected rows
+        :rtype: rtcclient.frame.WorkitemFrame
+        """
+
+        if numpy is not None:
+            indices = numpy.asarray(indices, dtype=numpy.intp)
+            columns = dict(
+                (name, stored[indices] if not isinstance(stored, list) else
+                 [stored[idx]
+                  for idx in indices])
+                for name, stored in self._columns.items())
+        else:
+            indices = list(indices)
+            columns = dict((name, [stored[idx]
+                                   for idx in indices])
+                           for name, stored in self._columns.items())
+        return WorkitemFrame(columns,
+                             self._kinds,
+                             categories=self._categories,
+                             urls=[self.urls[idx] for idx in indices])
+
+    def count(self, name=None):
+        """Count the rows, or the rows per value of a column
+
+        :param name: (optional) the column name
+        :return: the number of the rows if `name` is `None`, otherwise a
+            :class:`dict` of the values to their numbers of rows
+        """
+
+        if name is None:
+            return len(self)
+
+        self._check_column(name)
+        if self._kinds[name] == CATEGORY:
+            codes = self._columns[name]
+            categories = self._categories[name]
+            if numpy is not None:
+                counts = numpy.bincount(codes + 1,
+                                        minlength=len(categories) + 1)
+                counted = dict((categories[idx], int(counts[idx + 1]))
+                               for idx in range(len(categories))
+                               if counts[idx + 1])
+                if counts[0]:
+                    counted[None] = int(counts[0])
+                return counted
+            counter = collections.Counter(codes)
+            return dict((categories[code] if code >= 0 else None, number)
+                        for code, number in counter.items())
+        return dict(
+            collections.Counter(
+                _hashable(self._value(name, idx)) for idx in range(len(self))))
+
+    def groupby(self, name):
+        """Group the rows by the values of a column
+
+        :param name: the column name
+        :return: a :class:`dict` of the values to the
+            :class:`WorkitemFrame` objects of their rows
+        :rtype: dict
+        """
+
+        self._check_column(name)
+        groups = collections.OrderedDict()
+        if self._kinds[name] == CATEGORY:
+            codes = self._columns[name]
+            categories = self._categories[name]
+            if numpy is not None:
+                for code in numpy.unique(codes):
+                    key = categories[code] if code >= 0 else None
+                    groups[key] = self.take(numpy.flatnonzero(codes == code))
+                return dict(groups)
+            indices = collections.OrderedDict()
+            for idx, code in enumerate(codes):
+                indices.setdefault(code, list()).append(idx)
+            return dict(
+                (categories[code] if code >= 0 else None, self.take(rows))
+                for code, rows in indices.items())
+
+        indices = collections.OrderedDict()
+        for idx in range(len(self)):
+            key = _hashable(self._value(name, idx))
+            indices.setdefault(key, list()).append(idx)
+        return dict((key, self.take(rows)) for key, rows in indices.items())
+
+    def to_pandas(self):
+        """Hand the columns off to a :class:`pandas.DataFrame` without
+        copying the NumPy arrays. The category columns become
+        :class:`pandas.Categorical` built from the codes
+
+        :return: the :class:`pandas.DataFrame` object
+        """
+
+        pandas = _require("pandas", "WorkitemFrame.to_pandas")
+        data = collections.OrderedDict()
+        for name, stored in self._columns.items():
+            if self._kinds[name] == CATEGORY:
+                data[name] = pandas.Categorical.from_codes(
+                    stored, categories=self._categories[name])
+            else:
+                data[name] = stored
+        return pandas.DataFrame(data, copy=False)
+
+    def to_arrow(self):
+        """Hand the columns off to a :class:`pyarrow.Table`. The numeric
+        columns without missing values are not copied, and the category
+        columns become dictionary arrays built from the codes
+
+        :return: the :class:`pyarrow.Table` object
+        """
+
+        pyarrow = _require("pyarrow", "WorkitemFrame.to_arrow")
+        arrays = collections.OrderedDict()
+        for name, stored in self._columns.items():
+            kind = self._kinds[name]
+            if kind == CATEGORY:
+                if numpy is not None:
+                    indices = pyarrow.array(stored, mask=stored < 0)
+                else:
+                    indices = pyarrow.array(
+                        [code if code >= 0 else None for code in stored],
+                        type=pyarrow.int32())
+                arrays[name] = pyarrow.DictionaryArray.from_arrays(
+                    indices,
+                    pyarrow.array(self._categories[name],
+                                  type=pyarrow.string()))
+            elif kind in (FLOAT, DATETIME) and numpy is not None:
+                # NaN and NaT are the missing values
+                arrays[name] = pyarrow.array(stored, from_pandas=True)
+            elif kind == OBJECT:
+                try:
+                    arrays[name] = pyarrow.array(stored)
+                except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                    # e.g. the strings mixed with the lists of strings
+                    arrays[name] = pyarrow.array([
+                        None if item is None else str(item) for item in stored
+                    ])
+            else:
+                arrays[name] = pyarrow.array(stored)
+        return pyarrow.table(arrays)
+
+    def _check_column(self, name, kind=None):
+        if name not in self._columns:
+            raise exception.BadValue("No column %s in the frame" % name)
+        if kind is not None and self._kinds[name] != kind:
+            raise exception.BadValue("Column %s is not a %s column" %
+                                     (name, kind))
+
+
+def _infer_kind(values, max_ratio, force_category=False):
+    present = [value for value in values if value is not None]
+    if not present or not all(isinstance(value, str) for value in present):
+        return OBJECT
+    if force_category:
+        return CATEGORY
+    if all(_INTEGER.match(value) for value in present):
+        # the missing values are NaN
+        return INTEGER if len(present) == len(values) else FLOAT
+    if all(_INTEGER.match(value) or _FLOAT.match(value) for value in present):
+        return FLOAT
+    if all(_DATETIME.match(value) for value in present):
+        return DATETIME
+    if len(set(present)) <= max(1, max_ratio * len(values)):
+        return CATEGORY
+    return OBJECT
+
+
+def _encode(values):
+    lookup = dict()
+    categories = list()
+    codes = list()
+    for value in values:
+        if value is None:
+            codes.append(-1)
+            continue
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(categories)
+            categories.append(sys.intern(value))
+        codes.append(code)
+    if numpy is not None:
+        codes = numpy.asarray(codes, dtype=numpy.int32)
+    return categories, codes
+
+
+def _convert(kind, value):
+    if value is None:
+        if numpy is None:
+            return None
+        return numpy.datetime64("NaT") if kind == DATETIME else numpy.nan
+    if kind == INTEGER:
+        return int(value)
+    if kind == FLOAT:
+        return float(value)
+    if isinstance(value, datetime.datetime):
+        value = value.astimezone(
+            datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    if numpy is not None:
+        return numpy.datetime64(value.rstrip("Z"), "ms")
+    date_format = ("%Y-%m-%dT%H:%M:%S.%fZ"
+                   if "." in value else "%Y-%m-%dT%H:%M:%SZ")
+    return datetime.datetime.strptime(
+        value, date_format).replace(tzinfo=datetime.timezone.utc)
+
+
+def _build_column(kind, values):
+    if kind == OBJECT:
+        return list(values)
+    if numpy is None:
+        return [_convert(kind, value) for value in values]
+    if kind == DATETIME:
+        return numpy.array([_convert(kind, value) for value in values],
+                           dtype="datetime64[ms]")
+    if kind == INTEGER:
+        return numpy.array([int(value) for value in values], dtype=numpy.int64)
+    return numpy.array([_convert(FLOAT, value) for value in values],
+                       dtype=numpy.float64)
+
+
+def _to_python(value):
+    if numpy is not None and isinstance(value, numpy.generic):
+        if isinstance(value, numpy.floating) and numpy.isnan(value):
+            return None
+        if isinstance(value, numpy.datetime64):
+            if numpy.isnat(value):
+                return None
+            return value.astype(
+                datetime.datetime).replace(tzinfo=datetime.timezone.utc)
+        return value.item()
+    return value
+
+
+def _hashable(value):
+    if isinstance(value, list):
+        return tuple(value)
+    return value
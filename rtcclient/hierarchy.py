@@ -0,0 +1,102 @@
+import collections
+
+
+class Hierarchy(object):
+    """The tree of the workitems under a root workitem, which is returned by
+    :meth:`rtcclient.client.RTCClient.getHierarchy`
+
+    The workitems are kept as :class:`rtcclient.records.WorkitemRecord`
+    objects keyed by their ids (strings), and the tree as the adjacency
+    lists of the ids::
+
+        tree = myclient.getHierarchy(123, depth=3)
+        for workitem_id, level in tree.walk():
+            print("  " * level, tree[workitem_id].title)
+
+    A workitem reachable from several parents (or a cycle) is only listed
+    under the parent it was first found under.
+
+    :param root: the id of the root workitem
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+        self.nodes = collections.OrderedDict()
+        self.children = dict()
+        self.parents = dict()
+        self.levels = dict()
+        # the ids of the workitems whose children failed to be retrieved
+        self.errors = dict()
+
+    def __repr__(self):
+        return "<Hierarchy %s: %s workitems>" % (self.root, len(self))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, workitem_id):
+        return str(workitem_id) in self.nodes
+
+    def __getitem__(self, workitem_id):
+        return self.nodes[str(workitem_id)]
+
+    def add(self, record, parent_id=None):
+        """Add a workitem to the tree if it is not in the tree yet
+
+        :param record: the :class:`rtcclient.records.WorkitemRecord` object
+        :param parent_id: (optional) the id of the parent, `None` for the
+            root workitem
+        :return: whether the workitem is added
+        :rtype: bool
+        """
+
+        workitem_id = str(record.identifier)
+        if workitem_id in self.nodes:
+            return False
+        self.nodes[workitem_id] = record
+        self.children[workitem_id] = list()
+        if parent_id is None:
+            self.levels[workitem_id] = 0
+        else:
+            parent_id = str(parent_id)
+            self.parents[workitem_id] = parent_id
+            self.children[parent_id].append(workitem_id)
+            self.levels[workitem_id] = self.levels[parent_id] + 1
+        return True
+
+    def walk(self, workitem_id=None):
+        """Walk the tree depth-first in the order of the children
+
+        :param workitem_id: (optional) the id of the workitem to start from,
+            the root if not specified
+        :return: a generator of the (workitem id, level) pairs
+        """
+
+        stack = [str(workitem_id or self.root)]
+        while stack:
+            current = stack.pop()
+            yield current, self.levels[current]
+            stack.extend(reversed(self.children[current]))
+
+    def descendants(self, workitem_id=None):
+        """Get the ids of all the workitems under the workitem
+
+        :param workitem_id: (optional) the id of the workitem, the root if
+            not specified
+        :return: a :class:`list` of the ids in the depth-first order
+        :rtype: list
+        """
+
+        return [current for current, _ in self.walk(workitem_id)][1:]
+
+    def leaves(self):
+        """Get the ids of the workitems without any children in the tree
+
+        :return: a :class:`list` of the ids
+        :rtype: list
+        """
+
+        return [
+            workitem_id for workitem_id, children in self.children.items()
+            if not children
+        ]
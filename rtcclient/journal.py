@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import re
+import threading
+
+import six
+
+from rtcclient import exception
+
+PENDING = "pending"
+CREATED = "created"
+
+_KEY = re.compile(r"^[\w.:-]+$")
+
+
+class CreateJournal(object):
+    """The journal of the workitems created with idempotency keys (refer to
+    `idempotency_key` in :meth:`rtcclient.client.RTCClient.createWorkitem`)
+
+    A key is journaled as pending before its workitem is posted, and as
+    created with the workitem id once the response is received. A key which
+    is still pending (e.g. the connection dropped or the process was killed
+    in the middle of the request) may or may not have been created by the
+    RTC server, so the workitem is looked up by the key before it is posted
+    again.
+
+    The journal is kept in memory, and appended to the file as JSON lines if
+    `path` is specified, so that the keys survive a restart of the
+    importer::
+
+        journal = CreateJournal("import.journal")
+        myclient = RTCClient(url, username, password, journal=journal)
+        print(journal.pending())
+
+    :param path: (optional) the journal file path
+    """
+
+    log = logging.getLogger("journal.CreateJournal")
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = dict()
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __repr__(self):
+        return "<CreateJournal %s keys>" % len(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def load(self):
+        """Load the journal from the file, the last entry of a key wins"""
+
+        with self._lock, open(self.path, "r", encoding="UTF-8") as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    key = entry["key"]
+                    state = entry["state"]
+                except (ValueError, KeyError, TypeError):
+                    # e.g. a line truncated by a crash
+                    self.log.warning("Skip the malformed journal entry: %s",
+                                     line)
+                    continue
+                if state is None:
+                    self._entries.pop(key, None)
+                else:
+                    self._entries[key] = (state, entry.get("id"))
+        self.log.debug("Load %s keys from %s", len(self._entries), self.path)
+
+    def _write(self, key, state, workitem_id=None):
+        if state is None:
+            self._entries.pop(key, None)
+        else:
+            self._entries[key] = (state, workitem_id)
+        if self.path is None:
+            return
+        with open(self.path, "a", encoding="UTF-8") as fp:
+            fp.write(
+                json.dumps({
+                    "key": key,
+                    "state": state,
+                    "id": workitem_id
+                }) + "\n")
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    def get(self, key):
+        """Get the state of the key
+
+        :param key: the idempotency key
+        :return: a :class:`tuple` of the state ("pending" or "created") and
+            the workitem id (`None` if pending), or `None` if the key is not
+            journaled
+        :rtype: tuple
+        """
+
+        with self._lock:
+            return self._entries.get(key)
+
+    def begin(self, key):
+        """Journal the key as pending before its workitem is posted
+
+        :param key: the idempotency key
+        """
+
+        with self._lock:
+            self._write(key, PENDING)
+
+    def commit(self, key, workitem_id):
+        """Journal the key as created
+
+        :param key: the idempotency key
+        :param workitem_id: the id of the created workitem
+        """
+
+        with self._lock:
+            self._write(key, CREATED, str(workitem_id))
+
+    def discard(self, key):
+        """Remove the key, e.g. when the RTC server rejected the workitem
+
+        :param key: the idempotency key
+        """
+
+        with self._lock:
+            if key in self._entries:
+                self._write(key, None)
+
+    def pending(self):
+        """Get the keys whose outcome is unknown
+
+        :return: a :class:`list` of the pending keys
+        :rtype: list
+        """
+
+        with self._lock:
+            return [
+                key for key, (state, _) in self._entries.items()
+                if state == PENDING
+            ]
+
+
+def validate_key(key):
+    """Check the idempotency key, which is stored in a property (or as a
+    tag) of the workitem and matched in the queries
+
+    :param key: the idempotency key
+    :return: the valid key
+    :rtype: str
+    """
+
+    if not isinstance(key, six.string_types) or not _KEY.match(key):
+        raise exception.BadValue("Invalid idempotency key: %s" % key)
+    return key
@@ -0,0 +1,365 @@
+import logging
+import re
+import threading
+
+from rtcclient import urlparse
+
+# latency buckets (in seconds) shared by all the duration histograms
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+
+# the path segment following one of these names is an identifier and will
+# be replaced by the placeholder when normalizing the endpoint
+_ID_PLACEHOLDERS = {
+    "contexts": "{pa}",
+    "projectareas": "{pa}",
+    "project-areas": "{pa}",
+    "types": "{pa}",
+    "enumerations": "{pa}",
+    "workflows": "{pa}",
+    "actions": "{workflow}",
+    "states": "{workflow}",
+    "queries": "{query}",
+    "users": "{user}",
+}
+
+_UUID_PATTERN = re.compile(r"^_[A-Za-z0-9_-]{20,}$")
+
+
+def normalize_endpoint(url, base_url=None):
+    """Normalize the request url to an endpoint template, which groups
+    the requests of the same kind together
+
+    e.g. "https://host:9443/jazz/oslc/workitems/161/rtc_cm:comments" will be
+    normalized to "oslc/workitems/{id}/rtc_cm:comments"
+
+    :param url: the request url
+    :param base_url: (optional) the RTC server url, which will be stripped
+        from the request url
+    :return: the endpoint template
+    :rtype: string
+    """
+
+    if url is None:
+        return "unknown"
+
+    if base_url and url.startswith(base_url):
+        url = url[len(base_url):]
+    path = urlparse.urlparse(url).path
+
+    segments = list()
+    previous = None
+    for segment in path.strip("/").split("/"):
+        if previous in _ID_PLACEHOLDERS:
+            segments.append(_ID_PLACEHOLDERS[previous])
+        elif segment.isdigit():
+            segments.append("{id}")
+        elif _UUID_PATTERN.match(segment):
+            segments.append("{uuid}")
+        else:
+            segments.append(segment)
+        previous = segment
+    return "/".join(segments)
+
+
+class Histogram(object):
+    """A cumulative histogram in the Prometheus style
+
+    :param buckets: the upper bounds of the buckets
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for idx, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.counts[idx] += 1
+                break
+
+    def cumulative(self):
+        """Get the cumulative counts of all the buckets (including `+Inf`)
+
+        :return: a :class:`list` contains (upper bound, count) tuples
+        :rtype: list
+        """
+
+        result = list()
+        total = 0
+        for upper_bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((_format_float(upper_bound), total))
+        result.append(("+Inf", self.count))
+        return result
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(self.cumulative())
+        }
+
+
+class _RequestStats(object):
+
+    def __init__(self, buckets):
+        self.count = 0
+        self.status = dict()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = Histogram(buckets)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "status": dict(self.status),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency": self.latency.as_dict()
+        }
+
+
+class MetricsRegistry(object):
+    """A thread-safe registry of the request, parse and object construction
+    metrics of a :class:`rtcclient.client.RTCClient`
+
+    Requests are grouped by HTTP method and the normalized endpoint template
+    (refer to :func:`rtcclient.metrics.normalize_endpoint`).
+
+    :param buckets: (optional) the upper bounds (in seconds) of the
+        duration histograms
+    :param enabled: (default is `True`) whether to record the metrics
+    """
+
+    log = logging.getLogger("metrics.MetricsRegistry")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, enabled=True):
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        return "<MetricsRegistry requests=%s>" % self.total_requests()
+
+    def reset(self):
+        """Drop all the recorded metrics"""
+
+        with self._lock:
+            self._requests = dict()
+            self._parse = dict()
+            self._build = dict()
+            self._cache = dict()
+
+    def record_request(self,
+                       method,
+                       endpoint,
+                       status,
+                       elapsed,
+                       bytes_sent=0,
+                       bytes_received=0):
+        """Record a finished HTTP request
+
+        :param method: the HTTP method (e.g. GET/POST)
+        :param endpoint: the normalized endpoint template
+        :param status: the response status code, or "error" if no response
+            is received
+        :param elapsed: the time (in seconds) waiting for the response
+        :param bytes_sent: the size of the request body
+        :param bytes_received: the size of the response body
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            key = (method, endpoint)
+            stats = self._requests.get(key)
+            if stats is None:
+                stats = _RequestStats(self.buckets)
+                self._requests[key] = stats
+            stats.count += 1
+            status = str(status)
+            stats.status[status] = stats.status.get(status, 0) + 1
+            stats.bytes_sent += bytes_sent or 0
+            stats.bytes_received += bytes_received or 0
+            stats.latency.observe(elapsed)
+
+    def record_parse(self, endpoint, elapsed):
+        """Record the time spent on parsing a response body
+
+        :param endpoint: the normalized endpoint template
+        :param elapsed: the parse time (in seconds)
+        """
+
+        self._observe(self._parse, endpoint, elapsed)
+
+    def record_build(self, resource_name, elapsed):
+        """Record the time spent on constructing a resource object
+
+        :param resource_name: the resource name (e.g. Workitem/Comment)
+        :param elapsed: the construction time (in seconds)
+        """
+
+        self._observe(self._build, resource_name, elapsed)
+
+    def record_cache(self, name, hit):
+        """Record a cache lookup
+
+        :param name: the cache name
+        :param hit: whether the lookup is a hit
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            stats = self._cache.setdefault(name, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def _observe(self, histograms, key, elapsed):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(self.buckets)
+                histograms[key] = histogram
+            histogram.observe(elapsed)
+
+    def total_requests(self):
+        with self._lock:
+            return sum(stats.count for stats in self._requests.values())
+
+    def as_dict(self):
+        """Get a snapshot of all the metrics
+
+        :return: a :class:`dict` with four keys: `requests` (keyed by
+            "METHOD endpoint"), `parse` (keyed by endpoint), `build`
+            (keyed by resource name) and `cache` (keyed by cache name)
+        :rtype: dict
+        """
+
+        with self._lock:
+            requests = dict()
+            for (method, endpoint), stats in self._requests.items():
+                entry = stats.as_dict()
+                entry["method"] = method
+                entry["endpoint"] = endpoint
+                requests[" ".join([method, endpoint])] = entry
+            return {
+                "requests": requests,
+                "parse": {
+                    key: histogram.as_dict()
+                    for key, histogram in self._parse.items()
+                },
+                "build": {
+                    key: histogram.as_dict()
+                    for key, histogram in self._build.items()
+                },
+                "cache": {
+                    key: dict(stats) for key, stats in self._cache.items()
+                }
+            }
+
+    def to_prometheus(self, prefix="rtcclient"):
+        """Export all the metrics in the Prometheus text exposition format
+
+        :param prefix: (default is "rtcclient") the prefix of metric names
+        :return: the :class:`string` object
+        :rtype: string
+        """
+
+        lines = list()
+        with self._lock:
+            requests = sorted(self._requests.items())
+            parse = sorted(self._parse.items())
+            build = sorted(self._build.items())
+            cache = sorted(self._cache.items())
+
+            name = "%s_requests_total" % prefix
+            _add_header(lines, name, "counter",
+                        "Total HTTP requests sent to the RTC server")
+            for (method, endpoint), stats in requests:
+                for status, count in sorted(stats.status.items()):
+                    labels = _format_labels(method=method,
+                                            endpoint=endpoint,
+                                            status=status)
+                    lines.append("%s%s %d" % (name, labels, count))
+
+            for suffix, attr, help_msg in [
+                ("request_bytes_sent_total", "bytes_sent",
+                 "Total bytes of the request bodies"),
+                ("response_bytes_received_total", "bytes_received",
+                 "Total bytes of the response bodies")
+            ]:
+                name = "_".join([prefix, suffix])
+                _add_header(lines, name, "counter", help_msg)
+                for (method, endpoint), stats in requests:
+                    labels = _format_labels(method=method, endpoint=endpoint)
+                    lines.append("%s%s %d" %
+                                 (name, labels, getattr(stats, attr)))
+
+            name = "%s_request_duration_seconds" % prefix
+            _add_header(lines, name, "histogram",
+                        "Time waiting for the RTC server responses")
+            for (method, endpoint), stats in requests:
+                _add_histogram(lines,
+                               name,
+                               stats.latency,
+                               method=method,
+                               endpoint=endpoint)
+
+            name = "%s_parse_duration_seconds" % prefix
+            _add_header(lines, name, "histogram",
+                        "Time spent on parsing the response bodies")
+            for endpoint, histogram in parse:
+                _add_histogram(lines, name, histogram, endpoint=endpoint)
+
+            name = "%s_build_duration_seconds" % prefix
+            _add_header(lines, name, "histogram",
+                        "Time spent on constructing the resource objects")
+            for resource_name, histogram in build:
+                _add_histogram(lines, name, histogram, resource=resource_name)
+
+            name = "%s_cache_lookups_total" % prefix
+            _add_header(lines, name, "counter", "Total cache lookups")
+            for cache_name, stats in cache:
+                for result in ["hits", "misses"]:
+                    labels = _format_labels(cache=cache_name, result=result)
+                    lines.append("%s%s %d" % (name, labels, stats[result]))
+
+        return "\n".join(lines) + "\n"
+
+
+def _add_header(lines, name, metric_type, help_msg):
+    lines.append("# HELP %s %s" % (name, help_msg))
+    lines.append("# TYPE %s %s" % (name, metric_type))
+
+
+def _add_histogram(lines, name, histogram, **labels):
+    for upper_bound, count in histogram.cumulative():
+        bucket_labels = _format_labels(le=upper_bound, **labels)
+        lines.append("%s_bucket%s %d" % (name, bucket_labels, count))
+    labels = _format_labels(**labels)
+    lines.append("%s_sum%s %s" % (name, labels, _format_float(histogram.sum)))
+    lines.append("%s_count%s %d" % (name, labels, histogram.count))
+
+
+def _format_labels(**labels):
+    pairs = list()
+    for key in sorted(labels, key=lambda k: (k == "le", k)):
+        value = str(labels[key]).replace("\\", "\\\\")
+        value = value.replace("\n", "\\n").replace("\"", "\\\"")
+        pairs.append("%s=\"%s\"" % (key, value))
+    return "{%s}" % ",".join(pairs)
+
+
+def _format_float(value):
+    return repr(float(value))
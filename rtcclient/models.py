@@ -2,10 +2,10 @@ import logging
 import os
 import re
 
-import xmltodict
-
-from rtcclient import urlunquote, OrderedDict
+from rtcclient import exception, urlunquote, OrderedDict
 from rtcclient.base import FieldBase
+from rtcclient.bulk import run_bulk, validate_concurrency
+from rtcclient.profiler import profile_calls
 
 
 class Role(FieldBase):
@@ -178,6 +178,7 @@ class IncludedInBuild(FieldBase):
         return self.label
 
 
+@profile_calls
 class ChangeSet(FieldBase):
     """ChangeSet"""
 
@@ -204,7 +205,8 @@ class ChangeSet(FieldBase):
                         verify=self.rtc_obj.verify,
                         proxies=self.rtc_obj.proxies,
                         headers=self.rtc_obj.headers)
-        raw_data = xmltodict.parse(resp.content).get("scm:ChangeSet")
+        raw_data = self._parse_xml(resp.content,
+                                   resource_url).get("scm:ChangeSet")
         common_changes = dict()
         changes = raw_data.get("changes")
         for (key, value) in raw_data.items():
@@ -214,6 +216,45 @@ class ChangeSet(FieldBase):
                 common_changes[key] = value
         return self._handle_changes(changes, common_changes)
 
+    def fetchAllFiles(self, folder, state="after", concurrency=8):
+        """Fetch the files of all the changes in this changeset to a folder
+        concurrently
+
+        The changes are retrieved once, and then the files are fetched with
+        at most `concurrency` requests in flight, each of which is streamed
+        to the disk chunk by chunk::
+
+            results = mychangeset.fetchAllFiles("/tmp/review",
+                                                state="before")
+            fetched = [result.value for result in results if result.value]
+
+        :param folder: the folder to store the files, which is created if it
+            does not exist
+        :param state: (default is "after") "before" to fetch the initial
+            files (refer to :meth:`Change.fetchBeforeStateFile`) or "after"
+            to fetch the final files (refer to
+            :meth:`Change.fetchAfterStateFile`)
+        :param concurrency: (default is 8) the maximum number of the
+            requests in flight
+        :return: a :class:`list` of :class:`rtcclient.bulk.BulkResult`
+            objects, whose `item` is the :class:`rtcclient.models.Change`
+            object and `value` is the file path (`None` if the file is
+            added/deleted in the change, or a folder)
+        :rtype: list
+        """
+
+        fetch = _get_state_fetcher(state)
+        concurrency = validate_concurrency(concurrency)
+        changes = self.getChanges()
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        results = run_bulk(lambda change: fetch(change, folder),
+                           changes,
+                           concurrency=concurrency)
+        self.log.info("Successfully fetch %s/%s files of <ChangeSet %s>",
+                      sum(result.ok for result in results), len(results), self)
+        return results
+
     def _handle_changes(self, changes, common_changes):
         change_objs = list()
 
@@ -231,6 +272,7 @@ class ChangeSet(FieldBase):
         return change_objs
 
 
+@profile_calls
 class Change(FieldBase):
     """Change"""
 
@@ -307,23 +349,84 @@ class Change(FieldBase):
 
         self.log.debug("Start fetching file from %s ..." % file_url)
 
-        resp = self.get(file_url,
-                        verify=self.rtc_obj.verify,
-                        headers=self.rtc_obj.headers)
-        file_name = re.findall(r".+filename\*=UTF-8''(.+)",
-                               resp.headers["content-disposition"])[0]
+        cache = getattr(self.rtc_obj, "file_cache", None)
+        if cache is not None:
+            # the file states are immutable, so they are only downloaded
+            # once to the cache
+            downloaded = list()
+            opened = list()
+            if not override and (self.item, state_id) not in cache:
+                # the file name is only known from the response, which is
+                # not downloaded if the file exists
+                resp, file_name = self._openFile(file_url)
+                if os.path.exists(os.path.join(file_folder, file_name)):
+                    resp.close()
+                    return
+                opened.append((resp, file_name))
+
+            def download(path):
+                if opened:
+                    resp, file_name = opened.pop()
+                else:
+                    resp, file_name = self._openFile(file_url)
+                self._download(file_url, path, response=resp)
+                downloaded.append(path)
+                return file_name
+
+            try:
+                file_path = cache.fetch(self.item,
+                                        state_id,
+                                        download,
+                                        file_folder,
+                                        override=override)
+            finally:
+                for resp, _ in opened:
+                    # e.g. cached by another thread meanwhile
+                    resp.close()
+            self._record_cache("file_states", not downloaded)
+            if file_path is not None:
+                self.log.info("Successfully Fetching '%s'" % file_path)
+            return file_path
+
+        resp, file_name = self._openFile(file_url)
         file_path = os.path.join(file_folder, file_name)
-
         if not override and os.path.exists(file_path):
+            resp.close()
             return
 
-        with open(file_path, "wb") as file_content:
-            file_content.write(resp.content)
-
+        self._download(file_url, file_path, response=resp)
         self.log.info("Successfully Fetching '%s' to '%s'" %
                       (file_name, file_path))
         return file_path
 
+    def _openFile(self, file_url):
+        """Open the streamed response of the file, and get the file name
+        from its headers"""
+
+        resp = self._open_download(file_url)
+        try:
+            if resp.status_code != 200:
+                self.log.error("Failed GET request at <%s> with status %s",
+                               file_url, resp.status_code)
+                resp.raise_for_status()
+            file_name = re.findall(r".+filename\*=UTF-8''(.+)",
+                                   resp.headers["content-disposition"])[0]
+        except Exception:
+            resp.close()
+            raise
+        return resp, file_name
+
+
+def _get_state_fetcher(state):
+    """Get the method of :class:`Change` which fetches the file in the
+    state ("before" or "after")"""
+
+    if state == "before":
+        return Change.fetchBeforeStateFile
+    if state == "after":
+        return Change.fetchAfterStateFile
+    raise exception.BadValue("Invalid state: %s" % state)
+
 
 class Attachment(FieldBase):
     """Attachment of the work item"""
@@ -339,3 +442,48 @@ class Attachment(FieldBase):
 
     def __str__(self):
         return self.identifier + ": " + self.title
+
+    def download(self, path, progress=None, retries=3):
+        """Download the attachment to a file
+
+        The content is streamed to the disk chunk by chunk, so that the
+        memory used does not depend on the attachment size. An interrupted
+        download is resumed from where it stopped (with a `Range` request)
+        up to `retries` times, or when it is downloaded again, and the size
+        of the file is verified against the attachment::
+
+            def report(received, total):
+                print("%d/%d bytes" % (received, total))
+
+            myattachment.download("/tmp/logs", progress=report)
+
+        :param path: the file path, or the folder to store the file with the
+            title (or the id if it has no title) of the attachment
+        :param progress: (optional) the function called with the bytes
+            received and the total bytes while it is downloaded
+        :param retries: (default is 3) the number of the resumes when the
+            connection fails
+        :return: the file path
+        :rtype: str
+        """
+
+        if getattr(self, "content", None) is None and self.url:
+            # e.g. the attachment is just uploaded
+            self._initialize()
+        content_url = getattr(self, "content", None)
+        if content_url is None:
+            raise exception.EmptyAttrib("No content of <Attachment %s>" % self)
+        if os.path.isdir(path):
+            # the attachment id is the file name if it has no title
+            file_name = getattr(self, "title", None) or self.identifier
+            if not file_name:
+                raise exception.EmptyAttrib("No file name of <Attachment %s>" %
+                                            self)
+            path = os.path.join(path, os.path.basename(file_name))
+        size = getattr(self, "contentLength", None)
+        self.log.debug("Start downloading <Attachment %s> to %s", self, path)
+        return self._download(content_url,
+                              path,
+                              size=int(size) if size is not None else None,
+                              retries=retries,
+                              progress=progress)
@@ -0,0 +1,75 @@
+import json
+
+from rtcclient import exception
+
+# the properties which are serialized as the XML attributes, and are prefixed
+# with "@" in the raw data
+ATTRIBUTES = frozenset([
+    "rdf:about", "rdf:resource", "rdf:nodeID", "rdf:parseType", "oslc_cm:label",
+    "oslc_cm:totalCount", "oslc_cm:next", "oslc_cm:collref"
+])
+RESULTS = "oslc_cm:results"
+
+
+def loads(content):
+    """Parse an OSLC JSON response body (application/x-oslc-cm-change-request
+    +json) into the same raw data as the XML representation, so that the
+    models are initialized from either of them
+
+        * the properties serialized as XML attributes (e.g. "rdf:resource")
+          are prefixed with "@"
+        * the numbers and booleans are converted to strings (e.g. "161" and
+          "false")
+        * an empty string or list is `None`, and a list of one value is the
+          value itself
+
+    :param content: the response body
+    :return: the raw data of the resource, or of the collection whose
+        entries are listed under "oslc_cm:results"
+    :rtype: dict
+    """
+
+    try:
+        data = json.loads(content)
+    except ValueError as excp:
+        raise exception.RTCException("Unable to parse the JSON response: "
+                                     "%s" % excp)
+    if not isinstance(data, dict):
+        raise exception.RTCException("Unexpected JSON response: %s" %
+                                     type(data).__name__)
+    return _convert(data)
+
+
+def loads_collection(content):
+    """Parse an OSLC JSON collection
+
+    :param content: the response body
+    :return: a :class:`tuple` contains the attributes of the collection (e.g.
+        "@oslc_cm:totalCount") and the :class:`list` of the entries
+    :rtype: tuple
+    """
+
+    raw_data = loads(content)
+    entries = raw_data.pop(RESULTS, None)
+    if entries is None:
+        entries = list()
+    elif not isinstance(entries, list):
+        entries = [entries]
+    return raw_data, entries
+
+
+def _convert(value):
+    if isinstance(value, dict):
+        return dict(("@" + key if key in ATTRIBUTES else key, _convert(item))
+                    for key, item in value.items())
+    if isinstance(value, list):
+        if not value:
+            return None
+        if len(value) == 1:
+            return _convert(value[0])
+        return [_convert(item) for item in value]
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value or None
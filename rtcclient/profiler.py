@@ -0,0 +1,306 @@
+import contextlib
+import functools
+import inspect
+import logging
+import threading
+import time
+
+# methods of the wrapped classes which are never treated as public calls
+_EXCLUDED_METHODS = frozenset([
+    "get", "post", "put", "delete", "getattr", "setattr", "get_rtc_obj",
+    "validate_url", "profile"
+])
+
+
+class ProfiledCall(object):
+    """A public API call recorded by :class:`rtcclient.profiler.Profiler`,
+    together with the requests it caused and its nested public calls
+
+    :param name: the call name (e.g. "RTCClient.getWorkitems")
+    :param parent: the parent :class:`ProfiledCall` object
+    """
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.children = list()
+        self.requests = dict()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.wait_time = 0.0
+        self.parse_time = 0.0
+        self.build_time = 0.0
+        self.elapsed = 0.0
+        self._start = time.perf_counter()
+
+    def __repr__(self):
+        return "<ProfiledCall %s requests=%s>" % (self.name,
+                                                  self.total_requests())
+
+    def total_requests(self, recursive=True):
+        """Get the number of requests caused by this call
+
+        :param recursive: (default is `True`) whether to include the requests
+            caused by the nested calls
+        :return: the number of requests
+        :rtype: int
+        """
+
+        total = sum(self.requests.values())
+        if recursive:
+            total += sum(child.total_requests() for child in self.children)
+        return total
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "elapsed": self.elapsed,
+            "requests": dict(self.requests),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "wait_time": self.wait_time,
+            "parse_time": self.parse_time,
+            "build_time": self.build_time,
+            "calls": [child.as_dict() for child in self.children]
+        }
+
+
+class Profiler(contextlib.ContextDecorator):
+    """Attribute the HTTP requests to the public API calls which caused them
+
+    It is usually created by :class:`rtcclient.client.RTCClient.profile` and
+    can be used either as a context manager or as a decorator::
+
+        with myclient.profile() as p:
+            myclient.getWorkitems(projectarea_name="ProjectArea")
+        print(p.report())
+
+    :param rtc_obj: a reference to the
+        :class:`rtcclient.client.RTCClient` object
+    :param n_plus_one_threshold: (default is 10) a warning will be logged
+        when a single call sends more requests than this threshold to the
+        same endpoint, which is the sign of an N+1 request pattern. Set to
+        `None` to disable the check
+    """
+
+    log = logging.getLogger("profiler.Profiler")
+
+    def __init__(self, rtc_obj, n_plus_one_threshold=10):
+        self.rtc_obj = rtc_obj
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.root = ProfiledCall("profile")
+        self.cache = dict()
+        self.warnings = list()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._open_calls = list()
+
+    def __enter__(self):
+        self.root._start = time.perf_counter()
+        self.rtc_obj._add_profiler(self)
+        return self
+
+    def __exit__(self, *excinfo):
+        self.rtc_obj._remove_profiler(self)
+        self.root.elapsed += time.perf_counter() - self.root._start
+        # re-check the whole call tree, which may be extended when the
+        # profiler is entered several times (e.g. used as a decorator)
+        self.warnings = list()
+        self._check_n_plus_one(self.root)
+        return False
+
+    def _get_stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = list()
+            self._local.stack = stack
+        return stack
+
+    def _current_call(self):
+        stack = self._get_stack()
+        if stack:
+            return stack[-1]
+        # the requests sent from the worker threads are attributed to the
+        # latest call which is still running
+        with self._lock:
+            if self._open_calls:
+                return self._open_calls[-1]
+        return self.root
+
+    def enter_call(self, name):
+        """Start recording a public call
+
+        :param name: the call name
+        :return: the :class:`rtcclient.profiler.ProfiledCall` object
+        """
+
+        parent = self._current_call()
+        call = ProfiledCall(name, parent=parent)
+        with self._lock:
+            parent.children.append(call)
+            self._open_calls.append(call)
+        self._get_stack().append(call)
+        return call
+
+    def exit_call(self, call):
+        """Finish recording a public call
+
+        :param call: the :class:`rtcclient.profiler.ProfiledCall` object
+            returned by :class:`rtcclient.profiler.Profiler.enter_call`
+        """
+
+        call.elapsed = time.perf_counter() - call._start
+        stack = self._get_stack()
+        if stack and stack[-1] is call:
+            stack.pop()
+        with self._lock:
+            self._open_calls.remove(call)
+
+    def record_request(self,
+                       method,
+                       endpoint,
+                       status,
+                       elapsed,
+                       bytes_sent=0,
+                       bytes_received=0):
+        kind = " ".join([method, endpoint])
+        call = self._current_call()
+        with self._lock:
+            call.requests[kind] = call.requests.get(kind, 0) + 1
+            call.wait_time += elapsed
+            call.bytes_sent += bytes_sent or 0
+            call.bytes_received += bytes_received or 0
+
+    def record_parse(self, endpoint, elapsed):
+        call = self._current_call()
+        with self._lock:
+            call.parse_time += elapsed
+
+    def record_build(self, resource_name, elapsed):
+        call = self._current_call()
+        with self._lock:
+            call.build_time += elapsed
+
+    def record_cache(self, name, hit):
+        """Record a cache lookup
+
+        :param name: the cache name
+        :param hit: whether the lookup is a hit
+        """
+
+        with self._lock:
+            stats = self.cache.setdefault(name, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def _check_n_plus_one(self, call):
+        threshold = self.n_plus_one_threshold
+        if threshold is not None:
+            for kind, count in call.requests.items():
+                if count > threshold:
+                    msg = ("Possible N+1 request pattern: %s sent %s "
+                           "requests of [%s]" % (call.name, count, kind))
+                    self.log.warning(msg)
+                    self.warnings.append(msg)
+        for child in call.children:
+            self._check_n_plus_one(child)
+
+    def _iter_calls(self, call=None):
+        call = call or self.root
+        yield call
+        for child in call.children:
+            for nested in self._iter_calls(child):
+                yield nested
+
+    def summary(self):
+        """Get the aggregated statistics of all the recorded calls
+
+        :return: a :class:`dict` contains the request counts by kind, total
+            bytes, total wait/parse/construction time, cache hit rates and
+            the N+1 warnings
+        :rtype: dict
+        """
+
+        with self._lock:
+            requests = dict()
+            totals = dict.fromkeys(["bytes_sent", "bytes_received"], 0)
+            totals.update(
+                dict.fromkeys(["wait_time", "parse_time", "build_time"], 0.0))
+            for call in self._iter_calls():
+                for kind, count in call.requests.items():
+                    requests[kind] = requests.get(kind, 0) + count
+                for key in totals:
+                    totals[key] += getattr(call, key)
+
+            cache = dict()
+            for name, stats in self.cache.items():
+                lookups = stats["hits"] + stats["misses"]
+                cache[name] = dict(stats,
+                                   hit_rate=(float(stats["hits"]) /
+                                             lookups if lookups else None))
+
+            summary = {
+                "requests": requests,
+                "total_requests": sum(requests.values()),
+                "total_bytes": totals["bytes_sent"] + totals["bytes_received"],
+                "cache": cache,
+                "warnings": list(self.warnings)
+            }
+            summary.update(totals)
+            return summary
+
+    def report(self):
+        """Format the recorded call tree as a human-readable report
+
+        :return: the :class:`string` object
+        :rtype: string
+        """
+
+        lines = list()
+        with self._lock:
+            self._format_call(self.root, 0, lines)
+        return "\n".join(lines)
+
+    def _format_call(self, call, depth, lines):
+        lines.append("%s%s: %d requests (%d direct), %d bytes, "
+                     "%.3fs wait, %.3fs parse, %.3fs total" %
+                     ("  " * depth, call.name, call.total_requests(),
+                      call.total_requests(recursive=False),
+                      call.bytes_sent + call.bytes_received, call.wait_time,
+                      call.parse_time, call.elapsed))
+        for kind, count in sorted(call.requests.items()):
+            lines.append("%s- %s x %d" % ("  " * (depth + 1), kind, count))
+        for child in call.children:
+            self._format_call(child, depth + 1, lines)
+
+
+def _profiled(func, name):
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        rtc_obj = self.get_rtc_obj()
+        profilers = getattr(rtc_obj, "_profilers", None)
+        if not profilers:
+            return func(self, *args, **kwargs)
+
+        profilers = list(profilers)
+        calls = [profiler.enter_call(name) for profiler in profilers]
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            for profiler, call in zip(profilers, calls):
+                profiler.exit_call(call)
+
+    return wrapper
+
+
+def profile_calls(cls):
+    """Class decorator which makes all the public methods of the class
+    recorded by the active :class:`rtcclient.profiler.Profiler` objects
+    """
+
+    for attr, value in list(vars(cls).items()):
+        if (attr.startswith("_") or attr in _EXCLUDED_METHODS or
+                not inspect.isfunction(value)):
+            continue
+        setattr(cls, attr, _profiled(value, ".".join([cls.__name__, attr])))
+    return cls
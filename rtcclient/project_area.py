@@ -1,13 +1,14 @@
 import logging
 
 import six
-import xmltodict
 
 from rtcclient import exception
 from rtcclient.base import FieldBase
 from rtcclient.models import Role
+from rtcclient.profiler import profile_calls
 
 
+@profile_calls
 class ProjectArea(FieldBase):
     """A wrapped class to perform all the operations in a Project Area
 
@@ -61,7 +62,7 @@ class ProjectArea(FieldBase):
                         headers=self.rtc_obj.headers)
 
         roles_list = list()
-        raw_data = xmltodict.parse(resp.content)
+        raw_data = self._parse_xml(resp.content, roles_url)
         roles_raw = raw_data['jp06:roles']['jp06:role']
         if not roles_raw:
             self.log.warning("There are no roles in <ProjectArea %s>", self)
@@ -5,8 +5,11 @@ import six
 from rtcclient import exception
 from rtcclient import urlquote
 from rtcclient.base import RTCBase
+from rtcclient.frame import WorkitemFrame
+from rtcclient.profiler import profile_calls
 
 
+@profile_calls
 class Query(RTCBase):
     """A wrapped class to perform all query-related actions
 
@@ -36,7 +39,10 @@ class Query(RTCBase):
                        projectarea_name=None,
                        returned_properties=None,
                        archived=False,
-                       skip_full_attributes=True):
+                       skip_full_attributes=True,
+                       compact=False,
+                       keep_raw_data=False,
+                       as_frame=False):
         """Query workitems with the query string in a certain
         :class:`rtcclient.project_area.ProjectArea`
 
@@ -51,6 +57,12 @@ class Query(RTCBase):
             Refer to :class:`rtcclient.client.RTCClient` for more explanations
         :param archived: (default is False) whether the
             :class:`rtcclient.workitem.Workitem` is archived
+        :param compact: (default is False) return the compact
+            :class:`rtcclient.records.WorkitemRecord` objects instead
+        :param keep_raw_data: (default is False) whether the compact records
+            keep the raw data
+        :param as_frame: (default is False) return a
+            :class:`rtcclient.frame.WorkitemFrame` object instead
         :return: a :class:`list` that contains the queried
             :class:`rtcclient.workitem.Workitem` objects
         :rtype: list
@@ -64,14 +76,17 @@ class Query(RTCBase):
         query_str = urlquote(query_str)
         rp = returned_properties
 
-        return (self.rtc_obj._get_paged_resources(
+        workitems = self.rtc_obj._get_paged_resources(
             "Query",
             projectarea_id=pa_id,
             customized_attr=query_str,
             page_size="100",
             returned_properties=rp,
             archived=archived,
-            skip_full_attributes=skip_full_attributes))
+            skip_full_attributes=skip_full_attributes,
+            compact=compact or as_frame,
+            keep_raw_data=keep_raw_data)
+        return _to_frame(workitems) if as_frame else workitems
 
     def getAllSavedQueries(self,
                            projectarea_id=None,
@@ -196,12 +211,17 @@ class Query(RTCBase):
                                        creator=self.rtc_obj.username,
                                        saved_query_name=saved_query_name)
 
-    def runSavedQueryByUrl(self, saved_query_url, returned_properties=None):
+    def runSavedQueryByUrl(self,
+                           saved_query_url,
+                           returned_properties=None,
+                           as_frame=False):
         """Query workitems using the saved query url
 
         :param saved_query_url: the saved query url
         :param returned_properties: the returned properties that you want.
             Refer to :class:`rtcclient.client.RTCClient` for more explanations
+        :param as_frame: (default is False) return a
+            :class:`rtcclient.frame.WorkitemFrame` object instead
         :return: a :class:`list` that contains the queried
             :class:`rtcclient.workitem.Workitem` objects
         :rtype: list
@@ -218,9 +238,13 @@ class Query(RTCBase):
             self.log.error(error_msg)
             raise exception.BadValue(error_msg)
         return self._runSavedQuery(saved_query_id,
-                                   returned_properties=returned_properties)
+                                   returned_properties=returned_properties,
+                                   as_frame=as_frame)
 
-    def runSavedQueryByID(self, saved_query_id, returned_properties=None):
+    def runSavedQueryByID(self,
+                          saved_query_id,
+                          returned_properties=None,
+                          as_frame=False):
         """Query workitems using the saved query id
 
         This saved query id can be obtained by below two methods:
@@ -235,6 +259,8 @@ class Query(RTCBase):
         :param saved_query_id: the saved query id
         :param returned_properties: the returned properties that you want.
             Refer to :class:`rtcclient.client.RTCClient` for more explanations
+        :param as_frame: (default is False) return a
+            :class:`rtcclient.frame.WorkitemFrame` object instead
         :return: a :class:`list` that contains the queried
             :class:`rtcclient.workitem.Workitem` objects
         :rtype: list
@@ -246,9 +272,13 @@ class Query(RTCBase):
             self.log.error(excp_msg)
             raise exception.BadValue(excp_msg)
         return self._runSavedQuery(saved_query_id,
-                                   returned_properties=returned_properties)
+                                   returned_properties=returned_properties,
+                                   as_frame=as_frame)
 
-    def runSavedQuery(self, saved_query_obj, returned_properties=None):
+    def runSavedQuery(self,
+                      saved_query_obj,
+                      returned_properties=None,
+                      as_frame=False):
         """Query workitems using the :class:`rtcclient.models.SavedQuery`
         object
 
@@ -256,6 +286,8 @@ class Query(RTCBase):
             object
         :param returned_properties: the returned properties that you want.
             Refer to :class:`rtcclient.client.RTCClient` for more explanations
+        :param as_frame: (default is False) return a
+            :class:`rtcclient.frame.WorkitemFrame` object instead
         :return: a :class:`list` that contains the queried
             :class:`rtcclient.workitem.Workitem` objects
         :rtype: list
@@ -268,12 +300,24 @@ class Query(RTCBase):
             self.log.error(error_msg)
             raise exception.RTCException(error_msg)
         return self._runSavedQuery(saved_query_id,
-                                   returned_properties=returned_properties)
+                                   returned_properties=returned_properties,
+                                   as_frame=as_frame)
 
-    def _runSavedQuery(self, saved_query_id, returned_properties=None):
+    def _runSavedQuery(self,
+                       saved_query_id,
+                       returned_properties=None,
+                       as_frame=False):
         rp = returned_properties
-        return (self.rtc_obj._get_paged_resources(
+        workitems = self.rtc_obj._get_paged_resources(
             "RunQuery",
             page_size="100",
             customized_attr=saved_query_id,
-            returned_properties=rp))
+            returned_properties=rp,
+            compact=as_frame)
+        return _to_frame(workitems) if as_frame else workitems
+
+
+def _to_frame(workitems):
+    if workitems is None:
+        return None
+    return WorkitemFrame.from_workitems(workitems)
@@ -0,0 +1,247 @@
+import collections
+import logging
+import threading
+
+from rtcclient.base import FieldBase
+from rtcclient.workitem import Workitem
+
+
+class RecordSchema(object):
+    """The attributes of the :class:`WorkitemRecord` objects, which are
+    shared by all the records with the same fields (e.g. the workitems of
+    the same type returned with the same `returned_properties`)
+
+    The schemas are shared through a cache of at most `max_schemas`
+    schemas, from which the least recently used ones are evicted.
+
+    :param field_alias: the :class:`dict` of the attribute names to the
+        property names (e.g. {"title": "dc:title"})
+    """
+
+    max_schemas = 256
+    _schemas = collections.OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, field_alias):
+        self.field_alias = dict(field_alias)
+        self.attributes = tuple(self.field_alias)
+        self.index = dict(
+            (attr, idx) for idx, attr in enumerate(self.attributes))
+
+    def __repr__(self):
+        return "<RecordSchema %s fields>" % len(self.attributes)
+
+    @classmethod
+    def get(cls, field_alias):
+        """Get the shared schema of the fields
+
+        :param field_alias: the :class:`dict` of the attribute names to the
+            property names
+        :return: the :class:`RecordSchema` object
+        :rtype: rtcclient.records.RecordSchema
+        """
+
+        key = tuple(field_alias.items())
+        with cls._lock:
+            schema = cls._schemas.get(key)
+            if schema is not None:
+                cls._schemas.move_to_end(key)
+                return schema
+            schema = cls._schemas[key] = cls(field_alias)
+            while len(cls._schemas) > cls.max_schemas:
+                cls._schemas.popitem(last=False)
+        return schema
+
+
+class WorkitemRecord(object):
+    """A compact, read-only record of a :class:`rtcclient.workitem.Workitem`
+    for the bulk result sets
+
+    Only the values are kept in a tuple, and the attribute names are shared
+    in a :class:`RecordSchema`. The raw data is dropped unless requested.
+    The attributes are read just like the ones of a workitem::
+
+        records = myclient.getWorkitems(projectarea_id=pa_id, compact=True)
+        print(records[0].title, records[0].field_alias["title"])
+
+    The methods of :class:`rtcclient.workitem.Workitem` (e.g. `getComments`)
+    are available as well, which build a workitem from the record without
+    any request.
+
+    :param url: the workitem url
+    :param rtc_obj: a reference to the
+        :class:`rtcclient.client.RTCClient` object
+    :param schema: the :class:`RecordSchema` object
+    :param values: the attribute values in the order of the schema
+    :param identifier: (optional) the id of the workitem, which is taken
+        from the values or the url if not specified
+    :param raw_data: (optional) the raw data of the workitem
+    """
+
+    __slots__ = ("url", "rtc_obj", "identifier", "raw_data", "_schema",
+                 "_values")
+
+    def __init__(self,
+                 url,
+                 rtc_obj,
+                 schema,
+                 values,
+                 identifier=None,
+                 raw_data=None):
+        self.url = url
+        self.rtc_obj = rtc_obj
+        self.raw_data = raw_data
+        self._schema = schema
+        self._values = tuple(values)
+        if identifier is None:
+            idx = schema.index.get("identifier")
+            identifier = (self._values[idx]
+                          if idx is not None else url.split("/")[-1])
+        self.identifier = identifier
+
+    @classmethod
+    def from_workitem(cls, workitem, keep_raw_data=False):
+        """Convert a :class:`rtcclient.workitem.Workitem` object to a record
+
+        :param workitem: the :class:`rtcclient.workitem.Workitem` object
+        :param keep_raw_data: (default is `False`) whether to keep the raw
+            data of the workitem
+        :return: the :class:`WorkitemRecord` object
+        :rtype: rtcclient.records.WorkitemRecord
+        """
+
+        schema = RecordSchema.get(workitem.field_alias)
+        values = [getattr(workitem, attr) for attr in schema.attributes]
+        return cls(workitem.url,
+                   workitem.rtc_obj,
+                   schema,
+                   values,
+                   identifier=workitem.identifier,
+                   raw_data=workitem.raw_data if keep_raw_data else None)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            schema = self._schema
+        except AttributeError:
+            # not initialized yet, e.g. when unpickling
+            raise AttributeError(name)
+        idx = schema.index.get(name)
+        if idx is not None:
+            return self._values[idx]
+        if callable(getattr(Workitem, name, None)):
+            return getattr(self.to_workitem(), name)
+        raise AttributeError("%r object has no attribute %r" %
+                             (self.__class__.__name__, name))
+
+    def __str__(self):
+        return str(self.identifier)
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, str(self))
+
+    def __dir__(self):
+        return sorted(set(object.__dir__(self)) | set(self._schema.attributes))
+
+    @property
+    def field_alias(self):
+        """The attribute names to the property names, which are shared by
+        the records of the same schema and must not be modified"""
+
+        return self._schema.field_alias
+
+    def as_dict(self):
+        """Get the attribute values
+
+        :return: a :class:`dict` of the attribute names to the values
+        :rtype: dict
+        """
+
+        return dict(zip(self._schema.attributes, self._values))
+
+    def to_workitem(self):
+        """Build a :class:`rtcclient.workitem.Workitem` object with the
+        values of this record, without any request
+
+        :return: the :class:`rtcclient.workitem.Workitem` object
+        :rtype: rtcclient.workitem.Workitem
+        """
+
+        workitem = Workitem(self.url,
+                            self.rtc_obj,
+                            workitem_id=self.identifier,
+                            raw_data=dict())
+        workitem.raw_data = self.raw_data
+        workitem.field_alias = dict(self._schema.field_alias)
+        for attr, value in zip(self._schema.attributes, self._values):
+            workitem.setattr(attr, value)
+        return workitem
+
+
+class RecordBuilder(FieldBase):
+    """Build the :class:`WorkitemRecord` objects from the parsed entries of
+    the workitems, without building the
+    :class:`rtcclient.workitem.Workitem` objects
+
+    The attributes are processed just like the ones of a workitem, but the
+    title of each linked resource (e.g. the project area or the owner) is
+    only retrieved once for all the records of the builder.
+
+    :param rtc_obj: a reference to the
+        :class:`rtcclient.client.RTCClient` object
+    :param keep_raw_data: (default is `False`) whether the records keep the
+        raw data
+    :param skip_full_attributes: (default is `True`) whether to skip the
+        attributes with the full names
+    """
+
+    log = logging.getLogger("records.RecordBuilder")
+
+    def __init__(self, rtc_obj, keep_raw_data=False, skip_full_attributes=True):
+        FieldBase.__init__(self,
+                           None,
+                           rtc_obj,
+                           skip_full_attributes=skip_full_attributes)
+        self.keep_raw_data = keep_raw_data
+        # the url of the linked resource to its title, and the locks to
+        # retrieve each title once
+        self._titles = dict()
+        self._title_locks = dict()
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return "records"
+
+    def build(self, url, entry):
+        """Build the record of a parsed entry
+
+        :param url: the workitem url
+        :param entry: the parsed entry of the workitem
+        :return: the :class:`WorkitemRecord` object
+        :rtype: rtcclient.records.WorkitemRecord
+        """
+
+        field_alias = dict()
+        values = dict()
+        for key, attr, value in self._process_raw_data(entry or dict()):
+            field_alias[attr] = key
+            values[attr] = value
+        schema = RecordSchema.get(field_alias)
+        return WorkitemRecord(url,
+                              self.rtc_obj,
+                              schema,
+                              [values[attr] for attr in schema.attributes],
+                              raw_data=entry if self.keep_raw_data else None)
+
+    def _get_link_title(self, rdf_url):
+        with self._lock:
+            lock = self._title_locks.setdefault(rdf_url, threading.Lock())
+        with lock:
+            hit = rdf_url in self._titles
+            if not hit:
+                self._titles[rdf_url] = FieldBase._get_link_title(self, rdf_url)
+        self._record_cache("link_titles", hit)
+        title = self._titles[rdf_url]
+        # the titles of several resources are not shared by the records
+        return list(title) if isinstance(title, list) else title
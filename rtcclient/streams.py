@@ -0,0 +1,130 @@
+import io
+import os
+import uuid
+
+# the size of the chunks read from the files
+CHUNK_SIZE = 64 * 1024
+# the minimum bytes between two progress callbacks
+PROGRESS_INTERVAL = 1024 * 1024
+
+
+class MultipartFileStream(io.RawIOBase):
+    """A multipart/form-data request body of one file, which is read from
+    the disk chunk by chunk while it is sent, so that the memory used does
+    not depend on the file size
+
+    The body is seekable and its length is known, so that it is sent with
+    `Content-Length` (instead of the chunked encoding) and can be sent
+    again, e.g. after relogin::
+
+        with MultipartFileStream("attach", "/path/to/test.log") as body:
+            headers["Content-Type"] = body.content_type
+            myclient.post(url, data=body, headers=headers)
+
+    :param name: the name of the form field
+    :param filepath: the file path
+    :param content_type: (default is "application/octet-stream") the
+        content type of the file
+    :param progress: (optional) the function called with the bytes sent and
+        the total bytes of the body while it is sent
+    """
+
+    def __init__(self,
+                 name,
+                 filepath,
+                 content_type="application/octet-stream",
+                 progress=None):
+        super(MultipartFileStream, self).__init__()
+        self.filepath = filepath
+        self.progress = progress
+        self.boundary = uuid.uuid4().hex
+        filename = os.path.basename(filepath).replace('"', "%22")
+        self._head = "".join([
+            "--%s\r\n" % self.boundary,
+            'Content-Disposition: form-data; name="%s"; filename="%s"\r\n' %
+            (name, filename),
+            "Content-Type: %s\r\n\r\n" % content_type
+        ]).encode("UTF-8")
+        self._tail = ("\r\n--%s--\r\n" % self.boundary).encode("UTF-8")
+        self._file = open(filepath, "rb")
+        self._file_size = os.fstat(self._file.fileno()).st_size
+        self._length = len(self._head) + self._file_size + len(self._tail)
+        self._position = 0
+        self._reported = 0
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    @property
+    def content_type(self):
+        """The content type of the body with the boundary"""
+
+        return "multipart/form-data; boundary=%s" % self.boundary
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._length
+        self._position = min(max(offset, 0), self._length)
+        self._reported = min(self._reported, self._position)
+        return self._position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length - self._position
+        chunks = list()
+        while size > 0 and self._position < self._length:
+            chunk = self._read_part(size)
+            self._position += len(chunk)
+            size -= len(chunk)
+            chunks.append(chunk)
+        data = b"".join(chunks)
+        if self.progress is not None and data and (
+                self._position - self._reported >= PROGRESS_INTERVAL or
+                self._position == self._length):
+            self._reported = self._position
+            self.progress(self._position, self._length)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _read_part(self, size):
+        file_start = len(self._head)
+        file_end = file_start + self._file_size
+        if self._position < file_start:
+            return self._head[self._position:file_start][:size]
+        if self._position < file_end:
+            offset = self._position - file_start
+            if self._file.tell() != offset:
+                self._file.seek(offset)
+            chunk = self._file.read(min(size, file_end - self._position))
+            if not chunk:
+                raise IOError("%s is truncated while being sent" %
+                              self.filepath)
+            return chunk
+        return self._tail[self._position - file_end:][:size]
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super(MultipartFileStream, self).close()
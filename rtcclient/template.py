@@ -1,5 +1,6 @@
 import logging
 import os
+import threading
 from xml.sax.saxutils import escape
 
 import jinja2
@@ -9,9 +10,11 @@ import xmltodict
 
 from rtcclient import exception
 from rtcclient.base import RTCBase
+from rtcclient.profiler import profile_calls
 from rtcclient.utils import remove_empty_elements
 
 
+@profile_calls
 class Templater(RTCBase):
     """A wrapped class used to generate and render templates
     from some copied workitems
@@ -21,12 +24,19 @@ class Templater(RTCBase):
     :param searchpath: the folder to store your templates.
         If `None`, the default search path
         (/your/site-packages/rtcclient/templates) will be loaded automatically.
-
+    :param bytecode_cache: (optional) the folder (or the
+        :class:`jinja2.BytecodeCache` object) to keep the compiled templates
+        across the processes, so that the templates are only compiled once
+        until they are modified
+
+    The fields of the templates (refer to :meth:`listFields`) are kept in
+    memory keyed by the template paths and modification times, along with
+    the compiled templates cached by :class:`jinja2.Environment`.
     """
 
     log = logging.getLogger("template.Templater")
 
-    def __init__(self, rtc_obj, searchpath=None):
+    def __init__(self, rtc_obj, searchpath=None, bytecode_cache=None):
         self.rtc_obj = rtc_obj
         RTCBase.__init__(self, self.rtc_obj.url)
         if searchpath is None:
@@ -34,9 +44,18 @@ class Templater(RTCBase):
                 os.path.realpath(os.path.dirname(__file__)), 'templates')
         else:
             self.searchpath = searchpath
-        self.loader = jinja2.FileSystemLoader(searchpath=self.searchpath)
+        self.loader = _SourceLoader(searchpath=self.searchpath)
+        if isinstance(bytecode_cache, six.string_types):
+            if not os.path.isdir(bytecode_cache):
+                os.makedirs(bytecode_cache)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_cache)
         self.environment = jinja2.Environment(loader=self.loader,
-                                              trim_blocks=True)
+                                              trim_blocks=True,
+                                              bytecode_cache=bytecode_cache)
+        # the template name to the (path, mtime, fields) of the template
+        # source loaded by the environment
+        self._fields = dict()
+        self._fields_lock = threading.Lock()
 
     def __str__(self):
         return "Templater for %s" % self.rtc_obj
@@ -76,6 +95,32 @@ class Templater(RTCBase):
         :rtype: string
         """
 
+        return self._render_template(self._get_template(template), **kwargs)
+
+    def _get_template(self, template):
+        """Load and compile the template
+
+        :param template: the template file name
+        :return: the compiled :class:`jinja2.Template` object
+        """
+
+        try:
+            return self.environment.get_template(template)
+        except AttributeError:
+            err_msg = "Invalid value for 'template'"
+            self.log.error(err_msg)
+            raise exception.BadValue(err_msg)
+
+    def _render_template(self, temp, **kwargs):
+        """Render the compiled template, which can be rendered many times
+        without loading it again
+
+        :param temp: the compiled :class:`jinja2.Template` object
+        :param kwargs: refer to `kwargs` in :meth:`render`
+        :return: the :class:`string` object
+        :rtype: string
+        """
+
         if kwargs.get("title", None) is not None:
             kwargs["title"] = escape(kwargs["title"])
 
@@ -83,7 +128,6 @@ class Templater(RTCBase):
             kwargs["description"] = escape(kwargs["description"])
 
         try:
-            temp = self.environment.get_template(template)
             return temp.render(**kwargs)
         except AttributeError:
             err_msg = "Invalid value for 'template'"
@@ -158,14 +202,20 @@ class Templater(RTCBase):
         :rtype: set
         """
 
-        try:
-            temp_source = self.environment.loader.get_source(
-                self.environment, template)
-            return self.listFieldsFromSource(temp_source)
-        except AttributeError:
-            err_msg = "Invalid value for 'template'"
-            self.log.error(err_msg)
-            raise exception.BadValue(err_msg)
+        # the environment loads the template source again if it is modified
+        self._get_template(template)
+        temp_source, path, mtime = self.loader.get_loaded(template)
+        with self._fields_lock:
+            cached = self._fields.get(template)
+        hit = cached is not None and cached[:2] == (path, mtime)
+        self._record_cache("template_fields", hit)
+        if hit:
+            return set(cached[2])
+
+        fields = frozenset(self.listFieldsFromSource(temp_source))
+        with self._fields_lock:
+            self._fields[template] = (path, mtime, fields)
+        return set(fields)
 
     def listFieldsFromWorkitem(self, copied_from, keep=False):
         """List all the attributes to be rendered directly from some
@@ -279,7 +329,7 @@ class Templater(RTCBase):
                         verify=self.rtc_obj.verify,
                         proxies=self.rtc_obj.proxies,
                         headers=self.rtc_obj.headers)
-        raw_data = xmltodict.parse(resp.content)
+        raw_data = self._parse_xml(resp.content, workitem_url)
 
         # pre-adjust the template:
         # remove some attribute to avoid being overwritten, which will only be
@@ -435,3 +485,28 @@ class Templater(RTCBase):
         self.log.info(
             "Successfully fetch all the templates from "
             "workitems: %s", workitems)
+
+
+class _SourceLoader(jinja2.FileSystemLoader):
+    """A :class:`jinja2.FileSystemLoader` which keeps the last loaded
+    source of each template, so that the fields are listed from the same
+    source as the compiled template"""
+
+    def __init__(self, *args, **kwargs):
+        super(_SourceLoader, self).__init__(*args, **kwargs)
+        self._loaded = dict()
+        self._lock = threading.Lock()
+
+    def get_source(self, environment, template):
+        source, path, uptodate = super(_SourceLoader,
+                                       self).get_source(environment, template)
+        mtime = os.path.getmtime(path) if path is not None else None
+        with self._lock:
+            self._loaded[template] = (source, path, mtime)
+        return source, path, uptodate
+
+    def get_loaded(self, template):
+        """Get the (source, path, mtime) of the template last loaded"""
+
+        with self._lock:
+            return self._loaded[template]
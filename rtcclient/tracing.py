@@ -0,0 +1,141 @@
+import contextlib
+import logging
+import threading
+import time
+
+from rtcclient import exception
+
+
+class NoopSpan(object):
+    """A span which drops all the attributes"""
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Tracer(object):
+    """The base class of the pluggable tracing hooks
+
+    :class:`rtcclient.client.RTCClient` emits spans for each HTTP request,
+    each page of the paged resources, each parse of the XML response bodies
+    and each construction of the resource objects. The emitted spans are:
+
+        * rtcclient.request (http.method, http.url, rtcclient.endpoint,
+          http.status_code, rtcclient.bytes_sent, rtcclient.bytes_received)
+        * rtcclient.page (rtcclient.resource, rtcclient.page_index,
+          rtcclient.entry_count, rtcclient.bytes)
+        * rtcclient.parse (rtcclient.endpoint, rtcclient.bytes)
+        * rtcclient.build (rtcclient.resource, rtcclient.url)
+
+    Subclass it and override :class:`rtcclient.tracing.Tracer.span` to
+    forward the spans to your tracing library.
+    """
+
+    def span(self, name, **attributes):
+        """Start a span, which should be used as a context manager and
+        yields an object with a `set_attribute(key, value)` method
+
+        :param name: the span name
+        :param attributes: the initial attributes of the span
+        """
+
+        return contextlib.nullcontext(NOOP_SPAN)
+
+
+class RecordedSpan(object):
+    """A finished span recorded by :class:`rtcclient.tracing.RecordingTracer`
+    """
+
+    def __init__(self, name, attributes, parent=None):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.end = None
+
+    def __repr__(self):
+        return "<RecordedSpan %s %s>" % (self.name, self.attributes)
+
+    @property
+    def duration(self):
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class RecordingTracer(Tracer):
+    """A tracer which keeps all the finished spans in memory, which is
+    helpful to inspect the round trips without any tracing library
+
+    The spans started in the same thread are nested.
+    """
+
+    def __init__(self):
+        self.spans = list()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = list()
+            self._local.stack = stack
+
+        span = RecordedSpan(name,
+                            attributes,
+                            parent=stack[-1] if stack else None)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    def find(self, name):
+        """Get all the finished spans with the name
+
+        :param name: the span name
+        :return: a :class:`list` contains the
+            :class:`rtcclient.tracing.RecordedSpan` objects
+        :rtype: list
+        """
+
+        with self._lock:
+            return [span for span in self.spans if span.name == name]
+
+
+class OpenTelemetryTracer(Tracer):
+    """Forward the spans to OpenTelemetry
+
+    The `opentelemetry-api` package is required, which is not a dependency
+    of rtcclient.
+
+    :param tracer: (optional) the OpenTelemetry tracer. If `None`, the
+        tracer named "rtcclient" from the global tracer provider is used
+    """
+
+    log = logging.getLogger("tracing.OpenTelemetryTracer")
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                excp_msg = ("Please install opentelemetry-api to use "
+                            "OpenTelemetryTracer")
+                self.log.error(excp_msg)
+                raise exception.RTCException(excp_msg)
+            tracer = trace.get_tracer("rtcclient")
+        self.tracer = tracer
+
+    def span(self, name, **attributes):
+        return self.tracer.start_as_current_span(name, attributes=attributes)
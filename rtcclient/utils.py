@@ -1,11 +1,12 @@
 import functools
 import logging
+from xml.parsers import expat
 from xml.parsers.expat import ExpatError
 
 import six
-import xmltodict
 from lxml import etree
 
+from rtcclient import requests, urlencode
 from rtcclient.exception import RTCException, BadValue
 
 
@@ -29,7 +30,8 @@ def token_expire_handler(func):
             # check whether token expires
             try:
                 resp = func(*args, **kwargs)
-                xmltodict.parse(resp.content)
+                if not _is_json_response(kwargs.get("headers"), resp):
+                    check_well_formed(resp.content)
                 return resp
             except ExpatError as excp:
                 if "invalid token" in str(excp):
@@ -40,6 +42,10 @@ def token_expire_handler(func):
                         raise RTCException("Relogin Failed: "
                                            "Invalid username or password")
                     kwargs["headers"]["Cookie"] = rtc_obj.headers["Cookie"]
+                    data = kwargs.get("data")
+                    if hasattr(data, "seek"):
+                        # send the streamed body again from the beginning
+                        data.seek(0)
                     return func(*args, **kwargs)
                 else:
                     # not expires
@@ -49,6 +55,117 @@ def token_expire_handler(func):
     return wrapper
 
 
+def _is_json_response(headers, resp):
+    # the login page is returned instead of the JSON response when the
+    # session expires
+    if not isinstance(headers, dict) or \
+            "json" not in (headers.get("Accept") or ""):
+        return False
+    content = resp.content or ""
+    return content.lstrip()[:1] in ("{", "[", b"{", b"[")
+
+
+def check_well_formed(content):
+    """Check whether the response body is a well-formed XML document
+
+    Only the expat parser runs without building any objects, which is
+    much cheaper than parsing the whole body.
+
+    :param content: the response body
+    :raise ExpatError: the response body is not well-formed, e.g. the
+        login page when the session expires
+    """
+
+    encoding = None
+    if isinstance(content, six.text_type):
+        # the same as xmltodict, which ignores the declared encoding
+        content = content.encode("utf-8")
+        encoding = "utf-8"
+    parser = expat.ParserCreate(encoding)
+    parser.Parse(content, True)
+
+
+def get_data_size(data):
+    """Get the size of the request body
+
+    :param data: the request body
+    :return: the size in bytes, or 0 if unknown (e.g. a generator)
+    :rtype: int
+    """
+
+    if data is None:
+        return 0
+    if isinstance(data, (bytes, str)):
+        return len(data)
+    if isinstance(data, dict):
+        return len(urlencode(data))
+    try:
+        return len(data)
+    except TypeError:
+        return 0
+
+
+def get_body_size(response, stream=False):
+    """Get the size of the response body
+
+    :param response: the :class:`requests.Response` object
+    :param stream: (default is `False`) whether the response body is
+        streamed, in which case the `Content-Length` header is used instead
+        of reading the body
+    :return: the size in bytes, or 0 if unknown
+    :rtype: int
+    """
+
+    try:
+        if stream:
+            return int(response.headers.get("Content-Length") or 0)
+        content = response.content
+    except Exception:
+        return 0
+    if isinstance(content, (bytes, str)):
+        return len(content)
+    return 0
+
+
+def get_etag(response):
+    """Get the ETag of the response
+
+    :param response: the :class:`requests.Response` object
+    :return: the ETag, or `None` if not returned
+    :rtype: str
+    """
+
+    try:
+        etag = response.headers.get("ETag")
+    except Exception:
+        return None
+    return etag if isinstance(etag, six.string_types) else None
+
+
+def is_retryable_error(excp):
+    """Check whether a failed request may succeed when it is sent again,
+    i.e. the connection failed/timed out/dropped in the middle of the
+    response or the RTC server returned 5xx
+
+    The request may have been handled by the RTC server anyway, e.g. the
+    connection dropped after the response was sent.
+
+    :param excp: the exception raised for the request
+    :return: whether the request can be retried
+    :rtype: bool
+    """
+
+    retryable = (requests.exceptions.ConnectionError,
+                 requests.exceptions.Timeout,
+                 requests.exceptions.ChunkedEncodingError)
+    if isinstance(excp, retryable):
+        return True
+    if isinstance(excp, requests.exceptions.HTTPError):
+        response = excp.response
+        return response is None or response.status_code >= 500
+    return False
+
+
 def capitalize(keyword):
     """Only capitalize the first character and make the left unchanged
 
@@ -1,3 +1,4 @@
+import collections
 import copy
 import json
 import logging
@@ -7,11 +8,48 @@ import six
 import xmltodict
 from requests.exceptions import HTTPError
 
-from rtcclient import exception, OrderedDict
+from rtcclient import exception, OrderedDict, urlquote, urlunquote
 from rtcclient.base import FieldBase
-from rtcclient.models import Comment, Attachment
-
-
+from rtcclient.bulk import BulkResult, run_bulk, validate_concurrency
+from rtcclient.models import Comment, Attachment, _get_state_fetcher
+from rtcclient.profiler import profile_calls
+from rtcclient.streams import MultipartFileStream
+from rtcclient.utils import get_etag
+
+# the properties of the well-known fields, which are used when the
+# workitem is not retrieved (e.g. by :meth:`RTCClient.updateWorkitems`)
+UPDATABLE_FIELDS = {
+    "title": "dc:title",
+    "description": "dc:description",
+    "subject": "dc:subject",
+    "ownedBy": "rtc_cm:ownedBy",
+    "plannedFor": "rtc_cm:plannedFor",
+    "filedAgainst": "rtc_cm:filedAgainst",
+    "foundIn": "rtc_cm:foundIn",
+    "priority": "oslc_cm:priority",
+    "severity": "oslc_cm:severity",
+    "due": "rtc_cm:due",
+    "estimate": "rtc_cm:estimate",
+    "correctedEstimate": "rtc_cm:correctedEstimate",
+    "timeSpent": "rtc_cm:timeSpent",
+    "startDate": "rtc_cm:startDate",
+}
+PARENT_TAG = "rtc_cm:com.ibm.team.workitem.linktype.parentworkitem.parent"
+CHILDREN_TAG = ("rtc_cm:com.ibm.team.workitem.linktype.parentworkitem."
+                "children")
+SUBSCRIBERS_TAG = "rtc_cm:subscribers"
+STATE_TAG = "rtc_cm:state"
+ATTACHMENT_TAG = "rtc_cm:com.ibm.team.workitem.linktype.attachment.attachment"
+_ATTACHMENT_SERVICE = ("/service/com.ibm.team.workitem.service.internal.rest."
+                       "IAttachmentRestService/")
+# the properties whose values are links to other resources
+_LINK_PROPERTIES = frozenset([
+    "rtc_cm:ownedBy", "rtc_cm:plannedFor", "rtc_cm:filedAgainst",
+    "rtc_cm:foundIn", "oslc_cm:priority", "oslc_cm:severity"
+])
+
+
+@profile_calls
 class Workitem(FieldBase):
     """A wrapped class for managing all related resources of the workitem
 
@@ -21,6 +59,8 @@ class Workitem(FieldBase):
     :param workitem_id: (default is `None`) the id of the workitem, which
         will be retrieved if not specified
     :param raw_data: the raw data ( OrderedDict ) of the request response
+    :param etag: (optional) the ETag of the workitem, which is sent as the
+        `If-Match` header of :meth:`update`
     """
 
     log = logging.getLogger("workitem.Workitem")
@@ -33,8 +73,10 @@ class Workitem(FieldBase):
                  workitem_id=None,
                  raw_data=None,
                  skip_full_attributes=True,
+                 etag=None,
                  **kwargs):
         self.identifier = workitem_id
+        self.etag = etag
         FieldBase.__init__(self,
                            url,
                            rtc_obj,
@@ -47,6 +89,223 @@ class Workitem(FieldBase):
     def __str__(self):
         return str(self.identifier)
 
+    def update(self, fields=None, if_match=None, **kwargs):
+        """Update some fields of this workitem
+
+        Only the specified properties are sent in a PUT scoped with
+        `oslc_cm.properties`, and the `If-Match` header protects the other
+        changes made since the ETag was retrieved::
+
+            myworkitem.update(title="new title",
+                              ownedBy=member_url,
+                              fields={"rtc_cm:contextId": "_abc"})
+
+        The fields are the attribute names (e.g. "ownedBy") or the property
+        names (e.g. "rtc_cm:ownedBy", required for the custom attributes
+        which are not retrieved in this workitem). The links (e.g. "ownedBy"
+        and "plannedFor") accept the resource urls or the objects with an
+        `url` attribute (e.g. :class:`rtcclient.models.Member`), and are
+        kept as the urls in the attributes of this workitem afterwards.
+
+        :param fields: (optional) a :class:`dict` of the fields to the new
+            values
+        :param if_match: (optional) the ETag that the workitem must match.
+            The ETag retrieved with this workitem is used if not specified,
+            otherwise it is retrieved with a scoped GET
+        :param kwargs: the fields to the new values
+        :return: this workitem
+        :rtype: rtcclient.workitem.Workitem
+        """
+
+        fields = dict(fields or dict(), **kwargs)
+        if not fields:
+            raise exception.EmptyAttrib("No field is specified")
+
+        properties = OrderedDict()
+        attributes = dict()
+        for name, value in fields.items():
+            prop = self._get_field_property(name)
+            properties[prop] = self._to_json_value(prop, value)
+            attributes[prop] = name if ":" not in name else None
+
+        self._put_properties(properties, if_match or self.etag)
+        for prop, value in properties.items():
+            self._set_field(prop, attributes[prop], value)
+        self.log.info("Successfully update %s for <Workitem %s>",
+                      list(properties), self)
+        return self
+
+    def edit(self, if_match=None, strict=True):
+        """Start an edit session of this workitem, which collects the
+        changes of the fields, the links and the subscribers, and writes
+        them in a single PUT when committed
+
+        Refer to :class:`rtcclient.workitem.WorkitemEdit` for more details::
+
+            with myworkitem.edit() as tx:
+                tx.update(title="new title")
+                tx.addChildren([123, 124])
+                tx.addSubscriber("tester2@email.com")
+
+        :param if_match: (optional) the ETag that the workitem must match
+            when committed
+        :param strict: (default is `True`) whether the changes are rejected
+            if the workitem has been changed since it was retrieved
+        :return: the :class:`rtcclient.workitem.WorkitemEdit` object
+        :rtype: rtcclient.workitem.WorkitemEdit
+        """
+
+        return WorkitemEdit(self, if_match=if_match, strict=strict)
+
+    def _get_workitem_link(self, workitem_id):
+        if isinstance(workitem_id, bool):
+            raise exception.BadValue("Invalid workitem id: %s" % workitem_id)
+        try:
+            if isinstance(workitem_id, six.string_types):
+                workitem_id = int(workitem_id)
+        except ValueError:
+            raise exception.BadValue("Invalid workitem id: %s" % workitem_id)
+        if not isinstance(workitem_id, int):
+            raise exception.BadValue("Invalid workitem id: %s" % workitem_id)
+        return ("{0}/resource/itemName/com.ibm.team."
+                "workitem.WorkItem/{1}".format(self.rtc_obj.url, workitem_id))
+
+    def _get_links(self, prop, value):
+        """Get the links in the raw value of the property
+
+        :return: a :class:`list` of the (key, url) pairs, where the key is
+            the workitem id or the user id of the link
+        """
+
+        if isinstance(value, dict) and "@oslc_cm:collref" in value:
+            # not listed inline, e.g. in the full representation
+            if prop == ATTACHMENT_TAG:
+                urls = [
+                    attachment.url
+                    for attachment in self.getAttachments() or []
+                ]
+            elif prop == CHILDREN_TAG:
+                children = self.rtc_obj._get_paged_resources(
+                    "Children",
+                    workitem_id=self.identifier,
+                    customized_attr=CHILDREN_TAG,
+                    page_size="100",
+                    returned_properties="dc:identifier",
+                    compact=True)
+                urls = [
+                    self._get_workitem_link(child.identifier)
+                    for child in children or []
+                    if child is not None
+                ]
+            else:
+                raise exception.RTCException(
+                    "The links of %s are not returned inline" % prop)
+        else:
+            if value is None:
+                value = []
+            elif not isinstance(value, list):
+                value = [value]
+            urls = [
+                item.get("@rdf:resource")
+                for item in value
+                if isinstance(item, dict)
+            ]
+        return [(_get_link_key(url), url) for url in urls if url]
+
+    def _get_properties_url(self, properties, action=None):
+        req_url = "".join(
+            [self.url, "?oslc_cm.properties=",
+             urlquote(",".join(properties))])
+        if action is not None:
+            req_url = "".join([req_url, "&_action=", urlquote(action)])
+        return req_url
+
+    def _get_json_headers(self):
+        headers = copy.deepcopy(self.rtc_obj.headers)
+        headers["Content-Type"] = self.OSLC_CR_JSON
+        headers["Accept"] = self.OSLC_CR_JSON
+        return headers
+
+    def _get_properties(self, properties):
+        """Retrieve the properties with a scoped GET
+
+        :return: a :class:`tuple` contains the ETag and the raw data
+        """
+
+        req_url = self._get_properties_url(properties)
+        resp = self.get(req_url,
+                        verify=self.rtc_obj.verify,
+                        proxies=self.rtc_obj.proxies,
+                        headers=self._get_json_headers())
+        return get_etag(resp), self._parse_json(resp.content, req_url)
+
+    def _put_properties(self, properties, etag=None, action=None):
+        """Update the properties with a scoped PUT under the ETag, which is
+        retrieved first if not specified. The workflow action (its
+        identifier) is applied with the update if specified"""
+
+        if etag is None:
+            etag = self._get_properties(properties)[0]
+        req_url = self._get_properties_url(properties, action=action)
+        headers = self._get_json_headers()
+        if etag is not None:
+            headers["If-Match"] = etag
+
+        try:
+            resp = self.put(req_url,
+                            verify=self.rtc_obj.verify,
+                            proxies=self.rtc_obj.proxies,
+                            headers=headers,
+                            data=json.dumps(properties))
+        except HTTPError as excp:
+            if getattr(excp.response, "status_code", None) != 412:
+                raise
+            self.etag = None
+            self.log.error("<Workitem %s> has been changed since %s", self,
+                           etag)
+            raise exception.Conflict("<Workitem %s> has been changed since "
+                                     "%s" % (self, etag))
+        self.etag = get_etag(resp)
+
+    def _get_field_property(self, name):
+        if not isinstance(name, six.string_types) or not name:
+            raise exception.BadValue("Invalid field: %s" % name)
+        if ":" in name:
+            return name
+        prop = self.field_alias.get(name) or UPDATABLE_FIELDS.get(name)
+        if prop is None:
+            self.log.error("Unknown field %s of <Workitem %s>", name, self)
+            raise exception.BadValue("Unknown field %s, please specify the "
+                                     "property name instead" % name)
+        return prop
+
+    def _to_json_value(self, prop, value):
+        if isinstance(value, dict) or value is None:
+            return value
+        url = getattr(value, "url", None)
+        if url is not None:
+            return {"rdf:resource": url}
+        current = (self.raw_data or dict()).get(prop)
+        if prop in _LINK_PROPERTIES or (isinstance(current, dict) and
+                                        "@rdf:resource" in current):
+            return {"rdf:resource": value}
+        return value
+
+    def _set_field(self, prop, attr, value):
+        if isinstance(value, dict):
+            value = value.get("rdf:resource", value)
+            raw_value = {"@rdf:resource": value}
+        else:
+            raw_value = value
+        if isinstance(self.raw_data, dict):
+            self.raw_data[prop] = raw_value
+        if attr is None:
+            attr = prop.split(":")[-1].replace("-", "_")
+            if self.skip_full_attributes and "." in attr:
+                return
+        self.field_alias[attr] = prop
+        self.setattr(attr, value)
+
     def getComments(self):
         """Get all :class:`rtcclient.models.Comment` objects in this workitem
 
@@ -91,7 +350,8 @@ class Workitem(FieldBase):
         """Add a comment to this workitem
 
         :param msg: comment message
-        :return: the :class:`rtcclient.models.Comment` object
+        :return: the :class:`rtcclient.models.Comment` object, or `None` if
+            the RTC server does not return the url of the comment
         :rtype: rtcclient.models.Comment
         """
 
@@ -111,24 +371,15 @@ class Workitem(FieldBase):
 </rdf:RDF>
 '''
 
+        # the comment url is assigned by the server, so the comments
+        # collection is not retrieved beforehand
         comments_url = "/".join([self.url, "rtc_cm:comments"])
-        headers = copy.deepcopy(self.rtc_obj.headers)
-        resp = self.get(comments_url,
-                        verify=self.rtc_obj.verify,
-                        proxies=self.rtc_obj.proxies,
-                        headers=headers)
-
-        raw_data = xmltodict.parse(resp.content)
-
-        total_cnt = raw_data["oslc_cm:Collection"]["@oslc_cm:totalCount"]
-        comment_url = "/".join([comments_url, total_cnt])
-
-        comment_msg = origin_comment.format(comment_url, msg)
+        comment_msg = origin_comment.format("", msg)
 
+        headers = copy.deepcopy(self.rtc_obj.headers)
         headers["Content-Type"] = self.OSLC_CR_RDF
         headers["Accept"] = self.OSLC_CR_RDF
         headers["OSLC-Core-Version"] = "2.0"
-        headers["If-Match"] = resp.headers.get("etag")
         req_url = "/".join([comments_url, "oslc:comment"])
 
         resp = self.post(req_url,
@@ -139,10 +390,16 @@ class Workitem(FieldBase):
         self.log.info("Successfully add comment: [%s] for <Workitem %s>", msg,
                       self)
 
-        raw_data = xmltodict.parse(resp.content)
-        return Comment(comment_url,
-                       self.rtc_obj,
-                       raw_data=raw_data["rdf:RDF"]["rdf:Description"])
+        raw_data = self._parse_xml(resp.content, req_url)
+        description = raw_data["rdf:RDF"]["rdf:Description"]
+        comment_url = description.get("@rdf:about") or _get_location(resp)
+        if not comment_url:
+            # the comments posted meanwhile (e.g. by the other clients) make
+            # any guess of the url unreliable
+            self.log.warning("No url of the comment added to <Workitem %s>",
+                             self)
+            return None
+        return Comment(comment_url, self.rtc_obj, raw_data=description)
 
     def addSubscriber(self, email):
         """Add a subscriber to this workitem
@@ -261,7 +518,7 @@ class Workitem(FieldBase):
                         proxies=self.rtc_obj.proxies,
                         headers=headers)
         headers["If-Match"] = resp.headers.get("etag")
-        raw_data = xmltodict.parse(resp.content)
+        raw_data = self._parse_xml(resp.content, subscribers_url)
         return headers, raw_data
 
     def _check_email_field(self, email):
@@ -406,6 +663,79 @@ class Workitem(FieldBase):
         self.log.error("No Action named %s", action_name)
         raise exception.NotFound("No Action named %s" % action_name)
 
+    def applyAction(self, action_name, retries=2):
+        """Apply the workflow action to change the state of this workitem
+
+        The action is resolved by its name in the workflow of the current
+        state, and the actions of each workflow are only retrieved once by
+        the :class:`rtcclient.client.RTCClient` object. The state is
+        changed in a PUT protected with `If-Match`, which is retried with
+        the latest ETag and state on conflicts. Nothing is written if the
+        workitem is already in the resulting state of the action.
+
+        :param action_name: the name/title of the action (e.g. Resolve)
+        :param retries: (default is 2) the number of the retries on
+            conflicts
+        :return: this workitem
+        :rtype: rtcclient.workitem.Workitem
+        """
+
+        if not isinstance(action_name, six.string_types) or not action_name:
+            excp_msg = "Please specify a valid action name"
+            self.log.error(excp_msg)
+            raise exception.BadValue(excp_msg)
+        if isinstance(retries, bool) or not isinstance(retries, int) or \
+                retries < 0:
+            raise exception.BadValue("Invalid retries: %s" % retries)
+
+        etag = self.etag
+        state = (self.raw_data or dict()).get(STATE_TAG)
+        for attempt in range(retries + 1):
+            if etag is None or not isinstance(state, dict):
+                etag, raw_data = self._get_properties([STATE_TAG])
+                state = raw_data.get(STATE_TAG)
+            state_url = (state or dict()).get("@rdf:resource")
+            if not state_url:
+                raise exception.RTCException("Unable to get the state of "
+                                             "<Workitem %s>" % self)
+            action = self.rtc_obj._getWorkflowAction(state_url, action_name)
+            result_state = action.raw_data["rtc_cm:resultState"]
+            if result_state.get("@rdf:resource") == state_url:
+                self.log.info(
+                    "<Workitem %s> is already in the state of "
+                    "<Action %s>", self, action)
+                self._set_state(action)
+                return self
+
+            try:
+                self._put_properties(
+                    {
+                        STATE_TAG: {
+                            "rdf:resource": result_state["@rdf:resource"]
+                        }
+                    },
+                    etag,
+                    action=action.identifier)
+            except exception.Conflict:
+                if attempt == retries:
+                    raise
+                self.log.warning("Retry <Action %s> for <Workitem %s>", action,
+                                 self)
+                etag = state = None
+                continue
+
+            self._set_state(action)
+            self.log.info("Successfully apply <Action %s> to <Workitem %s>",
+                          action, self)
+            return self
+
+    def _set_state(self, action):
+        if isinstance(self.raw_data, dict):
+            self.raw_data[STATE_TAG] = dict(
+                action.raw_data["rtc_cm:resultState"])
+        self.field_alias["state"] = STATE_TAG
+        self.setattr("state", action.resultState)
+
     def _getActions(self, action_name=None):
         filter_rule = None
         if action_name is not None:
@@ -516,6 +846,72 @@ class Workitem(FieldBase):
                                                   customized_attr=changeset_tag,
                                                   page_size="10"))
 
+    def fetchChangeSetFiles(self, folder, state="after", concurrency=8):
+        """Fetch the files of all the changes in the changesets of this
+        workitem concurrently
+
+        The changes of the changesets are retrieved concurrently, and then
+        all the files are fetched with at most `concurrency` requests in
+        flight (refer to :meth:`rtcclient.models.ChangeSet.fetchAllFiles`).
+        The files of each changeset are stored in a sub-folder named after
+        the changeset id, since a file is usually changed in several
+        changesets::
+
+            results = myworkitem.fetchChangeSetFiles("/tmp/review")
+            failed = [result for result in results if not result.ok]
+
+        :param folder: the folder to store the files, which is created if it
+            does not exist
+        :param state: (default is "after") "before" to fetch the initial
+            files or "after" to fetch the final files
+        :param concurrency: (default is 8) the maximum number of the
+            requests in flight
+        :return: a :class:`list` of :class:`rtcclient.bulk.BulkResult`
+            objects, whose `item` is the :class:`rtcclient.models.Change`
+            object and `value` is the file path (`None` if the file is
+            added/deleted in the change, or a folder). The `item` is the
+            :class:`rtcclient.models.ChangeSet` object if its changes failed
+            to be retrieved
+        :rtype: list
+        """
+
+        fetch = _get_state_fetcher(state)
+        concurrency = validate_concurrency(concurrency)
+        changesets = self.getChangeSets() or list()
+        listed = run_bulk(lambda changeset: changeset.getChanges(),
+                          changesets,
+                          concurrency=concurrency)
+
+        failed = list()
+        tasks = list()
+        for result in listed:
+            if not result.ok:
+                failed.append(result)
+                continue
+            changeset_folder = os.path.join(folder,
+                                            result.item.url.split("/")[-1])
+            if not os.path.isdir(changeset_folder):
+                os.makedirs(changeset_folder)
+            tasks.extend((changeset_folder, change) for change in result.value)
+
+        fetched = run_bulk(lambda task: fetch(task[1], task[0]),
+                           tasks,
+                           concurrency=concurrency)
+        results = [
+            BulkResult(index, result.item, error=result.error)
+            for index, result in enumerate(failed)
+        ]
+        results.extend(
+            BulkResult(len(failed) + result.index,
+                       result.item[1],
+                       value=result.value,
+                       error=result.error) for result in fetched)
+        self.log.info(
+            "Successfully fetch %s/%s files of %s changesets of "
+            "<Workitem %s>", sum(result.ok for result in fetched), len(fetched),
+            len(changesets), self)
+        return results
+
     def addParent(self, parent_id):
         """Add a parent to current workitem
 
@@ -596,63 +992,9 @@ class Workitem(FieldBase):
             "<Workitem %s>", child_ids, self)
 
     def _addChildren(self, child_ids):
-        child_tag = ("rtc_cm:com.ibm.team.workitem.linktype."
-                     "parentworkitem.children")
-
-        children_original = dict()
-        children_original[child_tag] = list()
-
-        # retrieve current children
-        cur_children = self.getChildren(returned_properties="dc:identifier")
-        cur_child_ids = [
-            cur_child.identifier
-            for cur_child in (cur_children or [])
-            if cur_child is not None
-        ]
-
-        # add current children to list
-        for child_id in cur_child_ids:
-            self._addChild(child_id, children_original)
-
-        # add new children to list
-        for child_id in child_ids:
-            self._addChild(child_id, children_original)
-
-        # update children workitems
-        headers = copy.deepcopy(self.rtc_obj.headers)
-        headers["Content-Type"] = self.OSLC_CR_JSON
-        req_url = "".join([
-            self.url, "?oslc_cm.properties=com.ibm.team.workitem.",
-            "linktype.parentworkitem.children"
-        ])
-        self.put(req_url,
-                 verify=self.rtc_obj.verify,
-                 headers=headers,
-                 proxies=self.rtc_obj.proxies,
-                 data=json.dumps(children_original))
-
-    def _addChild(self, child_id, children_original):
-        child_tag = ("rtc_cm:com.ibm.team.workitem.linktype."
-                     "parentworkitem.children")
-
-        # check data type
-        if isinstance(child_id, bool):
-            raise exception.BadValue("Invalid workitem id: %s", child_id)
-        if isinstance(child_id, six.string_types):
-            child_id = int(child_id)
-        if not isinstance(child_id, int):
-            raise exception.BadValue("Invalid workitem id: %s", child_id)
-
-        # add child url
-        child_url = ("{0}/resource/itemName/com.ibm.team."
-                     "workitem.WorkItem/{1}".format(self.rtc_obj.url, child_id))
-        new_child = {"rdf:resource": child_url}
-        if new_child not in children_original[child_tag]:
-            children_original[child_tag].append(new_child)
-        else:
-            self.log.debug(
-                "Child <Workitem %s> has already been added to "
-                "current <Workitem %s>. Ignore it.", child_id, self)
+        # only the links of the children are retrieved and written
+        with self.edit(strict=False) as tx:
+            tx.addChildren(child_ids)
 
     def removeParent(self):
         """Remove the parent workitem from current workitem
@@ -722,73 +1064,208 @@ class Workitem(FieldBase):
             "current <Workitem %s>", child_ids, self)
 
     def _removeChildren(self, child_ids):
-        child_tag = ("rtc_cm:com.ibm.team.workitem.linktype."
-                     "parentworkitem.children")
-
-        children_original = dict()
-        children_original[child_tag] = list()
-
-        # retrieve current children
-        cur_children = self.getChildren(returned_properties="dc:identifier")
-        cur_child_ids = [cur_child.identifier for cur_child in cur_children]
-
-        # add current children to list
-        # remove to-be-deleted children
-        for child_id in cur_child_ids:
-            if (int(child_id) not in child_ids and
-                    str(child_id) not in child_ids):
-                self._addChild(child_id, children_original)
-
-        # update children workitems
-        headers = copy.deepcopy(self.rtc_obj.headers)
-        headers["Content-Type"] = self.OSLC_CR_JSON
-        req_url = "".join([
-            self.url, "?oslc_cm.properties=com.ibm.team.workitem.",
-            "linktype.parentworkitem.children"
-        ])
-        self.put(req_url,
-                 verify=self.rtc_obj.verify,
-                 headers=headers,
-                 proxies=self.rtc_obj.proxies,
-                 data=json.dumps(children_original))
+        with self.edit(strict=False) as tx:
+            tx.removeChildren(child_ids)
 
-    def addAttachment(self, filepath):
+    def addAttachment(self, filepath, progress=None):
         """Upload attachment to a workitem
 
+        The file is streamed from the disk. Refer to :meth:`addAttachments`
+
         :param filepath: the attachment file path
+        :param progress: (optional) the function called with the file path,
+            the bytes sent and the total bytes while the file is uploaded
         :return: the :class:`rtcclient.models.Attachment` object
         :rtype: rtcclient.models.Attachment
         """
 
-        proj_id = self.contextId
+        result = self.addAttachments([filepath], progress=progress)[0]
+        if not result.ok:
+            raise result.error
+        return result.value
+
+    def addAttachments(self, filepaths, concurrency=4, progress=None):
+        """Upload attachments to a workitem concurrently
+
+        Each file is streamed from the disk chunk by chunk, so that the
+        memory used does not depend on the file sizes. The category of the
+        workitem is resolved once, the files are uploaded with at most
+        `concurrency` requests in flight, and then the uploaded attachments
+        are linked to the workitem together in one scoped GET and PUT
+        (a single attachment is linked in one POST instead)::
+
+            def report(filepath, sent, total):
+                print("%s: %d/%d bytes" % (filepath, sent, total))
+
+            results = myworkitem.addAttachments(["build.log", "core.dump"],
+                                                progress=report)
+            failed = [result.item for result in results if not result.ok]
+
+        :param filepaths: a :class:`list` of the attachment file paths
+        :param concurrency: (default is 4) the maximum number of the
+            uploads in flight
+        :param progress: (optional) the function called with the file path,
+            the bytes sent and the total bytes while each file is uploaded.
+            It is called from the upload threads
+        :return: a :class:`list` of :class:`rtcclient.bulk.BulkResult`
+            objects in the order of `filepaths`, whose `value` is the
+            :class:`rtcclient.models.Attachment` object
+        :rtype: list
+        """
 
-        fa = self.rtc_obj.getFiledAgainst(self.filedAgainst,
-                                          projectarea_id=proj_id)
-        fa_id = fa.url.split("/")[-1]
+        concurrency = validate_concurrency(concurrency)
+        if isinstance(filepaths, six.string_types) or \
+                not hasattr(filepaths, "__iter__"):
+            raise exception.BadValue("Input parameter 'filepaths' is not "
+                                     "iterable")
+        filepaths = list(filepaths)
+        params = self._get_attachment_params()
 
-        headers = copy.deepcopy(self.rtc_obj.headers)
-        if headers.__contains__("Content-Type"):
-            headers.__delitem__("Content-Type")
+        def upload(filepath):
+            return self._upload_attachment(filepath, params, progress)
 
-        filename = os.path.basename(filepath)
-        fileh = open(filepath, "rb")
-        files = {"attach": (filename, fileh, "application/octet-stream")}
+        results = run_bulk(upload, filepaths, concurrency=concurrency)
+        uploaded = [result for result in results if result.ok]
+        if not uploaded:
+            return results
 
-        params = {"projectId": proj_id, "multiple": "true", "category": fa_id}
-        req_url = "".join([
-            self.rtc_obj.url, "/service/com.ibm.team.workitem.service.",
-            "internal.rest.IAttachmentRestService/"
-        ])
-        resp = self.post(req_url,
-                         verify=self.rtc_obj.verify,
-                         headers=headers,
-                         proxies=self.rtc_obj.proxies,
-                         params=params,
-                         files=files)
-        raw_data = xmltodict.parse(resp.content)
+        try:
+            if len(uploaded) == 1:
+                attachments = [self._add_attachment_link(uploaded[0].value)]
+            else:
+                attachments = self._add_attachment_links(
+                    [result.value for result in uploaded])
+        except Exception as excp:
+            self.log.error(
+                "Failed to link %s attachments to <Workitem %s>: "
+                "%s", len(uploaded), self, excp)
+            attachments = [None] * len(uploaded)
+        else:
+            excp = None
+            self.log.info("Successfully add %s attachments to <Workitem %s>",
+                          len(uploaded), self)
+        for result, attachment in zip(uploaded, attachments):
+            results[result.index] = BulkResult(result.index,
+                                               result.item,
+                                               value=attachment,
+                                               error=excp)
+        return results
+
+    def downloadAttachments(self, folder, concurrency=4, progress=None):
+        """Download all the attachments of the workitem to a folder
+        concurrently
+
+        The attachments are listed once, and then downloaded with at most
+        `concurrency` requests in flight. Each one is streamed to the disk,
+        resumed when interrupted and verified as
+        :meth:`rtcclient.models.Attachment.download`. The files are named
+        after the attachment titles, prefixed with the attachment ids if
+        several attachments have the same title::
+
+            results = myworkitem.downloadAttachments("/tmp/logs")
+            failed = [result.item for result in results if not result.ok]
+
+        :param folder: the folder to store the files, which is created if it
+            does not exist
+        :param concurrency: (default is 4) the maximum number of the
+            downloads in flight
+        :param progress: (optional) the function called with the
+            :class:`rtcclient.models.Attachment` object, the bytes received
+            and the total bytes while each attachment is downloaded. It is
+            called from the download threads
+        :return: a :class:`list` of :class:`rtcclient.bulk.BulkResult`
+            objects, whose `item` is the
+            :class:`rtcclient.models.Attachment` object and `value` is the
+            file path
+        :rtype: list
+        """
+
+        concurrency = validate_concurrency(concurrency)
+        attachments = self.getAttachments() or list()
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        titles = collections.Counter(
+            os.path.basename(attachment.title) for attachment in attachments)
+
+        def download(attachment):
+            file_name = os.path.basename(attachment.title)
+            if titles[file_name] > 1:
+                file_name = "%s_%s" % (attachment.identifier, file_name)
+
+            def report(received, total):
+                progress(attachment, received, total)
+
+            callback = report if progress is not None else None
+            return attachment.download(os.path.join(folder, file_name),
+                                       progress=callback)
+
+        results = run_bulk(download, attachments, concurrency=concurrency)
+        self.log.info(
+            "Successfully download %s/%s attachments of "
+            "<Workitem %s>", sum(result.ok for result in results), len(results),
+            self)
+        return results
+
+    def _get_attachment_params(self):
+        """Get the project area and the category of the attachments from
+        the raw data, or from a scoped GET if they are not retrieved"""
+
+        raw_data = self.raw_data or dict()
+        if "rtc_cm:filedAgainst" not in raw_data or \
+                "rtc_cm:contextId" not in raw_data:
+            raw_data = self._get_properties(
+                ["rtc_cm:filedAgainst", "rtc_cm:contextId"])[1]
+        filed_against = raw_data.get("rtc_cm:filedAgainst")
+        if isinstance(filed_against, dict):
+            filed_against = filed_against.get("@rdf:resource")
+        if not filed_against or not raw_data.get("rtc_cm:contextId"):
+            raise exception.EmptyAttrib("No filedAgainst of <Workitem %s>" %
+                                        self)
+        return {
+            "projectId": raw_data["rtc_cm:contextId"],
+            "multiple": "true",
+            "category": filed_against.rstrip("/").split("/")[-1]
+        }
+
+    def _upload_attachment(self, filepath, params, progress=None):
+        headers = copy.deepcopy(self.rtc_obj.headers)
+        req_url = "".join([self.rtc_obj.url, _ATTACHMENT_SERVICE])
+
+        def report(sent, total):
+            progress(filepath, sent, total)
+
+        callback = report if progress is not None else None
+        with MultipartFileStream("attach", filepath, progress=callback) as body:
+            headers["Content-Type"] = body.content_type
+            resp = self.post(req_url,
+                             data=body,
+                             verify=self.rtc_obj.verify,
+                             headers=headers,
+                             proxies=self.rtc_obj.proxies,
+                             params=params)
+        raw_data = self._parse_xml(resp.content, req_url)
         json_body = json.loads(raw_data["html"]["body"]["textarea"])
-        attachment_info = json_body["files"][0]
-        return self._add_attachment_link(attachment_info)
+        return json_body["files"][0]
+
+    def _add_attachment_links(self, attachments_info):
+        # the links are merged into the current ones in one PUT
+        edit = self.edit(strict=False)
+        for attachment_info in attachments_info:
+            edit._add_link(ATTACHMENT_TAG, attachment_info["url"])
+        edit.commit()
+        return [
+            self._get_added_attachment(attachment_info)
+            for attachment_info in attachments_info
+        ]
+
+    def _get_added_attachment(self, attachment_info):
+        raw_data = {
+            "dc:identifier": str(attachment_info["id"]),
+            "dc:title": attachment_info["name"]
+        }
+        return Attachment(attachment_info["url"],
+                          self.rtc_obj,
+                          raw_data=raw_data)
 
     def _add_attachment_link(self, attachment_info):
         payload = {
@@ -797,16 +1274,14 @@ class Workitem(FieldBase):
             "dcterms:title":
                 ": ".join([str(attachment_info["id"]), attachment_info["name"]])
         }
-        attachment_tag = ("/rtc_cm:com.ibm.team.workitem.linktype."
-                          "attachment.attachment")
-        attachment_collection_url = self.url + attachment_tag
+        attachment_collection_url = "/".join([self.url, ATTACHMENT_TAG])
 
         resp = self.post(attachment_collection_url,
                          payload,
                          verify=self.rtc_obj.verify,
                          headers=self.rtc_obj.headers,
                          proxies=self.rtc_obj.proxies)
-        raw_data = xmltodict.parse(resp.content)
+        raw_data = self._parse_xml(resp.content, attachment_collection_url)
 
         return Attachment(attachment_info["url"],
                           self.rtc_obj,
@@ -821,10 +1296,272 @@ class Workitem(FieldBase):
         :rtype: list
         """
 
-        attachment_tag = ("rtc_cm:com.ibm.team.workitem.linktype."
-                          "attachment.attachment")
         return (self.rtc_obj._get_paged_resources(
             "Attachment",
             workitem_id=self.identifier,
-            customized_attr=attachment_tag,
+            customized_attr=ATTACHMENT_TAG,
             page_size="10"))
+
+
+def _get_location(resp):
+    location = resp.headers.get("Location")
+    return location if isinstance(location, six.string_types) else None
+
+
+def _get_link_key(url):
+    # the workitem id or the user id, whichever url form is used
+    return urlunquote(url.rstrip("/").split("/")[-1])
+
+
+class WorkitemEdit(object):
+    """An edit session of a :class:`rtcclient.workitem.Workitem`
+
+    The changes of the fields, the parent, the children and the subscribers
+    are only recorded until the session is committed, when they are
+    written together in one PUT scoped to the changed properties and
+    protected with `If-Match`. The current children and subscribers are
+    retrieved in one scoped GET beforehand if any of them is changed. The
+    comments are separate resources, so they are posted after the PUT
+    succeeds.
+
+    The session is committed when the `with` block exits without an
+    exception, and discarded otherwise::
+
+        with myworkitem.edit() as tx:
+            tx.update(title="new title", ownedBy=member_url)
+            tx.addParent(122)
+            tx.addChildren([123, 124])
+            tx.removeSubscriber("tester2@email.com")
+            tx.addComment("triaged")
+
+    :param workitem: the :class:`rtcclient.workitem.Workitem` object
+    :param if_match: (optional) the ETag that the workitem must match. The
+        ETag retrieved with the workitem is used if not specified, or it is
+        retrieved with a scoped GET when the session starts if the workitem
+        has none (e.g. the workitems of the queries)
+    :param strict: (default is `True`) whether the changes are rejected if
+        the workitem has been changed since it was retrieved. Otherwise only
+        the changes between the scoped GET and the PUT are rejected, e.g.
+        when the links are merged into the latest ones
+    """
+
+    log = logging.getLogger("workitem.WorkitemEdit")
+
+    def __init__(self, workitem, if_match=None, strict=True):
+        self.workitem = workitem
+        self.if_match = if_match
+        self.strict = strict
+        if strict and if_match is None and workitem.etag is None:
+            # the changes since the session starts are rejected at least
+            self.if_match = workitem._get_properties(["dc:identifier"])[0]
+            if self.if_match is None:
+                raise exception.RTCException(
+                    "No ETag of <Workitem %s> to protect the changes, "
+                    "edit it with strict=False instead" % workitem)
+        self.committed = False
+        self._fields = OrderedDict()
+        self._attributes = dict()
+        # the property to the added links and the keys of the removed ones
+        self._links = OrderedDict()
+        self._comments = list()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.log.error("Discard the changes of <Workitem %s>: %s",
+                           self.workitem, exc_value)
+        return False
+
+    def __str__(self):
+        return str(self.workitem)
+
+    @property
+    def changed(self):
+        """Whether any change is recorded"""
+
+        return bool(self._fields or self._links or self._comments)
+
+    def update(self, fields=None, **kwargs):
+        """Set some fields of the workitem
+
+        :param fields: (optional) a :class:`dict` of the fields to the new
+            values. Refer to :meth:`rtcclient.workitem.Workitem.update`
+        :param kwargs: the fields to the new values
+        """
+
+        for name, value in dict(fields or dict(), **kwargs).items():
+            prop = self.workitem._get_field_property(name)
+            self._fields[prop] = self.workitem._to_json_value(prop, value)
+            self._attributes[prop] = name if ":" not in name else None
+
+    def addParent(self, parent_id):
+        """Set the parent of the workitem
+
+        :param parent_id: the parent workitem id/number
+            (integer or equivalent string)
+        """
+
+        parent_url = self.workitem._get_workitem_link(parent_id)
+        self._fields[PARENT_TAG] = [{"rdf:resource": parent_url}]
+
+    def removeParent(self):
+        """Remove the parent of the workitem"""
+
+        self._fields[PARENT_TAG] = []
+
+    def addChild(self, child_id):
+        """Add a child to the workitem
+
+        :param child_id: the child workitem id/number
+            (integer or equivalent string)
+        """
+
+        self.addChildren([child_id])
+
+    def addChildren(self, child_ids):
+        """Add children to the workitem
+
+        :param child_ids: a :class:`list` contains the children
+            workitem id/number (integer or equivalent string)
+        """
+
+        for child_id in self._check_iterable(child_ids, "child_ids"):
+            self._add_link(CHILDREN_TAG,
+                           self.workitem._get_workitem_link(child_id))
+
+    def removeChild(self, child_id):
+        """Remove a child from the workitem
+
+        :param child_id: the child workitem id/number
+            (integer or equivalent string)
+        """
+
+        self.removeChildren([child_id])
+
+    def removeChildren(self, child_ids):
+        """Remove children from the workitem
+
+        :param child_ids: a :class:`list` contains the children
+            workitem id/number (integer or equivalent string)
+        """
+
+        for child_id in self._check_iterable(child_ids, "child_ids"):
+            self._remove_link(CHILDREN_TAG,
+                              self.workitem._get_workitem_link(child_id))
+
+    def addSubscriber(self, email):
+        """Add a subscriber to the workitem
+
+        :param email: the subscriber's email
+        """
+
+        self.addSubscribers([email])
+
+    def addSubscribers(self, emails_list):
+        """Add subscribers to the workitem
+
+        :param emails_list: a :class:`list`/:class:`tuple`/:class:`set`
+            contains the the subscribers' emails
+        """
+
+        for email in self._check_iterable(emails_list, "emails_list"):
+            self.workitem._check_email_field(email)
+            self._add_link(SUBSCRIBERS_TAG,
+                           self.workitem.rtc_obj._get_member_url(email))
+
+    def removeSubscriber(self, email):
+        """Remove a subscriber from the workitem
+
+        :param email: the subscriber's email
+        """
+
+        self.removeSubscribers([email])
+
+    def removeSubscribers(self, emails_list):
+        """Remove subscribers from the workitem
+
+        :param emails_list: a :class:`list`/:class:`tuple`/:class:`set`
+            contains the the subscribers' emails
+        """
+
+        for email in self._check_iterable(emails_list, "emails_list"):
+            self.workitem._check_email_field(email)
+            self._remove_link(SUBSCRIBERS_TAG,
+                              self.workitem.rtc_obj._get_member_url(email))
+
+    def addComment(self, msg=None):
+        """Add a comment to the workitem, which is posted after the other
+        changes are written
+
+        :param msg: comment message
+        """
+
+        self._comments.append(msg)
+
+    def commit(self):
+        """Write the recorded changes
+
+        :return: the :class:`rtcclient.workitem.Workitem` object
+        :rtype: rtcclient.workitem.Workitem
+        """
+
+        if self.committed:
+            raise exception.RTCException("The changes of <Workitem %s> have "
+                                         "already been committed" % self)
+        workitem = self.workitem
+        etag = self.if_match or (workitem.etag if self.strict else None)
+        properties = OrderedDict(self._fields)
+
+        if self._links:
+            current_etag, raw_data = workitem._get_properties(list(self._links))
+            if etag is not None and current_etag != etag:
+                workitem.etag = None
+                raise exception.Conflict("<Workitem %s> has been changed "
+                                         "since %s" % (self, etag))
+            etag = current_etag
+            for prop, (added, removed) in self._links.items():
+                current = workitem._get_links(prop, raw_data.get(prop))
+                links = OrderedDict(
+                    (key, url) for key, url in current if key not in removed)
+                for key, url in added.items():
+                    links.setdefault(key, url)
+                if list(links) != [key for key, _ in current]:
+                    properties[prop] = [{
+                        "rdf:resource": url
+                    } for url in links.values()]
+
+        if properties:
+            workitem._put_properties(properties, etag)
+            for prop, attr in self._attributes.items():
+                workitem._set_field(prop, attr, properties[prop])
+        for msg in self._comments:
+            workitem.addComment(msg)
+        self.committed = True
+        self.log.info(
+            "Successfully commit %s and %s comments for "
+            "<Workitem %s>", list(properties), len(self._comments), self)
+        return workitem
+
+    def _check_iterable(self, values, name):
+        if isinstance(values, six.string_types) or \
+                not hasattr(values, "__iter__"):
+            error_msg = "Input parameter '%s' is not iterable" % name
+            self.log.error(error_msg)
+            raise exception.BadValue(error_msg)
+        return values
+
+    def _add_link(self, prop, url):
+        added, removed = self._links.setdefault(prop, (OrderedDict(), set()))
+        key = _get_link_key(url)
+        removed.discard(key)
+        added[key] = url
+
+    def _remove_link(self, prop, url):
+        added, removed = self._links.setdefault(prop, (OrderedDict(), set()))
+        key = _get_link_key(url)
+        added.pop(key, None)
+        removed.add(key)
@@ -0,0 +1,392 @@
+import collections
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from rtcclient import exception
+from rtcclient.bulk import validate_concurrency
+from rtcclient.workitem import WorkitemEdit
+
+
+class WriteQueue(object):
+    """A bounded write-behind queue of the changes of the workitems, e.g.
+    for the automation bots which keep adding comments, subscribers and
+    links
+
+    The changes are recorded without any request, and written by the
+    background workers. The pending changes of the same workitem are
+    coalesced into one :class:`rtcclient.workitem.WorkitemEdit` session,
+    e.g. three added subscribers are written in one PUT. A workitem is only
+    written by one worker at a time, and the changes queued in the meantime
+    are written in its next session::
+
+        with myclient.createWriteQueue(on_error=report) as writes:
+            writes.addSubscriber(123, "tester1@email.com")
+            writes.addChild(123, 124)
+            done = writes.addComment(123, "triaged by the bot")
+        print(done.result())
+
+    Each method returns a :class:`concurrent.futures.Future` object, whose
+    result is the written :class:`rtcclient.workitem.Workitem` object. The
+    invalid changes (e.g. a bad email) are rejected immediately, and the
+    failed writes are reported to the futures and `on_error`.
+
+    :param rtc_obj: a reference to the
+        :class:`rtcclient.client.RTCClient` object
+    :param maxsize: (default is 1000) the maximum number of the pending
+        changes. Queueing a change blocks while the queue is full
+    :param concurrency: (default is 4) the number of the workers
+    :param linger: (default is 0.05) the seconds to wait for more changes
+        of a workitem before writing them
+    :param retries: (default is 2) the number of the retries of a workitem
+        when it is changed by others in the middle of the session (refer to
+        :class:`rtcclient.exception.Conflict`)
+    :param on_error: (optional) the function called with the workitem id
+        and the exception when the changes of a workitem fail
+    """
+
+    log = logging.getLogger("writequeue.WriteQueue")
+
+    def __init__(self,
+                 rtc_obj,
+                 maxsize=1000,
+                 concurrency=4,
+                 linger=0.05,
+                 retries=2,
+                 on_error=None):
+        if isinstance(maxsize, bool) or not isinstance(maxsize, int) or \
+                maxsize < 1:
+            raise exception.BadValue("Invalid maxsize: %s" % maxsize)
+        if not isinstance(linger, (int, float)) or linger < 0:
+            raise exception.BadValue("Invalid linger: %s" % linger)
+        self.rtc_obj = rtc_obj
+        self.maxsize = maxsize
+        self.concurrency = validate_concurrency(concurrency)
+        self.linger = linger
+        self.retries = retries
+        self.on_error = on_error
+        # the workitem id to the edit session, the futures and the time of
+        # the first change
+        self._pending = collections.OrderedDict()
+        self._active = set()
+        self._size = 0
+        self._closed = False
+        self._workers = list()
+        self._cond = threading.Condition()
+
+    def __repr__(self):
+        return "<WriteQueue %s pending changes>" % len(self)
+
+    def __len__(self):
+        with self._cond:
+            return self._size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excinfo):
+        self.close()
+        return False
+
+    def update(self,
+               workitem_id,
+               fields=None,
+               block=True,
+               timeout=None,
+               **kwargs):
+        """Set some fields of the workitem
+
+        :param workitem_id: the workitem id/number
+            (integer or equivalent string)
+        :param fields: (optional) a :class:`dict` of the fields to the new
+            values. Refer to :meth:`rtcclient.workitem.Workitem.update`
+        :param block: (default is `True`) refer to :meth:`submit`
+        :param timeout: (optional) refer to :meth:`submit`
+        :param kwargs: the fields to the new values
+        :return: the :class:`concurrent.futures.Future` object
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(workitem_id,
+                           "update",
+                           fields,
+                           block=block,
+                           timeout=timeout,
+                           **kwargs)
+
+    def addComment(self, workitem_id, msg, block=True, timeout=None):
+        """Add a comment to the workitem
+
+        :param workitem_id: the workitem id/number
+            (integer or equivalent string)
+        :param msg: comment message
+        :param block: (default is `True`) refer to :meth:`submit`
+        :param timeout: (optional) refer to :meth:`submit`
+        :return: the :class:`concurrent.futures.Future` object
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(workitem_id,
+                           "addComment",
+                           msg,
+                           block=block,
+                           timeout=timeout)
+
+    def addSubscriber(self, workitem_id, email, block=True, timeout=None):
+        """Add a subscriber to the workitem
+
+        :param workitem_id: the workitem id/number
+            (integer or equivalent string)
+        :param email: the subscriber's email
+        :param block: (default is `True`) refer to :meth:`submit`
+        :param timeout: (optional) refer to :meth:`submit`
+        :return: the :class:`concurrent.futures.Future` object
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(workitem_id,
+                           "addSubscriber",
+                           email,
+                           block=block,
+                           timeout=timeout)
+
+    def removeSubscriber(self, workitem_id, email, block=True, timeout=None):
+        """Remove a subscriber from the workitem
+
+        :param workitem_id: the workitem id/number
+            (integer or equivalent string)
+        :param email: the subscriber's email
+        :param block: (default is `True`) refer to :meth:`submit`
+        :param timeout: (optional) refer to :meth:`submit`
+        :return: the :class:`concurrent.futures.Future` object
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(workitem_id,
+                           "removeSubscriber",
+                           email,
+                           block=block,
+                           timeout=timeout)
+
+    def addChild(self, workitem_id, child_id, block=True, timeout=None):
+        """Add a child to the workitem
+
+        :param workitem_id: the workitem id/number
+            (integer or equivalent string)
+        :param child_id: the child workitem id/number
+            (integer or equivalent string)
+        :param block: (default is `True`) refer to :meth:`submit`
+        :param timeout: (optional) refer to :meth:`submit`
+        :return: the :class:`concurrent.futures.Future` object
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(workitem_id,
+                           "addChild",
+                           child_id,
+                           block=block,
+                           timeout=timeout)
+
+    def removeChild(self, workitem_id, child_id, block=True, timeout=None):
+        """Remove a child from the workitem
+
+        :param workitem_id: the workitem id/number
+            (integer or equivalent string)
+        :param child_id: the child workitem id/number
+            (integer or equivalent string)
+        :param block: (default is `True`) refer to :meth:`submit`
+        :param timeout: (optional) refer to :meth:`submit`
+        :return: the :class:`concurrent.futures.Future` object
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(workitem_id,
+                           "removeChild",
+                           child_id,
+                           block=block,
+                           timeout=timeout)
+
+    def addParent(self, workitem_id, parent_id, block=True, timeout=None):
+        """Set the parent of the workitem
+
+        :param workitem_id: the workitem id/number
+            (integer or equivalent string)
+        :param parent_id: the parent workitem id/number
+            (integer or equivalent string)
+        :param block: (default is `True`) refer to :meth:`submit`
+        :param timeout: (optional) refer to :meth:`submit`
+        :return: the :class:`concurrent.futures.Future` object
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(workitem_id,
+                           "addParent",
+                           parent_id,
+                           block=block,
+                           timeout=timeout)
+
+    def removeParent(self, workitem_id, block=True, timeout=None):
+        """Remove the parent of the workitem
+
+        :param workitem_id: the workitem id/number
+            (integer or equivalent string)
+        :param block: (default is `True`) refer to :meth:`submit`
+        :param timeout: (optional) refer to :meth:`submit`
+        :return: the :class:`concurrent.futures.Future` object
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(workitem_id,
+                           "removeParent",
+                           block=block,
+                           timeout=timeout)
+
+    def submit(self, workitem_id, method, *args, **kwargs):
+        """Queue a change of the workitem
+
+        :param workitem_id: the workitem id/number
+            (integer or equivalent string)
+        :param method: the name of the method of
+            :class:`rtcclient.workitem.WorkitemEdit` (e.g. "addSubscriber")
+        :param args: the arguments of the method
+        :param block: (default is `True`) whether to wait while the queue
+            is full, otherwise :class:`queue.Full` is raised
+        :param timeout: (optional) the maximum seconds to wait, after which
+            :class:`queue.Full` is raised
+        :param kwargs: the keyword arguments of the method
+        :return: the :class:`concurrent.futures.Future` object
+        :rtype: concurrent.futures.Future
+        """
+
+        block = kwargs.pop("block", True)
+        timeout = kwargs.pop("timeout", None)
+        if method.startswith("_") or method == "commit" or \
+                not callable(getattr(WorkitemEdit, method, None)):
+            raise exception.BadValue("Unsupported change: %s" % method)
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise exception.RTCException("The write queue is closed")
+            if not self._cond.wait_for(lambda: self._size < self.maxsize,
+                                       timeout=timeout if block else 0):
+                raise queue.Full("%s changes are pending" % self._size)
+            key = str(workitem_id)
+            entry = self._pending.get(key)
+            if entry is None:
+                workitem = self.rtc_obj._getWorkitemStub(workitem_id)
+                entry = [workitem.edit(strict=False), list(), time.monotonic()]
+            # record the change right away, so that the invalid ones are
+            # raised to the caller
+            getattr(entry[0], method)(*args, **kwargs)
+            entry[1].append(future)
+            self._pending[key] = entry
+            self._size += 1
+            self._start_workers()
+            self._cond.notify_all()
+        return future
+
+    def flush(self, timeout=None):
+        """Wait until all the queued changes are written
+
+        :param timeout: (optional) the maximum seconds to wait
+        :return: whether all the changes are written
+        :rtype: bool
+        """
+
+        with self._cond:
+            # no need to linger any more
+            for entry in self._pending.values():
+                entry[2] = float("-inf")
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._size == 0, timeout=timeout)
+
+    def close(self, timeout=None):
+        """Write all the queued changes and stop the workers
+
+        :param timeout: (optional) the maximum seconds to wait for the
+            changes
+        :return: whether all the changes are written
+        :rtype: bool
+        """
+
+        flushed = self.flush(timeout=timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if flushed:
+            for worker in self._workers:
+                worker.join()
+        return flushed
+
+    def _start_workers(self):
+        if len(self._workers) >= self.concurrency:
+            return
+        worker = threading.Thread(target=self._work,
+                                  name="rtcclient-write-%s" %
+                                  len(self._workers),
+                                  daemon=True)
+        self._workers.append(worker)
+        worker.start()
+
+    def _next(self):
+        """Take the next workitem whose changes are due, or `None` if the
+        queue is closed"""
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = None
+                for key, entry in self._pending.items():
+                    if key in self._active:
+                        continue
+                    due = entry[2] + self.linger - now
+                    if due <= 0:
+                        self._active.add(key)
+                        del self._pending[key]
+                        return key, entry
+                    wait = due if wait is None else min(wait, due)
+                if self._closed and not self._pending:
+                    return None
+                self._cond.wait(timeout=wait)
+
+    def _work(self):
+        while True:
+            taken = self._next()
+            if taken is None:
+                return
+            key, (edit, futures, _) = taken
+            try:
+                workitem = self._commit(edit)
+            except Exception as excp:
+                self.log.error(
+                    "Failed to write %s changes of <Workitem %s>: "
+                    "%s", len(futures), key, excp)
+                for future in futures:
+                    future.set_exception(excp)
+                if self.on_error is not None:
+                    try:
+                        self.on_error(key, excp)
+                    except Exception:
+                        self.log.exception("The error callback failed")
+            else:
+                for future in futures:
+                    future.set_result(workitem)
+            finally:
+                with self._cond:
+                    self._active.discard(key)
+                    self._size -= len(futures)
+                    self._cond.notify_all()
+
+    def _commit(self, edit):
+        attempt = 0
+        while True:
+            try:
+                return edit.commit()
+            except exception.Conflict as excp:
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                self.log.warning("Retry <Workitem %s> %s/%s: %s", edit, attempt,
+                                 self.retries, excp)
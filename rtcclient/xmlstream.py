@@ -0,0 +1,208 @@
+import io
+
+from lxml import etree
+
+from rtcclient import exception
+
+
+class CollectionParser(object):
+    """Parse an OSLC collection incrementally with :func:`lxml.etree.iterparse`
+
+    The entries (the children of the root element) are emitted one by one
+    and their elements are cleared once converted, so the whole document is
+    never materialized. Each entry is converted into the same structure as
+    `xmltodict.parse` returns:
+
+        * the attributes are prefixed with "@" (including the namespace
+          declarations, e.g. "@xmlns:rdf")
+        * the text of an element with attributes or children is kept in
+          "#text", and the text is stripped
+        * an element without any attribute, child or text is `None`
+        * the repeated children are grouped into a list
+
+    The name and the attributes of the root element are available from
+    `tag` and `attributes` once the iteration starts::
+
+        parser = CollectionParser(resp.content, "oslc_cm:ChangeRequest")
+        for entry in parser:
+            print(entry["dc:identifier"])
+        print(parser.attributes.get("@oslc_cm:totalCount"))
+
+    :param source: the response body (bytes or string) or a file-like object
+    :param entry_tag: (optional) only emit the entries with this qualified
+        name (e.g. "oslc_cm:ChangeRequest"). All the entries are emitted if
+        `None`
+    """
+
+    def __init__(self, source, entry_tag=None):
+        encoding = None
+        if isinstance(source, str):
+            # the same as xmltodict, which ignores the declared encoding
+            source = source.encode("UTF-8")
+            encoding = "UTF-8"
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        self.source = source
+        self.encoding = encoding
+        self.entry_tag = entry_tag
+        self.tag = None
+        self.attributes = None
+
+    def __iter__(self):
+        # recover from the undefined namespace prefixes, which xmltodict
+        # accepts as well. The malformed documents are still rejected below
+        context = etree.iterparse(self.source,
+                                  events=("start-ns", "end"),
+                                  encoding=self.encoding,
+                                  resolve_entities=False,
+                                  remove_comments=True,
+                                  remove_pis=True,
+                                  recover=True)
+        names = _QualifiedNames()
+        declared = 0
+        root = None
+        try:
+            for event, item in context:
+                if event == "start-ns":
+                    names.declare(*item)
+                    declared += 1
+                    continue
+                if root is None:
+                    root = item
+                    while root.getparent() is not None:
+                        root = root.getparent()
+                    self.tag = names.qualify(root)
+                    self.attributes = _convert_attributes(
+                        root, root.nsmap.items(), names)
+                    # the rest are declared by the entries
+                    declared -= len(root.nsmap)
+                if item.getparent() is not root:
+                    continue
+
+                if self.entry_tag is None or \
+                        names.qualify(item) == self.entry_tag:
+                    # only compare the namespace maps when the entry
+                    # declares its own namespaces, which is rare
+                    yield _convert(item, names, nested=declared > 0)
+                declared = 0
+                # release the converted elements
+                item.clear(keep_tail=True)
+                while item.getprevious() is not None:
+                    del root[0]
+        except etree.XMLSyntaxError as excp:
+            raise exception.RTCException("Unable to parse the collection: "
+                                         "%s" % excp)
+
+        fatal_errors = context.error_log.filter_from_fatals()
+        if fatal_errors or self.tag is None:
+            raise exception.RTCException(
+                "Unable to parse the collection: %s" %
+                (fatal_errors[0] if fatal_errors else "no root element"))
+
+
+class _QualifiedNames(object):
+    """Map the Clark notation of the tags and the attributes back to the
+    prefixed names, which are cached since the entries repeat them"""
+
+    XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+
+    def __init__(self):
+        self.prefixes = {self.XML_NAMESPACE: "xml"}
+        # the namespaces declared with several prefixes
+        self.ambiguous = set()
+        self.tags = dict()
+        self.attributes = dict()
+
+    def declare(self, prefix, uri):
+        if self.prefixes.get(uri, prefix) != prefix:
+            self.ambiguous.add(uri)
+            self.tags.clear()
+        self.prefixes.setdefault(uri, prefix)
+
+    def qualify(self, element):
+        tag = element.tag
+        name = self.tags.get(tag)
+        if name is None:
+            name = _qualify(tag, element.prefix)
+            if tag[0] != "{" or tag[1:].partition("}")[0] not in \
+                    self.ambiguous:
+                self.tags[tag] = name
+        return name
+
+    def qualify_attribute(self, name):
+        qualified = self.attributes.get(name)
+        if qualified is None:
+            qualified = _qualify_attribute(name, self.prefixes)
+            self.attributes[name] = qualified
+        return qualified
+
+
+def _qualify(tag, prefix):
+    local_name = tag.rpartition("}")[2]
+    if prefix:
+        return ":".join([prefix, local_name])
+    return local_name
+
+
+def _qualify_attribute(name, prefixes):
+    if name[0] != "{":
+        return name
+    uri, _, local_name = name[1:].partition("}")
+    prefix = prefixes.get(uri)
+    if uri == "http://www.w3.org/XML/1998/namespace":
+        prefix = "xml"
+    if prefix:
+        return ":".join([prefix, local_name])
+    return local_name
+
+
+def _convert_attributes(element, declarations, names):
+    attributes = dict()
+    for prefix, uri in declarations or ():
+        attributes["@xmlns:%s" % prefix if prefix else "@xmlns"] = uri
+    for name, value in element.items():
+        attributes["@" + names.qualify_attribute(name)] = value
+    return attributes
+
+
+def _get_declarations(element):
+    nsmap = element.nsmap
+    parent = element.getparent()
+    inherited = parent.nsmap if parent is not None else dict()
+    return [(prefix, uri)
+            for prefix, uri in nsmap.items()
+            if inherited.get(prefix) != uri]
+
+
+def _convert(element, names, nested=False):
+    if nested:
+        item = _convert_attributes(element, _get_declarations(element), names)
+    elif element.attrib:
+        item = _convert_attributes(element, None, names)
+    else:
+        item = dict()
+
+    texts = [element.text] if element.text else []
+    for child in element:
+        if child.tail:
+            texts.append(child.tail)
+        if not isinstance(child.tag, str):
+            # unresolved entities
+            continue
+        key = names.qualify(child)
+        value = _convert(child, names, nested=nested)
+        if key in item:
+            existing = item[key]
+            if isinstance(existing, list):
+                existing.append(value)
+            else:
+                item[key] = [existing, value]
+        else:
+            item[key] = value
+
+    text = "".join(texts).strip() or None
+    if not item:
+        return text
+    if text is not None:
+        item["#text"] = text
+    return item
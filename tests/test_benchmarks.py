@@ -0,0 +1,70 @@
+import json
+
+from benchmarks import compare, run
+
+BASELINE = {"seconds": 1.0, "throughput": 100.0, "peak_memory": 1000}
+
+
+def as_results(metrics):
+    return dict(benchmarks=dict(bench=metrics))
+
+
+def get_regressions(baseline, results, tolerance=0.1):
+    rows = compare.compare(as_results(baseline),
+                           as_results(results),
+                           tolerance=tolerance)
+    return dict((row[1], row[-1]) for row in rows)
+
+
+def test_compare_tolerance():
+    within = {"seconds": 1.05, "throughput": 95.0, "peak_memory": 1090}
+    beyond = {"seconds": 1.2, "throughput": 80.0, "peak_memory": 1200}
+    improved = {"seconds": 0.5, "throughput": 200.0, "peak_memory": 10}
+
+    assert not any(get_regressions(BASELINE, within).values())
+    assert all(get_regressions(BASELINE, beyond).values())
+    assert not any(get_regressions(BASELINE, improved).values())
+    assert not any(get_regressions(BASELINE, beyond, tolerance=0.5).values())
+
+
+def test_compare_exact_metrics():
+    baseline = {"requests": 100}
+    # any increase of the request counts is a regression
+    regressions = get_regressions(baseline, {"requests": 101}, tolerance=0.5)
+    assert regressions == {"requests": True}
+    regressions = get_regressions(baseline, {"requests": 100})
+    assert regressions == {"requests": False}
+    regressions = get_regressions(baseline, {"requests": 50})
+    assert regressions == {"requests": False}
+
+
+def test_compare_zero_baseline():
+    baseline = {"requests": 0, "peak_memory": 0}
+    rows = compare.compare(as_results(baseline),
+                           as_results(dict(requests=3, peak_memory=10)))
+    changes = [(row[1], row[4], row[-1]) for row in rows]
+    assert changes == [("peak_memory", float("inf"), True),
+                       ("requests", float("inf"), True)]
+    regressions = get_regressions(baseline, baseline)
+    assert regressions == {"requests": False, "peak_memory": False}
+
+
+def test_run_and_compare(tmp_path):
+    baseline_path = str(tmp_path / "baseline.json")
+    assert run.main([
+        "--scale", "5", "--repeat", "1", "--no-memory", "--only",
+        "getWorkitems", "--output", baseline_path
+    ]) == 0
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    result = baseline["benchmarks"]["getWorkitems"]
+    assert result["items"] > 0
+    assert result["requests"] > 0
+    assert compare.main([baseline_path, baseline_path]) == 0
+
+    # one more request is a regression
+    result["requests"] += 1
+    results_path = str(tmp_path / "results.json")
+    with open(results_path, "w") as fh:
+        json.dump(baseline, fh)
+    assert compare.main([baseline_path, results_path]) == 1
@@ -0,0 +1,404 @@
+import json
+import threading
+import time
+
+import pytest
+from requests.exceptions import HTTPError
+from benchmarks.data import FIXTURES_PATH, PROJECTAREA_ID
+from benchmarks.fake_server import FakeRTCServer
+from rtcclient.bulk import run_bulk
+from rtcclient.client import RTCClient
+from rtcclient.exception import BadValue, Conflict, EmptyAttrib, NotFound
+from rtcclient.journal import CreateJournal
+from rtcclient.workitem import PARENT_TAG, Workitem
+
+# the path of the POST requests to create the workitems
+POST_PATH = "^oslc/contexts/[^/]+/workitems/"
+CREATE_KWARGS = {
+    "severity": "Normal",
+    "priority": "High",
+    "filedAgainst": "Category 1",
+    "plannedFor": "Sprint 1 (1.0)",
+    "teamArea": "Team1",
+    "ownedBy": "tester1@email.com",
+}
+
+
+def test_run_bulk():
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def func(item):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        if item == 3:
+            raise ValueError("bad item")
+        return item * 2
+
+    results = run_bulk(func, range(10), concurrency=4)
+    assert [result.index for result in results] == list(range(10))
+    values = [result.value for result in results if result.ok]
+    assert values == [0, 2, 4, 8, 10, 12, 14, 16, 18]
+    assert isinstance(results[3].error, ValueError)
+    assert in_flight[1] <= 4
+    with pytest.raises(BadValue):
+        run_bulk(func, range(3), concurrency=0)
+
+
+def test_create_workitems():
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url,
+                             "tester1@email.com",
+                             "password",
+                             searchpath=FIXTURES_PATH)
+        specs = [
+            dict(title="defect %s" % idx, **CREATE_KWARGS) for idx in range(6)
+        ]
+        specs.insert(2, {"description": "no title"})
+        specs.insert(4, {"title": "no fields"})
+        server.reset()
+        results = myclient.createWorkitems(specs,
+                                           template="issue_example.template",
+                                           item_type="Defect",
+                                           projectarea_id=PROJECTAREA_ID,
+                                           concurrency=4)
+        requests = dict(server.requests)
+
+    assert [result.item for result in results] == specs
+    succeeded = [result.ok for result in results]
+    assert succeeded == [True, True, False, True, False, True, True, True]
+    assert isinstance(results[2].error, EmptyAttrib)
+    assert isinstance(results[4].error, EmptyAttrib)
+    identifiers = [result.value.identifier for result in results if result.ok]
+    assert len(set(identifiers)) == 6
+    posted = sum(count for endpoint, count in requests.items()
+                 if endpoint.startswith("POST oslc/contexts/"))
+    assert posted == 6
+    # the types and the field values are only retrieved once
+    assert requests["GET oslc/types/{pa}"] == 1
+    assert requests["GET oslc/enumerations/{pa}/severity"] == 1
+    assert requests["GET oslc/categories"] == 1
+
+
+def test_create_workitems_unresolved_value():
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url,
+                             "tester1@email.com",
+                             "password",
+                             searchpath=FIXTURES_PATH)
+        specs = [
+            dict(CREATE_KWARGS, title="defect %s" % idx) for idx in range(4)
+        ]
+        specs[1]["severity"] = specs[3]["severity"] = "Unknown"
+        server.reset()
+        results = myclient.createWorkitems(specs,
+                                           template="issue_example.template",
+                                           item_type="Defect",
+                                           projectarea_id=PROJECTAREA_ID,
+                                           concurrency=4)
+        requests = dict(server.requests)
+
+    # the workitems with the unknown severity are not created
+    assert [result.ok for result in results] == [True, False, True, False]
+    assert isinstance(results[1].error, NotFound)
+    assert results[3].error is results[1].error
+    assert requests["POST oslc/contexts/{pa}/workitems/defect"] == 2
+
+
+def test_create_workitem_idempotent(tmp_path):
+    journal_path = str(tmp_path / "create.journal")
+    create_kwargs = dict(CREATE_KWARGS,
+                         projectarea_id=PROJECTAREA_ID,
+                         template="issue_example.template")
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url,
+                             "tester1@email.com",
+                             "password",
+                             searchpath=FIXTURES_PATH,
+                             journal=CreateJournal(journal_path))
+        # the workitem is created but the response is lost
+        server.reset()
+        server.inject_error(path=POST_PATH, after=True)
+        workitem = myclient.createWorkitem("Defect",
+                                           "defect",
+                                           idempotency_key="import-1",
+                                           retries=2,
+                                           **create_kwargs)
+        posted = server.requests["POST oslc/contexts/{pa}/workitems/defect"]
+        assert posted == 1
+        assert server.requests["GET oslc/contexts/{pa}/workitems"] == 1
+        assert myclient.journal.get("import-1") == ("created",
+                                                    workitem.identifier)
+
+        # the journaled key is not created again
+        server.reset()
+        again = myclient.createWorkitem("Defect",
+                                        "defect",
+                                        idempotency_key="import-1",
+                                        **create_kwargs)
+        assert again.identifier == workitem.identifier
+        assert not server.requests["POST oslc/contexts/{pa}/workitems/defect"]
+
+        # the outcome of the key is unknown without retries
+        server.inject_error(path=POST_PATH, after=True)
+        with pytest.raises(HTTPError):
+            myclient.createWorkitem("Defect",
+                                    "defect",
+                                    idempotency_key="import-2",
+                                    **create_kwargs)
+        assert myclient.journal.pending() == ["import-2"]
+
+        # which is looked up after a restart
+        myclient = RTCClient(server.url,
+                             "tester1@email.com",
+                             "password",
+                             searchpath=FIXTURES_PATH,
+                             journal=CreateJournal(journal_path))
+        server.reset()
+        created = myclient.createWorkitem("Defect",
+                                          "defect",
+                                          idempotency_key="import-2",
+                                          **create_kwargs)
+        assert not server.requests["POST oslc/contexts/{pa}/workitems/defect"]
+        assert created.identifier != workitem.identifier
+        assert not myclient.journal.pending()
+        found = myclient.getWorkitemByKey("import-2",
+                                          projectarea_id=PROJECTAREA_ID,
+                                          returned_properties="dc:title")
+        assert found.identifier == created.identifier
+        assert myclient.getWorkitemByKey("import-3",
+                                         projectarea_id=PROJECTAREA_ID) is None
+        with pytest.raises(BadValue):
+            myclient.getWorkitemByKey("bad key", projectarea_id=PROJECTAREA_ID)
+
+
+def test_create_workitems_idempotent():
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url,
+                             "tester1@email.com",
+                             "password",
+                             searchpath=FIXTURES_PATH)
+        specs = [
+            dict(title="defect %s" % idx,
+                 idempotency_key="key-%s" % idx,
+                 **CREATE_KWARGS) for idx in range(4)
+        ]
+        specs.append(dict(specs[0]))
+        server.inject_error(path=POST_PATH, count=2, after=True)
+        kwargs = dict(template="issue_example.template",
+                      item_type="Defect",
+                      projectarea_id=PROJECTAREA_ID,
+                      concurrency=4)
+        results = myclient.createWorkitems(specs, retries=1, **kwargs)
+        assert [result.ok for result in results] == [True] * 4 + [False]
+        assert isinstance(results[4].error, BadValue)
+        assert len(server._created) == 4
+
+        server.reset()
+        again = myclient.createWorkitems(specs[:4], **kwargs)
+        assert [result.value.identifier for result in again] == \
+            [result.value.identifier for result in results[:4]]
+        assert not server.requests["POST oslc/contexts/{pa}/workitems/defect"]
+
+
+def test_create_workitem_mixed_case_key():
+    create_kwargs = dict(CREATE_KWARGS,
+                         projectarea_id=PROJECTAREA_ID,
+                         template="issue_example.template")
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url,
+                             "tester1@email.com",
+                             "password",
+                             searchpath=FIXTURES_PATH)
+        # the response is lost and the first lookup fails
+        server.reset()
+        server.inject_error(path=POST_PATH, after=True)
+        server.inject_error(path="^oslc/contexts/[^/]+/workitems$")
+        workitem = myclient.createWorkitem("Defect",
+                                           "defect",
+                                           idempotency_key="Import-A",
+                                           retries=2,
+                                           **create_kwargs)
+        requests = dict(server.requests)
+        found = myclient.getWorkitemByKey("IMPORT-a",
+                                          projectarea_id=PROJECTAREA_ID)
+
+    # the tag lowercased by the server is matched by the lowercased key
+    assert requests["POST oslc/contexts/{pa}/workitems/defect"] == 1
+    assert requests["GET oslc/contexts/{pa}/workitems"] == 2
+    assert myclient.journal.get("import-a") == ("created", workitem.identifier)
+    assert found.identifier == workitem.identifier
+
+
+def test_update_workitems():
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url, "tester1@email.com", "password")
+        stale = myclient.getWorkitem(100002)
+        myclient.getWorkitem(100002).update(title="changed")
+        server.reset()
+        updates = [(100000 + idx, {
+            "title": "title %s" % idx
+        }) for idx in range(5)]
+        updates[2] = (stale, {"title": "stale"})
+        updates.append((100001, {"unknown": "value"}))
+        results = myclient.updateWorkitems(updates, concurrency=4)
+        requests = dict(server.requests)
+
+    assert [result.item for result in results] == updates
+    assert [result.ok for result in results] == [True] * 2 + [False] + \
+        [True] * 2 + [False]
+    assert isinstance(results[2].error, Conflict)
+    assert isinstance(results[5].error, BadValue)
+    assert results[4].value.title == "title 4"
+    # one scoped GET for the ETag and one PUT per workitem
+    assert requests["GET oslc/workitems/{id}"] == 4
+    assert requests["PUT oslc/workitems/{id}"] == 5
+
+
+def test_apply_action():
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url, "tester1@email.com", "password")
+        stale = myclient.getWorkitem(100007)
+        myclient.getWorkitem(100007).update(title="changed")
+        server.reset()
+        workitem_ids = [100000 + idx for idx in range(6)] + [stale, "bad"]
+        results = myclient.applyAction(workitem_ids,
+                                       "Start Working",
+                                       concurrency=4)
+        requests = dict(server.requests)
+        actions = [
+            params["_action"]
+            for _, params, _ in server.updates
+            if "_action" in params
+        ]
+
+        # the workitems already in the resulting state are skipped
+        server.reset()
+        again = myclient.applyAction(workitem_ids[:3], "Start Working")
+        assert server.requests["PUT oslc/workitems/{id}"] == 0
+        missing = myclient.applyAction([100000], "Unknown")
+        cache = myclient.metrics.as_dict()["cache"]["workflow_actions"]
+
+    assert [result.ok for result in results] == [True] * 7 + [False]
+    assert isinstance(results[7].error, BadValue)
+    assert stale.state == "default_workflow.state.s2"
+    assert actions == ["default_workflow.action.a2"] * 7
+    # the actions of the workflow are retrieved once and the conflict of
+    # the stale workitem is retried
+    assert requests["GET oslc/workflows/{pa}/actions/{workflow}"] == 1
+    assert cache["misses"] == 1
+    assert cache["hits"] >= 7
+    assert requests["PUT oslc/workitems/{id}"] == 8
+    assert all(result.ok for result in again)
+    assert isinstance(missing[0].error, NotFound)
+
+
+def test_add_comments():
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url, "tester1@email.com", "password")
+        server.reset()
+        comments = [(100000 + idx % 3, "build %s" % idx) for idx in range(6)]
+        comments.append(("bad", "no workitem"))
+        results = myclient.addComments(comments, concurrency=4)
+        requests = dict(server.requests)
+        added = myclient.getWorkitem(100000).getComments()
+
+    assert [result.ok for result in results] == [True] * 6 + [False]
+    assert isinstance(results[6].error, BadValue)
+    # only the comments are posted
+    assert requests == {
+        "POST oslc/workitems/{id}/rtc_cm:comments/oslc:comment": 6
+    }
+    urls = set(result.value.url for result in results if result.ok)
+    assert len(urls) == 6
+    assert sorted(comment.description for comment in added[-2:]) == [
+        "build 0", "build 3"
+    ]
+
+
+def test_add_comments_without_url(mocker):
+    parse_xml = Workitem._parse_xml
+
+    def parse_without_url(self, content, url):
+        # the server returns neither the comment url nor its location
+        raw_data = parse_xml(self, content, url)
+        raw_data["rdf:RDF"]["rdf:Description"].pop("@rdf:about", None)
+        return raw_data
+
+    mocker.patch.object(Workitem, "_parse_xml", parse_without_url)
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url, "tester1@email.com", "password")
+        server.reset()
+        comments = [(100000, "build %s" % idx) for idx in range(6)]
+        results = myclient.addComments(comments, concurrency=6)
+        requests = dict(server.requests)
+
+    # the url of the comments is not guessed
+    assert [result.ok for result in results] == [True] * 6
+    assert [result.value for result in results] == [None] * 6
+    assert requests == {
+        "POST oslc/workitems/{id}/rtc_cm:comments/oslc:comment": 6
+    }
+
+
+def test_update_subscribers():
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url, "tester1@email.com", "password")
+        server.reset()
+        mapping = dict((100000 + idx, {
+            "add": ["tester2@email.com", "tester3@email.com"],
+            "remove": ["tester1@email.com"]
+        }) for idx in range(4))
+        mapping[100004] = {"add": "tester2@email.com"}
+        mapping[100005] = {"subscribe": ["tester2@email.com"]}
+        results = myclient.updateSubscribers(mapping, concurrency=4)
+        requests = dict(server.requests)
+        body = json.loads(server.updates[-1][2])
+
+        # nothing would change
+        server.reset()
+        again = myclient.updateSubscribers(
+            {100000: {
+                "add": ["tester3@email.com"]
+            }})
+        assert server.requests["PUT oslc/workitems/{id}"] == 0
+
+    assert [result.ok for result in results] == [True] * 4 + [False] * 2
+    assert isinstance(results[4].error, BadValue)
+    assert isinstance(results[5].error, BadValue)
+    assert requests == {
+        "GET oslc/workitems/{id}": 4,
+        "PUT oslc/workitems/{id}": 4
+    }
+    assert body == {
+        "rtc_cm:subscribers": [{
+            "rdf:resource": myclient._get_member_url("tester2@email.com")
+        }, {
+            "rdf:resource": myclient._get_member_url("tester3@email.com")
+        }]
+    }
+    assert again[0].ok
+
+
+def test_relink_hierarchy():
+    with FakeRTCServer(workitems=10, seed=1) as server:
+        myclient = RTCClient(server.url, "tester1@email.com", "password")
+        server.reset()
+        mapping = {100001: 100000, 100002: "100000", 100003: None}
+        mapping[100004] = True
+        results = myclient.relinkHierarchy(mapping, concurrency=4)
+        requests = dict(server.requests)
+        bodies = dict((workitem_id, json.loads(body))
+                      for workitem_id, _, body in server.updates)
+
+    assert [result.ok for result in results] == [True] * 3 + [False]
+    assert isinstance(results[3].error, BadValue)
+    # only the parent links are written
+    assert requests == {"PUT oslc/workitems/{id}": 3}
+    assert bodies[100001][PARENT_TAG][0]["rdf:resource"].endswith("/100000")
+    assert bodies[100002] == bodies[100001]
+    assert bodies[100003] == {PARENT_TAG: []}
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from benchmarks.data import PROJECTAREA_ID
+from benchmarks.fake_server import FakeRTCServer
+from rtcclient.cassette import Cassette
+from rtcclient.client import RTCClient
+from rtcclient.exception import BadValue, CassetteMismatch
+
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    path = str(tmp_path / "cassette.json.gz")
+    with FakeRTCServer(workitems=120) as server:
+        with Cassette(path, mode="record") as cassette:
+            myclient = RTCClient(server.url,
+                                 "tester1@email.com",
+                                 "password",
+                                 cassette=cassette)
+            workitems = myclient.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                              returned_properties="dc:title")
+            assert len(workitems) == 120
+        recorded_requests = server.total_requests
+        url = server.url
+    assert len(cassette.interactions) == recorded_requests
+    return path, url
+
+
+def test_replay(cassette_path):
+    path, url = cassette_path
+    with Cassette(path) as cassette:
+        myclient = RTCClient(url,
+                             "tester1@email.com",
+                             "password",
+                             cassette=cassette)
+        workitems = myclient.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                          returned_properties="dc:title")
+        assert len(workitems) == 120
+        assert workitems[0].title == "input title here for 100000"
+        assert (myclient.metrics.total_requests() == len(cassette.interactions))
+
+        # all the recorded responses are consumed
+        with pytest.raises(CassetteMismatch):
+            myclient.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                  returned_properties="dc:title")
+
+
+def test_mismatch(cassette_path):
+    path, url = cassette_path
+    with Cassette(path) as cassette:
+        myclient = RTCClient(url,
+                             "tester1@email.com",
+                             "password",
+                             cassette=cassette)
+        with pytest.raises(CassetteMismatch):
+            myclient.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                  returned_properties="dc:description")
+
+
+def test_latency(cassette_path):
+    path, url = cassette_path
+    with Cassette(path, latency=0.02) as cassette:
+        start = time.perf_counter()
+        RTCClient(url, "tester1@email.com", "password", cassette=cassette)
+        # the login sends 3 requests
+        assert time.perf_counter() - start >= 0.06
+
+
+def test_streamed_downloads(tmp_path):
+    path = str(tmp_path / "cassette.json")
+    with FakeRTCServer(workitems=150, attachment_size=351) as server:
+        with Cassette(path, mode="record") as cassette:
+            myclient = RTCClient(server.url,
+                                 "tester1@email.com",
+                                 "password",
+                                 cassette=cassette)
+            attachment = myclient.getWorkitem(100001).getAttachments()[0]
+            # the streamed body is recorded while it is read, so the
+            # interrupted download is resumed
+            server.inject_truncation(100, path="resource/content/")
+            recorded = attachment.download(str(tmp_path / "recorded.go"))
+        url = server.url
+    bodies = [
+        interaction["response"]["body"]
+        for interaction in cassette.interactions
+        if "resource/content/" in interaction["request"]["url"]
+    ]
+    # the bodies are only loaded when they are saved
+    assert bodies == ["", ""]
+
+    with Cassette(path) as cassette:
+        myclient = RTCClient(url,
+                             "tester1@email.com",
+                             "password",
+                             cassette=cassette)
+        attachment = myclient.getWorkitem(100001).getAttachments()[0]
+        replayed = attachment.download(str(tmp_path / "replayed.go"))
+        sizes = [
+            len(interaction["response"]["body"])
+            for interaction in cassette.interactions
+            if "resource/content/" in interaction["request"]["url"]
+        ]
+    # the download interrupted when it was recorded is resumed
+    assert len(sizes) == 2
+    assert sizes[0] < 351
+    with open(recorded, "rb") as fp1, open(replayed, "rb") as fp2:
+        assert fp1.read() == fp2.read()
+
+
+def test_bad_values(tmp_path):
+    with pytest.raises(BadValue):
+        Cassette(str(tmp_path / "cassette.json"), mode="rewind")
+    with pytest.raises(BadValue):
+        Cassette(str(tmp_path / "cassette.json"), mode="record", latency="x")
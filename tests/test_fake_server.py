@@ -0,0 +1,393 @@
+import json
+import os
+import time
+
+import pytest
+import requests
+from benchmarks.data import PROJECTAREA_ID
+from benchmarks.fake_server import ATTACHMENT_SERVICE, FILESYSTEM_SERVICE
+from benchmarks.fake_server import FakeRTCServer
+from rtcclient.client import RTCClient
+from rtcclient.exception import BadValue, Conflict, RTCException
+from rtcclient.filecache import FileStateCache
+from rtcclient.workitem import ATTACHMENT_TAG, CHILDREN_TAG, PARENT_TAG
+
+
+@pytest.fixture
+def server():
+    with FakeRTCServer(workitems=150, children=12, seed=1) as fake:
+        yield fake
+
+
+@pytest.fixture
+def myclient(server):
+    return RTCClient(server.url, "tester1@email.com", "password")
+
+
+def test_login(server):
+    server.users = {"tester1@email.com": "password"}
+    myclient = RTCClient(server.url, "tester1@email.com", "password")
+    assert "JSESSIONID=" in myclient.headers["Cookie"]
+    assert server.requests["POST authenticated/j_security_check"] == 1
+
+
+def test_login_failed(server):
+    server.users = {"tester1@email.com": "password"}
+    with pytest.raises(Exception):
+        RTCClient(server.url, "tester1@email.com", "wrong")
+
+
+def test_paged_workitems(server, myclient):
+    server.reset()
+    workitems = myclient.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                      returned_properties="dc:title")
+    assert len(workitems) == 150
+    assert server.requests["GET oslc/contexts/{pa}/workitems"] == 2
+
+
+def test_paged_single_entries():
+    with FakeRTCServer(workitems=3, children=0, seed=1) as server:
+        myclient = RTCClient(server.url, "tester1@email.com", "password")
+        server.reset()
+        workitems = myclient._get_paged_resources(
+            "Workitem",
+            projectarea_id=PROJECTAREA_ID,
+            page_size="1",
+            returned_properties="dc:title")
+        requests = dict(server.requests)
+    identifiers = [workitem.identifier for workitem in workitems]
+    assert identifiers == ["100000", "100001", "100002"]
+    assert requests == {"GET oslc/contexts/{pa}/workitems": 3}
+
+
+def test_children(myclient):
+    workitem = myclient.getWorkitem(100001)
+    assert workitem.identifier == "100001"
+    assert len(workitem.getChildren(returned_properties="dc:title")) == 12
+
+
+def test_enumerations(myclient):
+    assert myclient.getSeverity("Normal",
+                                projectarea_id=PROJECTAREA_ID).title == "Normal"
+    assert len(myclient.getPriorities(projectarea_id=PROJECTAREA_ID)) == 2
+
+
+def test_comments(myclient):
+    workitem = myclient.getWorkitem(100000)
+    assert len(workitem.getComments()) == 2
+    workitem.addComment("a new comment")
+    comments = workitem.getComments()
+    assert len(comments) == 3
+    assert comments[-1].description == "a new comment"
+
+
+def test_etag(server, myclient):
+    url = "/".join([server.url, "oslc/workitems/100000"])
+    etag = requests.get(url, headers=myclient.headers).headers["ETag"]
+    headers = dict(myclient.headers, **{"If-Match": etag})
+    assert requests.put(url, headers=headers).status_code == 200
+    assert requests.put(url, headers=headers).status_code == 412
+
+
+def test_inject_error(server, myclient):
+    url = "/".join([server.url, "oslc/workitems/100000"])
+    server.inject_error(status=500, path="workitems/100000$")
+    with pytest.raises(requests.exceptions.HTTPError):
+        myclient.get(url, headers=myclient.headers)
+    assert myclient.get(url, headers=myclient.headers).status_code == 200
+
+
+def test_relogin(server, myclient):
+    server.expire_sessions()
+    assert myclient.getWorkitem(100000).identifier == "100000"
+
+
+def test_latency(server, myclient):
+    server.latency = 0.05
+    start = time.perf_counter()
+    myclient.getSeverities(projectarea_id=PROJECTAREA_ID)
+    assert time.perf_counter() - start >= 0.05
+
+
+def test_json_representation(server):
+    xml_client = RTCClient(server.url, "tester1@email.com", "password")
+    json_client = RTCClient(server.url,
+                            "tester1@email.com",
+                            "password",
+                            representation="json")
+    properties = "dc:title,dc:identifier,dc:subject,rtc_cm:filedAgainst"
+    expected = xml_client.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                       returned_properties=properties)
+    workitems = json_client.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                         returned_properties=properties)
+    assert len(workitems) == len(expected) == 150
+    for attr in ["identifier", "title", "subject", "filedAgainst"]:
+        assert getattr(workitems[-1], attr) == getattr(expected[-1], attr)
+
+    workitem = json_client.getWorkitem(100001)
+    expected = xml_client.getWorkitem(100001)
+    assert workitem.field_alias == expected.field_alias
+    for attr in workitem.field_alias:
+        assert getattr(workitem, attr) == getattr(expected, attr)
+    assert len(workitem.getChildren(returned_properties="dc:title")) == 12
+
+    server.expire_sessions()
+    assert json_client.getWorkitem(100000).identifier == "100000"
+
+
+def test_invalid_representation(server):
+    with pytest.raises(BadValue):
+        RTCClient(server.url,
+                  "tester1@email.com",
+                  "password",
+                  representation="yaml")
+
+
+def test_edit(server, myclient):
+    workitem = myclient.getWorkitem(100001)
+    server.reset()
+    with workitem.edit() as tx:
+        tx.update(title="edited")
+        tx.addParent(100005)
+        tx.addChildren([100006, "100007"])
+        tx.removeChild(200001)
+        tx.addSubscribers(["tester2@email.com", "tester3@email.com"])
+        tx.addComment("triaged")
+    assert server.requests["GET oslc/workitems/{id}"] == 1
+    assert server.requests["PUT oslc/workitems/{id}"] == 1
+    body = json.loads(server.updates[-1][2])
+    assert body["dc:title"] == "edited"
+    assert body[PARENT_TAG][0]["rdf:resource"].endswith("/100005")
+    children = [
+        link["rdf:resource"].rsplit("/")[-1] for link in body[CHILDREN_TAG]
+    ]
+    assert len(children) == 13
+    assert "200001" not in children
+    assert children[-2:] == ["100006", "100007"]
+    assert len(body["rtc_cm:subscribers"]) == 2
+    assert workitem.title == "edited"
+    assert len(workitem.getComments()) == 3
+
+    with workitem.edit() as tx:
+        tx.removeSubscriber("tester2@email.com")
+        tx.addSubscriber("tester3@email.com")
+    body = json.loads(server.updates[-1][2])
+    assert body == {
+        "rtc_cm:subscribers": [{
+            "rdf:resource": myclient._get_member_url("tester3@email.com")
+        }]
+    }
+
+    # nothing is written if the block fails
+    updates = len(server.updates)
+    with pytest.raises(ValueError):
+        with workitem.edit() as tx:
+            tx.update(title="discarded")
+            raise ValueError()
+    assert len(server.updates) == updates
+
+    stale = myclient.getWorkitem(100002)
+    myclient.getWorkitem(100002).update(title="changed")
+    with pytest.raises(Conflict):
+        with stale.edit() as tx:
+            tx.addSubscriber("tester2@email.com")
+
+
+def test_edit_queried(server, myclient):
+    queried = myclient.queryWorkitems('dc:type="defect"',
+                                      projectarea_id=PROJECTAREA_ID,
+                                      returned_properties="dc:title")[3]
+    assert queried.etag is None
+    # the ETag is retrieved when the session starts
+    server.reset()
+    tx = queried.edit()
+    assert server.requests == {"GET oslc/workitems/{id}": 1}
+    tx.update(title="edited")
+    myclient.getWorkitem(queried.identifier).update(title="changed")
+    updates = len(server.updates)
+    with pytest.raises(Conflict):
+        tx.commit()
+    assert len(server.updates) == updates
+
+
+def test_children_links(server, myclient):
+    workitem = myclient.getWorkitem(100001)
+    server.reset()
+    workitem.addChildren([100005, 100006])
+    workitem.removeChild(200000)
+    # the links are retrieved inline instead of the children workitems
+    assert server.requests == {
+        "GET oslc/workitems/{id}": 2,
+        "PUT oslc/workitems/{id}": 2
+    }
+    body = json.loads(server.updates[-1][2])
+    children = [
+        link["rdf:resource"].rsplit("/")[-1] for link in body[CHILDREN_TAG]
+    ]
+    assert len(children) == 13
+    assert children[-2:] == ["100005", "100006"]
+    assert "200000" not in children
+
+    # nothing is written if the children are unchanged
+    workitem.addChild(100005)
+    assert server.requests["PUT oslc/workitems/{id}"] == 2
+
+
+def test_add_attachments(server, myclient, tmp_path):
+    paths = list()
+    for idx in range(3):
+        path = tmp_path / ("test%s.log" % idx)
+        path.write_bytes(b"log line\n" * 1000 * (idx + 1))
+        paths.append(str(path))
+    paths.insert(1, str(tmp_path / "missing.log"))
+    progress = dict()
+
+    def report(filepath, sent, total):
+        progress[filepath] = (sent, total)
+
+    workitem = myclient.getWorkitem(100001)
+    server.reset()
+    results = workitem.addAttachments(paths, concurrency=2, progress=report)
+    assert [result.ok for result in results] == [True, False, True, True]
+    assert isinstance(results[1].error, IOError)
+    # the category is taken from the workitem, and the attachments are
+    # linked in one PUT
+    assert server.requests == {
+        "POST " + ATTACHMENT_SERVICE.rstrip("/"): 3,
+        "GET oslc/workitems/{id}": 1,
+        "PUT oslc/workitems/{id}": 1
+    }
+    body = json.loads(server.updates[-1][2])
+    links = [link["rdf:resource"] for link in body[ATTACHMENT_TAG]]
+    assert links == [results[idx].value.url for idx in (0, 2, 3)]
+    assert results[3].value.title == "test2.log"
+    assert sorted(progress) == sorted(paths[:1] + paths[2:])
+    assert all(sent == total for sent, total in progress.values())
+
+    # a single attachment is linked in one POST
+    server.reset()
+    attachment = workitem.addAttachment(paths[0])
+    assert attachment.url not in links
+    assert server.requests == {
+        "POST " + ATTACHMENT_SERVICE.rstrip("/"): 1,
+        "POST oslc/workitems/{id}/" + ATTACHMENT_TAG: 1
+    }
+
+
+def test_download_attachments(tmp_path):
+    content = bytes(bytearray(range(256))) + bytes(bytearray(range(95)))
+    with FakeRTCServer(workitems=150, attachment_size=351) as server:
+        myclient = RTCClient(server.url, "tester1@email.com", "password")
+        workitem = myclient.getWorkitem(100001)
+        attachment = workitem.getAttachments()[0]
+
+        # resume the download left by an earlier call
+        (tmp_path / "cgobench1.go.part").write_bytes(content[:100])
+        server.reset()
+        path = attachment.download(str(tmp_path))
+        assert path == str(tmp_path / "cgobench1.go")
+        assert (tmp_path / "cgobench1.go").read_bytes() == content
+        assert not (tmp_path / "cgobench1.go.part").exists()
+        assert server.requests == {"GET ccm/resource/content/{uuid}": 1}
+
+        # download again when the connection drops
+        server.reset()
+        server.inject_truncation(100, path="resource/content/")
+        progress = list()
+        results = workitem.downloadAttachments(
+            str(tmp_path / "all"),
+            concurrency=2,
+            progress=lambda item, received, total: progress.append(
+                (item.identifier, received, total)))
+        assert [result.ok for result in results] == [True, True]
+        assert sorted(progress) == [("21", 351, 351), ("22", 351, 351)]
+        for result in results:
+            with open(result.value, "rb") as fp:
+                assert fp.read() == content
+        assert server.requests["GET ccm/resource/content/{uuid}"] == 3
+
+        # the attachment id is the file name if it has no title
+        server.reset()
+        untitled = workitem.getAttachments()[0]
+        untitled.title = None
+        path = untitled.download(str(tmp_path))
+        assert path == str(tmp_path / untitled.identifier)
+        assert (tmp_path / untitled.identifier).read_bytes() == content
+
+        # the size of the content is verified
+        attachment.contentLength = "350"
+        with pytest.raises(RTCException):
+            attachment.download(str(tmp_path / "short.go"))
+
+
+def test_fetch_changeset_files(server, myclient, tmp_path):
+    workitem = myclient.getWorkitem(100001)
+    server.reset()
+    server.inject_truncation(100, path=FILESYSTEM_SERVICE)
+    results = workitem.fetchChangeSetFiles(str(tmp_path), concurrency=4)
+    # 3 changesets of 2 files changed, 1 file deleted and 1 folder
+    assert [result.ok for result in results] == [True] * 12
+    fetched = [result.value for result in results if result.value]
+    assert len(fetched) == 6
+    assert sorted(os.path.basename(path) for path in fetched) == [
+        "file1.txt", "file1.txt", "file1.txt", "file2.txt", "file2.txt",
+        "file2.txt"
+    ]
+    with open(fetched[0], "rb") as fp:
+        assert fp.read() == b"_file1@_state2\n" * 1000
+    # the truncated file is fetched again
+    assert server.requests["GET " + FILESYSTEM_SERVICE + "-/_component"] == 7
+    assert server.requests["GET resource/itemOid/com.ibm.team.scm.ChangeSet/"
+                           "{uuid}"] == 3
+
+    changeset = workitem.getChangeSets()[0]
+    results = changeset.fetchAllFiles(str(tmp_path / "before"), state="before")
+    names = [os.path.basename(result.value or "") for result in results]
+    assert names == ["file1.txt", "", "file3.txt", ""]
+    with pytest.raises(BadValue):
+        changeset.fetchAllFiles(str(tmp_path), state="current")
+
+
+def test_fetch_changeset_files_cached(server, tmp_path):
+    cache = FileStateCache(str(tmp_path / "cache"))
+    myclient = RTCClient(server.url,
+                         "tester1@email.com",
+                         "password",
+                         file_cache=cache)
+    workitem = myclient.getWorkitem(100001)
+    content_requests = "GET " + FILESYSTEM_SERVICE + "-/_component"
+    server.reset()
+    first = workitem.fetchChangeSetFiles(str(tmp_path / "first"))
+    # the 3 changesets share the same file states
+    assert server.requests[content_requests] == 2
+    assert len(cache) == 2
+
+    # a repeated audit costs no file transfer
+    server.reset()
+    second = workitem.fetchChangeSetFiles(str(tmp_path / "second"))
+    assert server.requests[content_requests] == 0
+    # each file state is reported as a cache hit or miss
+    assert myclient.metrics.as_dict()["cache"]["file_states"] == {
+        "hits": 10,
+        "misses": 2
+    }
+    for result1, result2 in zip(first, second):
+        assert (result1.value is None) == (result2.value is None)
+        if result1.value is not None:
+            with open(result1.value, "rb") as fp1, \
+                    open(result2.value, "rb") as fp2:
+                assert fp1.read() == fp2.read()
+
+
+def test_fetch_existing_file_cached(server, tmp_path):
+    cache = FileStateCache(str(tmp_path / "cache"))
+    myclient = RTCClient(server.url,
+                         "tester1@email.com",
+                         "password",
+                         file_cache=cache)
+    change = myclient.getWorkitem(100001).getChangeSets()[0].getChanges()[0]
+    (tmp_path / "file1.txt").write_bytes(b"kept")
+    # the existing file is kept without downloading it to the cache
+    assert change.fetchBeforeStateFile(str(tmp_path)) is None
+    assert (tmp_path / "file1.txt").read_bytes() == b"kept"
+    assert len(cache) == 0
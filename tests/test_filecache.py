@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from rtcclient.exception import BadValue
+from rtcclient.filecache import FileStateCache
+
+
+def make_download(content, name, calls):
+
+    def download(path):
+        calls.append(name)
+        with open(path, "wb") as fp:
+            fp.write(content)
+        return name
+
+    return download
+
+
+def test_file_state_cache(tmp_path):
+    cache = FileStateCache(str(tmp_path / "cache"), max_size=250)
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    calls = list()
+
+    path = cache.fetch("_file1", "_state1",
+                       make_download(b"1" * 100, "a.txt", calls), str(dest))
+    assert path == str(dest / "a.txt")
+    assert (dest / "a.txt").read_bytes() == b"1" * 100
+    # the cached file state is linked without downloading
+    os.remove(path)
+    cache.fetch("_file1", "_state1", make_download(b"", "a.txt", calls),
+                str(dest))
+    assert (dest / "a.txt").read_bytes() == b"1" * 100
+    assert calls == ["a.txt"]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert ("_file1", "_state1") in cache
+
+    # an existing file is kept if not overridden
+    assert cache.fetch("_file1",
+                       "_state1",
+                       make_download(b"", "a.txt", calls),
+                       str(dest),
+                       override=False) is None
+
+    cache.fetch("_file2", "_state1", make_download(b"2" * 100, "b.txt", calls),
+                str(dest))
+    # _file1 is used more recently than _file2, which does not touch the
+    # linked destination file
+    os.utime(str(dest / "a.txt"), (0, 0))
+    cache.lookup("_file1", "_state1")
+    assert os.path.getmtime(str(dest / "a.txt")) == 0
+    cache.fetch("_file3", "_state1", make_download(b"3" * 100, "c.txt", calls),
+                str(dest))
+    assert len(cache) == 2
+    assert cache.size == 200
+    assert ("_file2", "_state1") not in cache
+    # the destination files are kept when evicted
+    assert (dest / "b.txt").read_bytes() == b"2" * 100
+
+    # the cache survives a restart
+    reloaded = FileStateCache(str(tmp_path / "cache"), max_size=250)
+    assert len(reloaded) == 2
+    assert reloaded.lookup("_file3", "_state1") == "c.txt"
+    reloaded.clear()
+    assert len(reloaded) == 0
+    assert reloaded.lookup("_file1", "_state1") is None
+
+    with pytest.raises(BadValue):
+        FileStateCache(str(tmp_path / "cache"), max_size=-1)
@@ -0,0 +1,149 @@
+import datetime
+
+import pytest
+from benchmarks.data import PROJECTAREA_ID
+from benchmarks.fake_server import FakeRTCServer
+from rtcclient import frame
+from rtcclient.client import RTCClient
+from rtcclient.exception import BadValue
+from rtcclient.frame import WorkitemFrame
+from rtcclient.records import RecordSchema, WorkitemRecord
+
+URL = "http://test.url:9443/jazz/oslc/workitems/%s"
+
+
+def _records():
+    schema = RecordSchema.get({
+        "identifier": "dc:identifier",
+        "state": "rtc_cm:state",
+        "modified": "dc:modified",
+        "title": "dc:title",
+        "timeSpent": "rtc_cm:timeSpent"
+    })
+    rows = [
+        ("161", "New", "2010-02-16T16:04:00.244Z", "first", "3600"),
+        ("162", "Closed", "2010-02-17T16:04:00.244Z", "second", None),
+        ("163", "New", "2010-02-18T16:04:00.244Z", "third", "1800"),
+        ("164", None, None, "fourth", "0"),
+    ]
+    return [WorkitemRecord(URL % row[0], None, schema, row) for row in rows]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(frame, "numpy", None)
+    return request.param
+
+
+def test_kinds(backend):
+    workitems = WorkitemFrame.from_workitems(_records())
+    assert len(workitems) == 4
+    assert workitems.urls[0] == URL % 161
+    assert dict((name, workitems.kind(name)) for name in workitems.columns) == {
+        "identifier": "integer",
+        "state": "category",
+        "modified": "datetime",
+        "title": "object",
+        "timeSpent": "float"
+    }
+    assert workitems.categories("state") == ["New", "Closed"]
+    assert list(workitems.codes("state")) == [0, 1, 0, -1]
+    assert list(workitems["state"]) == ["New", "Closed", "New", None]
+    assert workitems.row(3) == {
+        "identifier": 164,
+        "state": None,
+        "modified": None,
+        "title": "fourth",
+        "timeSpent": 0
+    }
+    assert workitems.row(0)["modified"] == datetime.datetime(
+        2010, 2, 16, 16, 4, 0, 244000, tzinfo=datetime.timezone.utc)
+    with pytest.raises(BadValue):
+        workitems.codes("title")
+    with pytest.raises(BadValue):
+        workitems["unknown"]
+
+
+def test_missing_integer(backend):
+    schema = RecordSchema.get({
+        "identifier": "dc:identifier",
+        "estimate": "rtc_cm:estimate"
+    })
+    records = [
+        WorkitemRecord(URL % 161, None, schema, ("161", "3")),
+        WorkitemRecord(URL % 162, None, schema, ("162", None)),
+    ]
+    workitems = WorkitemFrame.from_workitems(records)
+    # the integer column with a missing value is a float column
+    assert workitems.kind("identifier") == "integer"
+    assert workitems.kind("estimate") == "float"
+    rows = [workitems.row(index) for index in range(2)]
+    assert rows == [{
+        "identifier": 161,
+        "estimate": 3.0
+    }, {
+        "identifier": 162,
+        "estimate": None
+    }]
+    assert isinstance(rows[0]["identifier"], int)
+    assert isinstance(rows[0]["estimate"], float)
+    assert len(workitems.filter(estimate=3)) == 1
+
+
+def test_filter_count_groupby(backend):
+    workitems = WorkitemFrame.from_workitems(_records())
+    opened = workitems.filter(state="New")
+    assert list(opened["identifier"]) == [161, 163]
+    assert len(workitems.filter(state=["New", "Closed"], timeSpent=1800)) == 1
+    assert len(workitems.filter(state="Unknown")) == 0
+    mask = [identifier > 161 for identifier in workitems["identifier"]]
+    assert list(workitems.filter(mask, state=None)["title"]) == ["fourth"]
+
+    assert workitems.count() == 4
+    assert workitems.count("state") == {"New": 2, "Closed": 1, None: 1}
+    assert workitems.count("title")["first"] == 1
+    groups = workitems.groupby("state")
+    assert set(groups) == {"New", "Closed", None}
+    assert list(groups["New"]["title"]) == ["first", "third"]
+
+
+def test_categorical_columns():
+    workitems = WorkitemFrame.from_workitems(_records(), categorical=["title"])
+    assert workitems.kind("title") == "category"
+    assert workitems.kind("state") == "object"
+
+
+def test_to_pandas():
+    pytest.importorskip("pandas")
+    df = WorkitemFrame.from_workitems(_records()).to_pandas()
+    assert list(df.columns) == [
+        "identifier", "state", "modified", "title", "timeSpent"
+    ]
+    assert str(df["state"].dtype) == "category"
+    assert df["state"].isna().sum() == 1
+    assert df["identifier"].sum() == 650
+
+
+def test_to_arrow():
+    pytest.importorskip("pyarrow")
+    table = WorkitemFrame.from_workitems(_records()).to_arrow()
+    assert table.num_rows == 4
+    assert table.column("state").null_count == 1
+    assert table.column("modified").null_count == 1
+    assert table.column("state").to_pylist() == ["New", "Closed", "New", None]
+
+
+def test_get_workitems_as_frame():
+    with FakeRTCServer(workitems=150, seed=1) as server:
+        myclient = RTCClient(server.url, "tester1@email.com", "password")
+        workitems = myclient.getWorkitems(
+            projectarea_id=PROJECTAREA_ID,
+            returned_properties="dc:identifier,dc:title,dc:type",
+            as_frame=True)
+    assert isinstance(workitems, WorkitemFrame)
+    assert len(workitems) == 150
+    assert workitems.kind("type") == "category"
+    assert workitems.count("type") == {"defect": 75, "task": 75}
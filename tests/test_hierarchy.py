@@ -0,0 +1,65 @@
+import pytest
+from benchmarks.fake_server import FakeRTCServer
+from rtcclient.client import RTCClient
+from rtcclient.exception import BadValue
+from rtcclient.hierarchy import Hierarchy
+
+
+class _Record(object):
+
+    def __init__(self, identifier):
+        self.identifier = identifier
+
+
+def test_hierarchy():
+    tree = Hierarchy(1)
+    assert tree.add(_Record(1))
+    assert tree.add(_Record(2), 1)
+    assert tree.add(_Record(3), 2)
+    assert tree.add(_Record(4), 1)
+    # a workitem is only listed under the first parent
+    assert not tree.add(_Record(3), 4)
+    assert len(tree) == 4
+    assert 3 in tree and "4" in tree
+    assert tree[2].identifier == 2
+    assert list(tree.walk()) == [("1", 0), ("2", 1), ("3", 2), ("4", 1)]
+    assert tree.descendants() == ["2", "3", "4"]
+    assert tree.descendants(2) == ["3"]
+    assert tree.parents["3"] == "2"
+    assert tree.leaves() == ["3", "4"]
+
+
+@pytest.fixture
+def server():
+    with FakeRTCServer(workitems=10, children=12, seed=1) as fake:
+        yield fake
+
+
+@pytest.fixture
+def myclient(server):
+    return RTCClient(server.url, "tester1@email.com", "password")
+
+
+def test_get_hierarchy(server, myclient):
+    server.reset()
+    tree = myclient.getHierarchy(100001, returned_properties="dc:title")
+    assert len(tree) == 13
+    assert tree.root == "100001"
+    assert len(tree.children["100001"]) == 12
+    assert tree[tree.children["100001"][0]].title
+    # the children of the workitems on the same level are listed once
+    assert all(tree.levels[wid] == 1 for wid in tree.descendants())
+    assert not tree.errors
+    children = server.requests[
+        "GET oslc/workitems/{id}/"
+        "rtc_cm:com.ibm.team.workitem.linktype.parentworkitem.children"]
+    assert children == 13
+
+
+def test_get_hierarchy_depth(server, myclient):
+    tree = myclient.getHierarchy(100001, depth=0)
+    assert len(tree) == 1
+    assert tree.leaves() == ["100001"]
+
+    with pytest.raises(BadValue):
+        myclient.getHierarchy(100001, depth=-1)
@@ -0,0 +1,136 @@
+import requests
+import pytest
+import utils_test
+from rtcclient.metrics import MetricsRegistry, normalize_endpoint
+
+
+def test_normalize_endpoint():
+    base_url = "http://test.url:9443/jazz"
+    urls = [("http://test.url:9443/jazz/oslc/workitems/161",
+             "oslc/workitems/{id}"),
+            ("http://test.url:9443/jazz/oslc/workitems/161/rtc_cm:comments",
+             "oslc/workitems/{id}/rtc_cm:comments"),
+            ("".join([
+                "http://test.url:9443/jazz/oslc/contexts/",
+                "_CuZu0HUwEeKicpXBddtqNA/workitems",
+                "?oslc_cm.pageSize=100&_startIndex=0"
+            ]), "oslc/contexts/{pa}/workitems"),
+            ("".join([
+                "http://test.url:9443/jazz/oslc/workflows/",
+                "_CuZu0HUwEeKicpXBddtqNA/actions/default_workflow"
+            ]), "oslc/workflows/{pa}/actions/{workflow}"),
+            ("http://test.url:9443/jts/users/tester1%40email.com",
+             "jts/users/{user}"), (None, "unknown")]
+    for url, endpoint in urls:
+        assert normalize_endpoint(url, base_url) == endpoint
+
+
+def test_record_request():
+    metrics = MetricsRegistry(buckets=(0.1, 1.0))
+    metrics.record_request("GET",
+                           "oslc/workitems/{id}",
+                           200,
+                           0.05,
+                           bytes_received=10)
+    metrics.record_request("GET",
+                           "oslc/workitems/{id}",
+                           404,
+                           0.5,
+                           bytes_received=5)
+    metrics.record_request("POST",
+                           "oslc/workitems/{id}",
+                           "error",
+                           2.0,
+                           bytes_sent=3)
+    assert metrics.total_requests() == 3
+
+    stats = metrics.as_dict()["requests"]["GET oslc/workitems/{id}"]
+    assert stats["count"] == 2
+    assert stats["status"] == {"200": 1, "404": 1}
+    assert stats["bytes_received"] == 15
+    assert stats["latency"]["buckets"] == {"0.1": 1, "1.0": 2, "+Inf": 2}
+
+    stats = metrics.as_dict()["requests"]["POST oslc/workitems/{id}"]
+    assert stats["status"] == {"error": 1}
+    assert stats["bytes_sent"] == 3
+    assert stats["latency"]["buckets"] == {"0.1": 0, "1.0": 0, "+Inf": 1}
+
+    metrics.reset()
+    assert metrics.total_requests() == 0
+
+
+def test_disabled():
+    metrics = MetricsRegistry(enabled=False)
+    metrics.record_request("GET", "oslc/workitems/{id}", 200, 0.05)
+    metrics.record_parse("oslc/workitems/{id}", 0.05)
+    assert metrics.as_dict() == {
+        "requests": {},
+        "parse": {},
+        "build": {},
+        "cache": {}
+    }
+
+
+def test_to_prometheus():
+    metrics = MetricsRegistry(buckets=(0.1,))
+    metrics.record_request("GET",
+                           "oslc/workitems/{id}",
+                           200,
+                           0.05,
+                           bytes_received=10)
+    metrics.record_parse("oslc/workitems/{id}", 0.01)
+    metrics.record_build("Workitem", 0.2)
+
+    output = metrics.to_prometheus()
+    expected_lines = [
+        "# TYPE rtcclient_requests_total counter",
+        ('rtcclient_requests_total{endpoint="oslc/workitems/{id}",'
+         'method="GET",status="200"} 1'),
+        ('rtcclient_response_bytes_received_total'
+         '{endpoint="oslc/workitems/{id}",method="GET"} 10'),
+        ('rtcclient_request_duration_seconds_bucket'
+         '{endpoint="oslc/workitems/{id}",method="GET",le="0.1"} 1'),
+        ('rtcclient_request_duration_seconds_count'
+         '{endpoint="oslc/workitems/{id}",method="GET"} 1'),
+        ('rtcclient_parse_duration_seconds_bucket'
+         '{endpoint="oslc/workitems/{id}",le="+Inf"} 1'),
+        ('rtcclient_build_duration_seconds_bucket'
+         '{resource="Workitem",le="0.1"} 0'),
+    ]
+    for line in expected_lines:
+        assert line in output.splitlines()
+
+
+class TestClientMetrics:
+
+    @pytest.fixture(autouse=True)
+    def myrtcclient(self, rtcclient):
+        myclient = rtcclient
+        return myclient
+
+    def test_get_workitem(self, myrtcclient, mocker):
+        mocked_get = mocker.patch("requests.get")
+        mock_resp = mocker.MagicMock(spec=requests.Response)
+        mock_resp.status_code = 200
+        mock_resp.content = utils_test.workitem1_raw
+        mocked_get.return_value = mock_resp
+
+        myrtcclient.getWorkitem(161, returned_properties="dc:title")
+        myrtcclient.getWorkitem(162, returned_properties="dc:title")
+
+        metrics = myrtcclient.metrics.as_dict()
+        stats = metrics["requests"]["GET oslc/workitems/{id}"]
+        assert stats["count"] == 2
+        assert stats["status"] == {"200": 2}
+        assert stats["bytes_received"] == 2 * len(utils_test.workitem1_raw)
+        assert metrics["parse"]["oslc/workitems/{id}"]["count"] == 2
+
+    def test_failed_request(self, myrtcclient, mocker):
+        mocked_get = mocker.patch("requests.get")
+        mocked_get.side_effect = requests.exceptions.ConnectionError()
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            myrtcclient.get("http://test.url:9443/jazz/oslc/projectareas")
+
+        stats = myrtcclient.metrics.as_dict()["requests"]
+        assert stats["GET oslc/projectareas"]["status"] == {"error": 1}
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+import utils_test
+from benchmarks.data import to_oslc_json
+from rtcclient import oslc_json
+from rtcclient.exception import RTCException
+
+
+def test_loads():
+    content = json.dumps({
+        "rdf:resource": "http://test.url:9443/jazz/oslc/workitems/161",
+        "dc:identifier": 161,
+        "dc:title": "title",
+        "dc:subject": "",
+        "rtc_cm:archived": False,
+        "rtc_cm:filedAgainst": {
+            "rdf:resource": "http://test.url:9443/jazz/resource/category"
+        },
+        "rtc_cm:com.ibm.team.workitem.linktype.parentworkitem.parent": [{
+            "rdf:resource": "http://test.url:9443/jazz/resource/161",
+            "oslc_cm:label": "161: parent"
+        }],
+        "rtc_cm:subscribers": []
+    })
+    assert oslc_json.loads(content) == {
+        "@rdf:resource": "http://test.url:9443/jazz/oslc/workitems/161",
+        "dc:identifier": "161",
+        "dc:title": "title",
+        "dc:subject": None,
+        "rtc_cm:archived": "false",
+        "rtc_cm:filedAgainst": {
+            "@rdf:resource": "http://test.url:9443/jazz/resource/category"
+        },
+        "rtc_cm:com.ibm.team.workitem.linktype.parentworkitem.parent": {
+            "@rdf:resource": "http://test.url:9443/jazz/resource/161",
+            "@oslc_cm:label": "161: parent"
+        },
+        "rtc_cm:subscribers": None
+    }
+
+
+def test_loads_collection():
+    content = to_oslc_json(utils_test.read_fixture("workitems.xml"))
+    attributes, entries = oslc_json.loads_collection(content.encode("UTF-8"))
+    assert attributes == {"@oslc_cm:totalCount": "2"}
+    assert [entry["dc:identifier"] for entry in entries] == ["161", "6329"]
+    assert entries[0]["@rdf:resource"] == utils_test.workitem1["@rdf:resource"]
+
+    attributes, entries = oslc_json.loads_collection(
+        '{"oslc_cm:totalCount": 0, "oslc_cm:results": []}')
+    assert attributes == {"@oslc_cm:totalCount": "0"}
+    assert entries == []
+
+
+def test_loads_invalid():
+    for content in ["<html>Login</html>", "[]"]:
+        with pytest.raises(RTCException):
+            oslc_json.loads(content)
@@ -0,0 +1,103 @@
+import requests
+import pytest
+import utils_test
+from rtcclient.profiler import Profiler
+from rtcclient.workitem import Workitem
+
+
+class TestProfiler:
+
+    @pytest.fixture(autouse=True)
+    def myrtcclient(self, rtcclient):
+        myclient = rtcclient
+        return myclient
+
+    @pytest.fixture
+    def mock_get_workitem(self, mocker):
+        mocked_get = mocker.patch("requests.get")
+        mock_resp = mocker.MagicMock(spec=requests.Response)
+        mock_resp.status_code = 200
+        mock_resp.content = utils_test.workitem1_raw
+        mocked_get.return_value = mock_resp
+        return mocked_get
+
+    @pytest.fixture
+    def mock_get_comments(self, mocker):
+        mocked_get = mocker.patch("requests.get")
+        mock_resp = mocker.MagicMock(spec=requests.Response)
+        mock_resp.status_code = 200
+        mock_resp.content = utils_test.read_fixture("comments.xml")
+        mocked_get.return_value = mock_resp
+        return mocked_get
+
+    def test_profile_context(self, myrtcclient, mock_get_workitem):
+        with myrtcclient.profile() as p:
+            myrtcclient.getWorkitem(161, returned_properties="dc:title")
+        assert isinstance(p, Profiler)
+        assert not myrtcclient._profilers
+
+        calls = p.root.children
+        assert len(calls) == 1
+        assert calls[0].name == "RTCClient.getWorkitem"
+        # the linked attributes are resolved while constructing the workitem
+        assert calls[0].requests["GET oslc/workitems/{id}"] == 1
+        assert calls[0].requests["GET oslc/projectareas/{pa}"] == 1
+        assert calls[0].total_requests() == p.root.total_requests()
+
+        summary = p.summary()
+        assert summary["requests"]["GET oslc/workitems/{id}"] == 1
+        assert summary["total_bytes"] >= len(utils_test.workitem1_raw)
+        assert summary["parse_time"] > 0
+        assert summary["warnings"] == []
+        assert "RTCClient.getWorkitem" in p.report()
+
+        # not recorded after exiting the context
+        myrtcclient.getWorkitem(161, returned_properties="dc:title")
+        assert p.root.total_requests() == summary["total_requests"]
+
+    def test_profile_decorator(self, myrtcclient, mock_get_comments):
+        workitem1 = Workitem("http://test.url:9443/jazz/oslc/workitems/161",
+                             myrtcclient,
+                             workitem_id=161,
+                             raw_data=utils_test.workitem1)
+        profiler = myrtcclient.profile()
+
+        @profiler
+        def get_comments(workitem):
+            return workitem.getComments()
+
+        get_comments(workitem1)
+        calls = [call.name for call in profiler.root.children]
+        assert calls == ["Workitem.getComments"]
+        summary = profiler.summary()
+        assert summary["requests"][
+            "GET oslc/workitems/{id}/rtc_cm:comments"] == 1
+
+    def test_n_plus_one(self, myrtcclient, mock_get_workitem):
+        with myrtcclient.profile(n_plus_one_threshold=2) as p:
+            for workitem_id in [161, 162, 163]:
+                myrtcclient.get("/".join(
+                    [myrtcclient.url,
+                     "oslc/workitems/%s" % workitem_id]))
+        assert len(p.warnings) == 1
+        assert "GET oslc/workitems/{id}" in p.warnings[0]
+
+        with myrtcclient.profile(n_plus_one_threshold=None) as p:
+            for workitem_id in [161, 162, 163]:
+                myrtcclient.get("/".join(
+                    [myrtcclient.url,
+                     "oslc/workitems/%s" % workitem_id]))
+        assert not p.warnings
+
+    def test_cache(self, myrtcclient):
+        with myrtcclient.profile() as p:
+            for _ in range(3):
+                myrtcclient.listFields(utils_test.template_name)
+        cache = p.summary()["cache"]["template_fields"]
+        assert cache["hits"] == 2
+        assert cache["misses"] == 1
+        assert cache["hit_rate"] == pytest.approx(2.0 / 3)
+        assert myrtcclient.metrics.as_dict()["cache"]["template_fields"] == {
+            "hits": 2,
+            "misses": 1
+        }
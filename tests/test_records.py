@@ -0,0 +1,111 @@
+import pickle
+
+import pytest
+from benchmarks.data import PROJECTAREA_ID
+from benchmarks.fake_server import FakeRTCServer
+from rtcclient.client import RTCClient
+from rtcclient.records import RecordSchema, WorkitemRecord
+from rtcclient.workitem import Workitem
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeRTCServer(workitems=120, children=3, seed=1) as fake:
+        yield fake
+
+
+@pytest.fixture
+def myclient(server):
+    return RTCClient(server.url, "tester1@email.com", "password")
+
+
+def test_compact_workitems(myclient):
+    properties = "dc:title,dc:identifier,rtc_cm:filedAgainst"
+    expected = myclient.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                     returned_properties=properties)
+    records = myclient.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                    returned_properties=properties,
+                                    compact=True)
+    assert len(records) == len(expected) == 120
+    for record, workitem in zip(records, expected):
+        assert isinstance(record, WorkitemRecord)
+        assert record.identifier == workitem.identifier
+        assert record.url == workitem.url
+        assert record.as_dict() == dict(
+            (attr, getattr(workitem, attr)) for attr in workitem.field_alias)
+        assert record.raw_data is None
+    # the schema is shared by all the records
+    assert len(set(id(record._schema) for record in records)) == 1
+    assert records[0].field_alias == expected[0].field_alias
+    assert not hasattr(records[0], "__dict__")
+
+
+def test_compact_requests(server, myclient, mocker):
+    properties = "dc:identifier,rtc_cm:filedAgainst,dc:type"
+    server.reset()
+    myclient.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                          returned_properties=properties)
+    full = dict(server.requests)
+    built = mocker.spy(Workitem, "__init__")
+    server.reset()
+    records = myclient.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                    returned_properties=properties,
+                                    compact=True)
+    compact = dict(server.requests)
+    # the records are built from the entries, and the title of each linked
+    # resource is only retrieved once
+    assert built.call_count == 0
+    assert len(records) == 120
+    assert full["GET oslc/types/{pa}/task"] == 60
+    assert compact["GET oslc/types/{pa}/task"] == 1
+    assert sum(compact.values()) == 8
+    assert sum(full.values()) == 363
+    titles = myclient.metrics.as_dict()["cache"]["link_titles"]
+    assert titles == {"hits": 355, "misses": 5}
+
+
+def test_keep_raw_data(myclient):
+    records = myclient.queryWorkitems('dc:type="defect"',
+                                      projectarea_id=PROJECTAREA_ID,
+                                      returned_properties="dc:title",
+                                      compact=True,
+                                      keep_raw_data=True)
+    assert records[0].raw_data["dc:title"] == records[0].title
+
+
+def test_record_methods(myclient):
+    record = myclient.getWorkitems(projectarea_id=PROJECTAREA_ID,
+                                   returned_properties="dc:title",
+                                   compact=True)[1]
+    workitem = record.to_workitem()
+    assert isinstance(workitem, Workitem)
+    assert workitem.title == record.title
+    assert len(record.getComments()) == 2
+    with pytest.raises(AttributeError):
+        record.unknown
+    with pytest.raises(AttributeError):
+        record.title = "read-only"
+
+
+def test_pickle():
+    schema = RecordSchema.get({
+        "identifier": "dc:identifier",
+        "title": "dc:title"
+    })
+    record = WorkitemRecord("http://test.url:9443/jazz/oslc/workitems/161",
+                            None, schema, ["161", "title"])
+    assert record.identifier == "161"
+    loaded = pickle.loads(pickle.dumps(record))
+    assert loaded.as_dict() == {"identifier": "161", "title": "title"}
+    assert RecordSchema.get(dict(schema.field_alias)) is schema
+
+
+def test_schema_cache(monkeypatch):
+    monkeypatch.setattr(RecordSchema, "max_schemas", 2)
+    schemas = [
+        RecordSchema.get({"field%s" % idx: "rtc_cm:field"}) for idx in range(3)
+    ]
+    assert len(RecordSchema._schemas) == 2
+    # the least recently used schema is evicted
+    assert RecordSchema.get({"field2": "rtc_cm:field"}) is schemas[2]
+    assert RecordSchema.get({"field0": "rtc_cm:field"}) is not schemas[0]
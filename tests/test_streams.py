@@ -0,0 +1,44 @@
+import io
+
+from rtcclient import streams
+from rtcclient.streams import MultipartFileStream
+
+
+def test_multipart_file_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(streams, "PROGRESS_INTERVAL", 100)
+    path = tmp_path / "build.log"
+    content = bytes(range(256)) * 4
+    path.write_bytes(content)
+    progress = list()
+
+    with MultipartFileStream("attach",
+                             str(path),
+                             progress=lambda *args: progress.append(args)) \
+            as body:
+        assert body.content_type == ("multipart/form-data; boundary=%s" %
+                                     body.boundary)
+        chunks = list()
+        while True:
+            chunk = body.read(30)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        data = b"".join(chunks)
+        assert len(body) == len(data)
+
+        # the progress is reported every 100 bytes and at the end
+        sent = [args[0] for args in progress]
+        assert sent[-1] == len(data)
+        assert all(current - previous >= 100
+                   for previous, current in zip(sent, sent[1:-1]))
+        assert len(progress) == len(data) // 120 + 1
+
+        body.seek(0)
+        assert b"".join(iter(body)) == data
+        body.seek(-20, io.SEEK_END)
+        assert body.read() == data[-20:]
+    assert body.closed
+
+    head, _, rest = data.partition(b"\r\n\r\n")
+    assert b'name="attach"; filename="build.log"' in head
+    assert rest == content + b"\r\n--%s--\r\n" % body.boundary.encode()
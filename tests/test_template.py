@@ -1,7 +1,10 @@
+import os
+
 import requests
 import pytest
 import utils_test
 from rtcclient.exception import BadValue
+from rtcclient.template import Templater
 from jinja2 import exceptions as jinja2_excp
 import xmltodict
 
@@ -110,3 +113,31 @@ class TestTemplater:
                                      template_names=["valid_name"],
                                      keep=False,
                                      encoding="UTF-8")
+
+    def test_compiled_templates(self, myrtcclient, mocker, tmp_path):
+        template_path = tmp_path / "issue.template"
+        template_path.write_text("<title>{{ title }}</title>")
+        templater = Templater(myrtcclient,
+                              searchpath=str(tmp_path),
+                              bytecode_cache=str(tmp_path / "bytecode"))
+        parse = mocker.spy(templater.environment, "parse")
+        compiled = mocker.spy(templater.environment, "compile")
+
+        for _ in range(3):
+            assert templater.listFields("issue.template") == set(["title"])
+            assert templater.render("issue.template",
+                                    title="a & b") == ("<title>a &amp; b"
+                                                       "</title>")
+        # the template is only compiled and parsed once
+        assert compiled.call_count == 1
+        assert parse.call_count == 1
+        assert os.listdir(str(tmp_path / "bytecode"))
+
+        # the modified template is loaded again
+        template_path.write_text("<title>{{ summary }}</title>")
+        stat = os.stat(str(template_path))
+        os.utime(str(template_path),
+                 ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert templater.listFields("issue.template") == set(["summary"])
+        assert templater.render("issue.template",
+                                summary="new") == "<title>new</title>"
@@ -0,0 +1,90 @@
+import requests
+import pytest
+import utils_test
+from rtcclient.exception import RTCException
+from rtcclient.tracing import OpenTelemetryTracer, RecordingTracer, Tracer
+
+
+class TestTracing:
+
+    @pytest.fixture(autouse=True)
+    def myrtcclient(self, rtcclient):
+        myclient = rtcclient
+        myclient.tracer = RecordingTracer()
+        return myclient
+
+    @pytest.fixture
+    def mock_get_pas(self, mocker):
+        mocked_get = mocker.patch("requests.get")
+        mock_resp = mocker.MagicMock(spec=requests.Response)
+        mock_resp.status_code = 200
+        mock_resp.content = utils_test.read_fixture("projectareas.xml")
+        mocked_get.return_value = mock_resp
+        return mocked_get
+
+    def test_paged_resources_spans(self, myrtcclient, mock_get_pas):
+        projectareas = myrtcclient.getProjectAreas(archived=False)
+        assert len(projectareas) == 1
+        tracer = myrtcclient.tracer
+
+        pages = tracer.find("rtcclient.page")
+        assert len(pages) == 1
+        assert pages[0].attributes["rtcclient.resource"] == "ProjectArea"
+        assert pages[0].attributes["rtcclient.page_index"] == 0
+        assert pages[0].attributes["rtcclient.entry_count"] == 2
+        assert pages[0].attributes["rtcclient.bytes"] == len(
+            utils_test.read_fixture("projectareas.xml"))
+        assert pages[0].duration >= 0
+
+        page_requests = [
+            span for span in tracer.find("rtcclient.request")
+            if span.parent is pages[0]
+        ]
+        assert len(page_requests) == 1
+        assert page_requests[0].attributes["http.method"] == "GET"
+        assert page_requests[0].attributes["http.status_code"] == 200
+        assert (page_requests[0].attributes["rtcclient.endpoint"] ==
+                "oslc/projectareas")
+
+        parses = tracer.find("rtcclient.parse")
+        assert parses[0].parent is pages[0]
+
+        builds = tracer.find("rtcclient.build")
+        assert set(
+            span.attributes["rtcclient.resource"] for span in builds) == set(
+                ["ProjectArea"])
+
+    def test_no_tracer(self, myrtcclient, mock_get_pas):
+        myrtcclient.tracer = None
+        projectareas = myrtcclient.getProjectAreas(archived=False)
+        assert len(projectareas) == 1
+
+    def test_custom_tracer(self, myrtcclient, mock_get_pas):
+
+        class NameTracer(Tracer):
+
+            def __init__(self):
+                self.names = list()
+
+            def span(self, name, **attributes):
+                self.names.append(name)
+                return Tracer.span(self, name, **attributes)
+
+        myrtcclient.tracer = NameTracer()
+        myrtcclient.getProjectAreas(archived=False)
+        assert myrtcclient.tracer.names[:3] == [
+            "rtcclient.page", "rtcclient.request", "rtcclient.parse"
+        ]
+
+    def test_opentelemetry_tracer(self, mocker):
+        try:
+            import opentelemetry  # noqa: F401
+        except ImportError:
+            with pytest.raises(RTCException):
+                OpenTelemetryTracer()
+
+        otel_tracer = mocker.MagicMock()
+        tracer = OpenTelemetryTracer(tracer=otel_tracer)
+        tracer.span("rtcclient.request", key="value")
+        otel_tracer.start_as_current_span.assert_called_once_with(
+            "rtcclient.request", attributes={"key": "value"})
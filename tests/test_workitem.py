@@ -1,7 +1,9 @@
+import json
+
 import requests
 import pytest
 import utils_test
-from rtcclient.exception import BadValue, NotFound
+from rtcclient.exception import BadValue, Conflict, NotFound
 from rtcclient.workitem import Workitem
 from rtcclient.models import Comment, Action, State, IncludedInBuild
 from rtcclient.models import ChangeSet, Attachment
@@ -94,6 +96,54 @@ class TestWorkitem:
             comment = workitem1.getCommentByID(comment_id)
             assert comment == comment2
 
+    def test_update(self, myrtcclient, mocker, workitem1):
+        myrtcclient.headers = {"Cookie": "JSESSIONID=session"}
+        mocked_get = mocker.patch("requests.get")
+        mock_resp = mocker.MagicMock(spec=requests.Response)
+        mock_resp.status_code = 200
+        mock_resp.headers = {"ETag": '"5"'}
+        mock_resp.content = b"{}"
+        mocked_get.return_value = mock_resp
+        mocked_put = mocker.patch("requests.put")
+        mock_put_resp = mocker.MagicMock(spec=requests.Response)
+        mock_put_resp.status_code = 200
+        mock_put_resp.headers = {"ETag": '"6"'}
+        mock_put_resp.content = b"{}"
+        mocked_put.return_value = mock_put_resp
+
+        member_url = "http://test.url:9443/jts/users/tester2%40email.com"
+        workitem1.update(title="new title",
+                         ownedBy=member_url,
+                         fields={"rtc_cm:contextId": "_abc"})
+        assert mocked_get.call_count == 1
+        args, kwargs = mocked_put.call_args
+        assert "oslc_cm.properties=" in args[0]
+        assert kwargs["headers"]["If-Match"] == '"5"'
+        assert json.loads(kwargs["data"]) == {
+            "rtc_cm:contextId": "_abc",
+            "dc:title": "new title",
+            "rtc_cm:ownedBy": {
+                "rdf:resource": member_url
+            }
+        }
+        assert workitem1.title == "new title"
+        assert workitem1.ownedBy == member_url
+        assert workitem1.contextId == "_abc"
+        assert workitem1.etag == '"6"'
+
+        # the ETag of the last update is reused
+        mock_put_resp.status_code = 412
+        mock_put_resp.raise_for_status.side_effect = requests.HTTPError(
+            response=mock_put_resp)
+        with pytest.raises(Conflict):
+            workitem1.update(title="another title")
+        assert mocked_get.call_count == 1
+        assert mocked_put.call_args[1]["headers"]["If-Match"] == '"6"'
+        assert workitem1.etag is None
+
+        with pytest.raises(BadValue):
+            workitem1.update(unknown_field="value")
+
     def test_add_comment(self, myrtcclient, mocker, workitem1):
         # TODO: add comment test
         pass
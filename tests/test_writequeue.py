@@ -0,0 +1,87 @@
+import json
+import queue
+
+import pytest
+from benchmarks.fake_server import FakeRTCServer
+from requests.exceptions import HTTPError
+from rtcclient.client import RTCClient
+from rtcclient.exception import BadValue, RTCException
+from rtcclient.workitem import CHILDREN_TAG, SUBSCRIBERS_TAG
+
+
+@pytest.fixture
+def server():
+    with FakeRTCServer(workitems=10, children=3, seed=1) as fake:
+        yield fake
+
+
+@pytest.fixture
+def myclient(server):
+    return RTCClient(server.url, "tester1@email.com", "password")
+
+
+def test_coalesce(server, myclient):
+    server.reset()
+    with myclient.createWriteQueue(linger=0.2) as writes:
+        futures = [
+            writes.addSubscriber(100001, "tester%s@email.com" % idx)
+            for idx in range(2, 5)
+        ]
+        futures.append(writes.addChild(100001, 100005))
+        futures.append(writes.addComment(100001, "subscribed"))
+        futures.append(writes.update(100002, title="changed"))
+        assert len(writes) == 6
+    assert not len(writes)
+
+    assert [future.result().identifier for future in futures] == \
+        [100001] * 5 + [100002]
+    # one session (the scoped GET and PUT) per workitem
+    assert dict(server.requests) == {
+        "GET oslc/workitems/{id}": 2,
+        "PUT oslc/workitems/{id}": 2,
+        "POST oslc/workitems/{id}/rtc_cm:comments/oslc:comment": 1
+    }
+    body = json.loads(
+        [update for update in server.updates if update[0] == 100001][0][2])
+    subscribers = [link["rdf:resource"] for link in body[SUBSCRIBERS_TAG]]
+    assert subscribers[-3:] == [
+        myclient._get_member_url("tester%s@email.com" % idx)
+        for idx in range(2, 5)
+    ]
+    assert len(body[CHILDREN_TAG]) == 4
+
+
+def test_backpressure(server, myclient):
+    writes = myclient.createWriteQueue(maxsize=2, linger=60)
+    first = writes.addSubscriber(100001, "tester2@email.com")
+    writes.addSubscriber(100002, "tester2@email.com")
+    with pytest.raises(queue.Full):
+        writes.addSubscriber(100003, "tester2@email.com", block=False)
+    with pytest.raises(queue.Full):
+        writes.addSubscriber(100003, "tester2@email.com", timeout=0.05)
+    assert not first.done()
+
+    # flushing writes the lingering changes right away
+    assert writes.flush(timeout=10)
+    assert first.result().identifier == 100001
+    assert writes.close()
+    with pytest.raises(RTCException):
+        writes.addSubscriber(100001, "tester3@email.com")
+
+
+def test_errors(server, myclient):
+    errors = list()
+    writes = myclient.createWriteQueue(
+        on_error=lambda *args: errors.append(args))
+    with pytest.raises(BadValue):
+        writes.addSubscriber(100001, "invalid email")
+    with pytest.raises(BadValue):
+        writes.addSubscriber("abc", "tester2@email.com")
+    with pytest.raises(BadValue):
+        writes.submit(100001, "commit")
+
+    server.inject_error(status=500, path=r"^oslc/workitems/\d+$")
+    failed = writes.update(100001, title="changed")
+    assert writes.close(timeout=10)
+    assert isinstance(failed.exception(), HTTPError)
+    assert errors == [("100001", failed.exception())]
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+import utils_test
+import xmltodict
+from rtcclient.exception import RTCException
+from rtcclient.xmlstream import CollectionParser
+
+
+def _collections():
+    for file_name in sorted(os.listdir(utils_test._search_path)):
+        if file_name.endswith(".xml"):
+            yield file_name
+
+
+@pytest.mark.parametrize("file_name", list(_collections()))
+def test_same_as_xmltodict(file_name):
+    content = utils_test.read_fixture(file_name)
+    tag, root = list(xmltodict.parse(content).items())[0]
+    expected = list()
+    for key, value in root.items():
+        if not key.startswith("@"):
+            expected.extend(value if isinstance(value, list) else [value])
+
+    parser = CollectionParser(content)
+    assert list(parser) == expected
+    assert parser.tag == tag
+    assert parser.attributes == dict(
+        (key, value) for key, value in root.items() if key.startswith("@"))
+
+
+def test_entry_tag():
+    content = utils_test.read_fixture("workitems.xml")
+    parser = CollectionParser(content.encode("UTF-8"), "oslc_cm:ChangeRequest")
+    identifiers = [workitem["dc:identifier"] for workitem in parser]
+    assert identifiers == ["161", "6329"]
+    assert parser.attributes["@oslc_cm:totalCount"] == "2"
+    assert list(CollectionParser(content, "rtc_cm:Comment")) == []
+
+
+def test_nested_namespaces():
+    content = ('<a:Collection xmlns:a="urn:a" a:totalCount="2">'
+               '<b:Entry xmlns:b="urn:b" b:id="1"><b:title>one</b:title>'
+               '</b:Entry><a:Entry>two</a:Entry></a:Collection>')
+    parser = CollectionParser(content)
+    assert list(parser) == [{
+        "@xmlns:b": "urn:b",
+        "@b:id": "1",
+        "b:title": "one"
+    }, "two"]
+    assert parser.attributes == {"@xmlns:a": "urn:a", "@a:totalCount": "2"}
+
+
+def test_malformed():
+    with pytest.raises(RTCException):
+        list(CollectionParser("<Collection><Entry>1</Entry>"))
+    with pytest.raises(RTCException):
+        list(CollectionParser("<html>&nbsp;</html>"))